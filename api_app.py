@@ -1,11 +1,24 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from models import db, User, UserInfo, Role, Order, OrderStatus, Product, get_thai_time, Category, product_categories, Review
+from models import db, User, UserInfo, Role, Order, OrderStatus, Product, get_thai_time, Category, product_categories, Review, CatalogVersion, ProductRating, rating_summary
+from catalog_cache import catalog_cache
+from search_index import product_search_index, name_prefix_index, normalize
+from upload_staging import UploadStaging, OffsetMismatch, ChecksumMismatch
+from image_variants import ImageVariantPipeline
+from image_store import ContentAddressedStore
 
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import or_
+from werkzeug.http import is_resource_modified
+from sqlalchemy import or_, and_, func, update, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timezone, timedelta
 import os
+import re
+import json
+import base64
+import hashlib
+import heapq
 from dotenv import load_dotenv
 
 # Thai timezone (UTC+7)
@@ -25,6 +38,29 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# Customer uploads (checkout)
+SLIPS_FOLDER = os.path.join('static', 'images', 'customers', 'slips')
+CUSTOM_IMAGES_FOLDER = os.path.join('static', 'images', 'customers', 'img_customize_products')
+
+# Uploaded images are stored under their content hash (ab/cd/<sha256>.<ext>):
+# identical files are kept once, nothing is overwritten, and URLs never change
+product_image_store = ContentAddressedStore(UPLOAD_FOLDER)
+slip_store = ContentAddressedStore(SLIPS_FOLDER)
+custom_image_store = ContentAddressedStore(CUSTOM_IMAGES_FOLDER)
+
+# Staged uploads: files sent ahead of checkout (not publicly served), expire if never used
+STAGED_UPLOAD_KINDS = {'slip', 'custom_image'}
+STAGED_UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+# Resumable (chunked) uploads for large artwork: PATCH /api/uploads/<id> one chunk at a time
+CHUNKED_UPLOAD_MAX_BYTES = 100 * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 1024 * 1024        # chunk size suggested to clients
+UPLOAD_CHUNK_MAX_BYTES = 8 * 1024 * 1024
+SHA256_RE = re.compile(r'^[0-9a-fA-F]{64}$')
+upload_staging = UploadStaging(
+    os.getenv('UPLOAD_STAGING_DIR', os.path.join('uploads', 'staging')),
+    ttl=int(os.getenv('UPLOAD_STAGING_TTL_SECONDS', 24 * 3600))
+)
+
 # Enable CORS for all routes (allows frontend to access API)
 CORS(app)
 
@@ -57,6 +93,9 @@ print(f"🔌 Connecting to: {primary_host}:{db_port}/{db_name} (SSL: {'Enabled'
 # Initialize DB
 db.init_app(app)
 
+# Catalog cache coherence: how often (seconds) each worker re-reads the shared catalog version
+CATALOG_VERSION_POLL_SECONDS = float(os.getenv('CATALOG_VERSION_POLL_SECONDS', '1.0'))
+
 def init_roles():
     """Initialize default roles if they don't exist"""
     try:
@@ -74,6 +113,175 @@ def init_roles():
         print(f"Error initializing roles: {e}")
         db.session.rollback()
 
+def order_query_with_details():
+    """Order query that loads user, user info, product and status in the same SELECT"""
+    return Order.query.options(
+        joinedload(Order.user).joinedload(User.info),
+        joinedload(Order.product),
+        joinedload(Order.status)
+    )
+
+def review_query_with_details():
+    """Review query that loads user, user info and product in the same SELECT"""
+    return Review.query.options(
+        joinedload(Review.user).joinedload(User.info),
+        joinedload(Review.product)
+    )
+
+def init_catalog_version():
+    """Create the catalog version row if it doesn't exist"""
+    try:
+        if db.session.get(CatalogVersion, 1) is None:
+            db.session.add(CatalogVersion(id=1, version=0))
+            db.session.commit()
+            print("Catalog version row created successfully!")
+    except Exception as e:
+        print(f"Error initializing catalog version: {e}")
+        db.session.rollback()
+
+def load_catalog_version():
+    """Read the shared catalog version (primary key lookup)"""
+    return db.session.query(CatalogVersion.version).filter(CatalogVersion.id == 1).scalar() or 0
+
+def bump_catalog_version():
+    """Increment the shared catalog version as part of the current transaction
+
+    Call before db.session.commit() in every product/category write, then
+    catalog_cache.bump() after the commit. Review writes don't call it -
+    rating summaries carry their own ETag part (load_ratings_by_product),
+    so review traffic never invalidates the catalog caches. Returns the new version (the row
+    stays locked until commit, so it is exactly this write's version).
+    """
+    result = db.session.execute(
+        update(CatalogVersion)
+        .where(CatalogVersion.id == 1)
+        .values(version=CatalogVersion.version + 1, updated_at=get_thai_time())
+    )
+    if result.rowcount == 0:
+        db.session.add(CatalogVersion(id=1, version=1))
+        return 1
+    return load_catalog_version()
+
+def sync_search_index(version, upsert_ids=(), remove_ids=()):
+    """Apply a committed catalog write to product_search_index
+    
+    Only the touched products are reloaded. If anything goes wrong the
+    index is left stale and rebuilt on the next search instead.
+    """
+    if product_search_index.version is None:
+        return
+    try:
+        products = build_products_data(list(upsert_ids)) if upsert_ids else []
+        product_search_index.apply(version, upsert=products, remove=remove_ids)
+    except Exception as e:
+        app.logger.error(f"Search index update error: {e}")
+        product_search_index.invalidate()
+
+catalog_cache.use_version_source(load_catalog_version, CATALOG_VERSION_POLL_SECONDS)
+
+def record_image_variants(p_id, image, future):
+    """Save generated variants on the product (pipeline callback, runs outside any request)
+    
+    Only applied while the product still shows the same image - if it was
+    replaced or deleted meanwhile, the newer upload has its own job.
+    
+    Variants don't change anything listed or searched, so this write doesn't
+    bump the catalog version: only the product's detail entry is dropped
+    (get_gallery_detail re-checks it on the other workers). Listings pick
+    the variants up with the next catalog write.
+    """
+    try:
+        variants = future.result()
+    except Exception as e:
+        app.logger.error(f"Image variants error for product {p_id} ({image}): {e}")
+        return
+    
+    with app.app_context():
+        try:
+            updated = Product.query.filter_by(p_id=p_id, image=image).update(
+                {'image_variants': variants, 'updated_at': get_thai_time()}, synchronize_session=False
+            )
+            if not updated:
+                db.session.rollback()
+                return
+            db.session.commit()
+            catalog_cache.discard(f'product:{p_id}')
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Image variants save error for product {p_id}: {e}")
+
+# Thumbnails + WebP for product uploads, generated in worker processes after the upload commits
+image_variant_pipeline = ImageVariantPipeline(
+    UPLOAD_FOLDER, record_image_variants, max_workers=int(os.getenv('IMAGE_VARIANT_WORKERS', 2))
+)
+
+def load_catalog_last_modified():
+    """Time of the last catalog write (falls back to the newest product update)"""
+    last_modified = db.session.query(CatalogVersion.updated_at).filter(CatalogVersion.id == 1).scalar()
+    return last_modified or db.session.query(func.max(Product.updated_at)).scalar()
+
+def catalog_etag(*parts):
+    """Strong ETag for a catalog payload - changes whenever the catalog version does"""
+    return '-'.join([str(part) for part in parts] + [f'v{catalog_cache.version()}'])
+
+def conditional_json(payload, etag, last_modified=None):
+    """jsonify payload with ETag / Last-Modified, or 304 if the client's copy is current
+    
+    The 304 check runs before serialization so revalidations skip jsonify.
+    payload may also be a function building the dict, so a 304 skips the query too.
+    Naive datetimes are treated as Thai time, the same as the rest of the API.
+    """
+    if last_modified is not None and last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=THAI_TZ)
+    
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(payload() if callable(payload) else payload)
+    
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Let browsers keep the body but revalidate it on every use
+    response.cache_control.no_cache = True
+    return response
+
+# Keyset pagination for order listings
+ORDERS_PAGE_DEFAULT_LIMIT = 50
+ORDERS_PAGE_MAX_LIMIT = 200
+
+REVIEWS_PAGE_DEFAULT_LIMIT = 10
+REVIEWS_PAGE_MAX_LIMIT = 50
+
+def encode_keyset_cursor(sort_date, row_id):
+    """Encode a (date, id) keyset position as an opaque cursor"""
+    raw = json.dumps([sort_date.isoformat(), row_id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_keyset_cursor(cursor):
+    """Decode a cursor from encode_keyset_cursor() back into (date, id)
+
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_date, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(sort_date), int(row_id)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f'Invalid cursor: {cursor}') from e
+
+def encode_order_cursor(order):
+    """Encode the (order_date, order_id) position of an order as an opaque cursor"""
+    return encode_keyset_cursor(order.order_date, order.order_id)
+
+def decode_order_cursor(cursor):
+    """Decode a cursor from encode_order_cursor() back into (order_date, order_id)"""
+    return decode_keyset_cursor(cursor)
+
+def encode_review_cursor(review):
+    """Encode the (review_date, review_id) position of a review as an opaque cursor"""
+    return encode_keyset_cursor(review.review_date, review.review_id)
+
 # ===== API ROUTES =====
 
 @app.route('/api/health', methods=['GET'])
@@ -356,14 +564,15 @@ def api_get_user(user_id):
 def get_categories():
     """API endpoint to get all categories"""
     try:
-        categories = Category.query.all()
-        categories_data = [{'c_id': cat.c_id, 'name': cat.name} for cat in categories]
+        categories_data = catalog_cache.get('categories', lambda: [
+            {'c_id': cat.c_id, 'name': cat.name} for cat in Category.query.all()
+        ])
         
-        return jsonify({
+        return conditional_json({
             'success': True,
             'data': categories_data,
             'count': len(categories_data)
-        }), 200
+        }, catalog_etag('categories'), catalog_cache.get('last_modified', load_catalog_last_modified))
         
     except Exception as e:
         app.logger.error(f"API Get categories error: {e}")
@@ -400,7 +609,10 @@ def create_category():
         )
         
         db.session.add(new_category)
+        version = bump_catalog_version()
         db.session.commit()
+        catalog_cache.bump()
+        sync_search_index(version)
         
         app.logger.info(f"Created category: {name} with ID: {new_category.c_id}")
         
@@ -435,6 +647,10 @@ def delete_category(category_id):
         
         category_name = category.name
         
+        # Products that lose this category (re-indexed for search after the delete)
+        affected_ids = [row.p_id for row in db.session.query(product_categories.c.p_id)
+                        .filter(product_categories.c.c_id == category_id)]
+        
         # Remove all product-category relationships first
         db.session.execute(
             product_categories.delete().where(
@@ -444,7 +660,10 @@ def delete_category(category_id):
         
         # Delete the category
         db.session.delete(category)
+        version = bump_catalog_version()
         db.session.commit()
+        catalog_cache.bump()
+        sync_search_index(version, upsert_ids=affected_ids)
         
         app.logger.info(f"Deleted category: {category_name} (ID: {category_id})")
         
@@ -461,41 +680,62 @@ def delete_category(category_id):
             'message': 'ไม่สามารถลบหมวดหมู่ได้'
         }), 500
 
+# Number of products shown per category on the home page
+HOME_PRODUCTS_PER_CATEGORY = 8
+
+def build_categories_with_products():
+    """Top products per category for the home page (one windowed query)"""
+    # Rank products within each category so the top N per category
+    # come back from a single query instead of one query per category
+    ranked_links = db.session.query(
+        product_categories.c.c_id.label('c_id'),
+        product_categories.c.p_id.label('p_id'),
+        func.row_number().over(
+            partition_by=product_categories.c.c_id,
+            order_by=product_categories.c.p_id
+        ).label('rank')
+    ).subquery()
+    
+    rows = db.session.query(Category, Product).join(
+        ranked_links, ranked_links.c.c_id == Category.c_id
+    ).join(
+        Product, Product.p_id == ranked_links.c.p_id
+    ).filter(
+        ranked_links.c.rank <= HOME_PRODUCTS_PER_CATEGORY
+    ).order_by(Category.c_id, ranked_links.c.rank).all()
+    
+    # Group rows by category (only categories that have products appear)
+    categories_data = []
+    for category, product in rows:
+        if not categories_data or categories_data[-1]['c_id'] != category.c_id:
+            categories_data.append({
+                'c_id': category.c_id,
+                'name': category.name,
+                'products': []
+            })
+        
+        categories_data[-1]['products'].append({
+            'p_id': product.p_id,
+            'name': product.name,
+            'description': product.description,
+            'price': float(product.price),
+            'image': product.image or 'placeholder.jpg',
+            'image_variants': product.image_variants or []
+        })
+    
+    return categories_data
+
 @app.route('/api/categories-with-products', methods=['GET'])
 def get_categories_with_products():
     """API endpoint to get categories with their products for home page"""
     try:
-        categories = Category.query.all()
-        categories_data = []
-        
-        for category in categories:
-            # Get products for this category
-            products = Product.query.join(product_categories).filter(
-                product_categories.c.c_id == category.c_id
-            ).limit(8).all()  # Limit to 8 products per category for home page
-            
-            if products:  # Only include categories that have products
-                products_data = []
-                for product in products:
-                    products_data.append({
-                        'p_id': product.p_id,
-                        'name': product.name,
-                        'description': product.description,
-                        'price': float(product.price),
-                        'image': product.image or 'placeholder.jpg'
-                    })
-                
-                categories_data.append({
-                    'c_id': category.c_id,
-                    'name': category.name,
-                    'products': products_data
-                })
+        categories_data = catalog_cache.get('categories_with_products', build_categories_with_products)
         
-        return jsonify({
+        return conditional_json({
             'success': True,
             'data': categories_data,
             'count': len(categories_data)
-        }), 200
+        }, catalog_etag('categories-with-products'), catalog_cache.get('last_modified', load_catalog_last_modified))
         
     except Exception as e:
         app.logger.error(f"Error getting categories with products: {e}")
@@ -531,15 +771,25 @@ def api_get_roles():
 
 @app.route('/api/orders', methods=['GET'])
 def api_get_orders():
-    """API endpoint to get orders (filtered by user or all for staff/admin)"""
+    """API endpoint to get orders (filtered by user or all for staff/admin)
+    
+    Results are paginated newest first on (order_date, order_id). Pass the
+    returned next_cursor back as ?cursor= to fetch the following page. The
+    first page (no cursor) also carries total, the number of orders
+    matching the filters; later pages return total: null.
+    
+    q searches by order id (digits, optionally with a leading #) or by
+    customer username / first / last name.
+    """
     try:
         # Get query parameters
         user_id = request.args.get('user_id', type=int)
         status_id = request.args.get('status_id', type=int)
         role_id = request.args.get('role_id', type=int)  # For permission checking
+        search = (request.args.get('q') or '').strip()
         
-        # Build query
-        query = Order.query
+        # Build query (eager load related rows so to_dict() doesn't hit the DB per order)
+        query = order_query_with_details()
         
         # Filter by user_id if provided (for customers viewing their own orders)
         if user_id and role_id == 3:  # Customer role
@@ -549,8 +799,44 @@ def api_get_orders():
         if status_id:
             query = query.filter_by(status_id=status_id)
         
-        # Execute query and get orders
-        orders = query.order_by(Order.order_date.desc()).all()
+        if search:
+            if search.lstrip('#').isdigit():
+                query = query.filter(Order.order_id == int(search.lstrip('#')))
+            else:
+                # Matching customers first (users is small next to orders), then their orders by idx_orders_user_date
+                pattern = f'%{search}%'
+                customer_ids = db.session.query(User.u_id).outerjoin(UserInfo, UserInfo.u_id == User.u_id).filter(or_(
+                    User.username.ilike(pattern), UserInfo.firstname.ilike(pattern), UserInfo.lastname.ilike(pattern)
+                ))
+                query = query.filter(Order.u_id.in_(customer_ids))
+        
+        # Total for the filters, on the first page only (the count doesn't change while paging)
+        cursor = request.args.get('cursor')
+        total = None if cursor else query.order_by(None).with_entities(func.count(Order.order_id)).scalar()
+        
+        # Page size (clamped so a single request can't pull the whole table)
+        limit = request.args.get('limit', ORDERS_PAGE_DEFAULT_LIMIT, type=int)
+        limit = max(1, min(limit, ORDERS_PAGE_MAX_LIMIT))
+        
+        # Continue after the last order of the previous page
+        if cursor:
+            try:
+                cursor_date, cursor_id = decode_order_cursor(cursor)
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'message': 'Invalid cursor'
+                }), 400
+            
+            query = query.filter(or_(
+                Order.order_date < cursor_date,
+                and_(Order.order_date == cursor_date, Order.order_id < cursor_id)
+            ))
+        
+        # Fetch one extra row to know whether another page exists
+        orders = query.order_by(Order.order_date.desc(), Order.order_id.desc()).limit(limit + 1).all()
+        has_more = len(orders) > limit
+        orders = orders[:limit]
         
         # Convert to dictionary format
         orders_data = [order.to_dict() for order in orders]
@@ -558,7 +844,10 @@ def api_get_orders():
         return jsonify({
             'success': True,
             'data': orders_data,
-            'count': len(orders_data)
+            'count': len(orders_data),
+            'total': total,
+            'has_more': has_more,
+            'next_cursor': encode_order_cursor(orders[-1]) if has_more else None
         }), 200
         
     except Exception as e:
@@ -573,7 +862,7 @@ def api_get_orders():
 def api_get_order(order_id):
     """API endpoint to get a specific order by ID"""
     try:
-        order = Order.query.get(order_id)
+        order = order_query_with_details().filter(Order.order_id == order_id).first()
         
         if not order:
             return jsonify({
@@ -758,9 +1047,303 @@ def api_get_products():
             'error': str(e)
         }), 500
 
+@app.route('/api/uploads', methods=['POST'])
+def stage_upload():
+    """Stage a checkout file ahead of checkout (can run in parallel, one file per request)
+    
+    Form fields:
+        u_id - owner; only this user's checkout can use the upload
+        kind - 'slip' or 'custom_image'
+        file - the image
+    
+    Pass the returned upload_id to /api/cart/checkout as slip_upload_id or
+    cart_items[i][custom_image_upload_id]. Unused uploads expire after
+    UPLOAD_STAGING_TTL_SECONDS (default 24 hours).
+    """
+    try:
+        u_id = request.form.get('u_id', type=int)
+        kind = request.form.get('kind')
+        file = request.files.get('file')
+        
+        if not u_id or kind not in STAGED_UPLOAD_KINDS or not file or not file.filename:
+            return jsonify({
+                'success': False,
+                'message': f"u_id, file and kind ({' / '.join(sorted(STAGED_UPLOAD_KINDS))}) are required"
+            }), 400
+        
+        if not allowed_file(file.filename):
+            return jsonify({
+                'success': False,
+                'message': f"File type not allowed ({', '.join(sorted(ALLOWED_EXTENSIONS))})"
+            }), 400
+        
+        if request.content_length and request.content_length > STAGED_UPLOAD_MAX_BYTES + 64 * 1024:
+            return jsonify({
+                'success': False,
+                'message': 'File is too large - use a resumable upload (POST /api/uploads/sessions)'
+            }), 413
+        
+        if db.session.query(User.u_id).filter(User.u_id == u_id).first() is None:
+            return jsonify({
+                'success': False,
+                'message': 'User not found'
+            }), 404
+        
+        meta = upload_staging.stage(file, kind, u_id, file.filename.rsplit('.', 1)[1].lower())
+        if meta['size'] > STAGED_UPLOAD_MAX_BYTES:
+            upload_staging.discard(meta['upload_id'])
+            return jsonify({
+                'success': False,
+                'message': 'File is too large - use a resumable upload (POST /api/uploads/sessions)'
+            }), 413
+        
+        return jsonify({
+            'success': True,
+            'data': staged_upload_dict(meta)
+        }), 201
+        
+    except Exception as e:
+        app.logger.error(f"API Stage upload error: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Failed to upload file',
+            'error': str(e)
+        }), 500
+
+def staged_upload_dict(meta):
+    return {
+        'upload_id': meta['upload_id'],
+        'kind': meta['kind'],
+        'size': meta['size'],
+        'offset': meta['offset'],
+        'complete': meta.get('complete', True),
+        'expires_at': datetime.fromtimestamp(meta['expires_at'], THAI_TZ).strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+@app.route('/api/uploads/sessions', methods=['POST'])
+def begin_chunked_upload():
+    """Start a resumable upload for a large file
+    
+    JSON body: u_id, kind, filename, size (bytes), sha256 (hex of the whole file)
+    
+    Then send the file with PATCH /api/uploads/<upload_id>?u_id= in chunks
+    (raw bytes, Upload-Offset header = bytes already sent). After a dropped
+    connection, GET /api/uploads/<upload_id>?u_id= returns the offset to
+    resume from. When the last chunk arrives the checksum is verified and
+    the upload_id can be used in checkout like any staged upload.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        u_id = data.get('u_id')
+        kind = data.get('kind')
+        filename = data.get('filename') or ''
+        size = data.get('size')
+        sha256 = data.get('sha256') or ''
+        
+        if not isinstance(u_id, int) or kind not in STAGED_UPLOAD_KINDS or not isinstance(size, int) or not SHA256_RE.match(sha256):
+            return jsonify({
+                'success': False,
+                'message': f"u_id, kind ({' / '.join(sorted(STAGED_UPLOAD_KINDS))}), filename, size and sha256 are required"
+            }), 400
+        
+        if not allowed_file(filename):
+            return jsonify({
+                'success': False,
+                'message': f"File type not allowed ({', '.join(sorted(ALLOWED_EXTENSIONS))})"
+            }), 400
+        
+        if size < 1 or size > CHUNKED_UPLOAD_MAX_BYTES:
+            return jsonify({
+                'success': False,
+                'message': f'File size must be between 1 and {CHUNKED_UPLOAD_MAX_BYTES} bytes'
+            }), 413 if size > 0 else 400
+        
+        if db.session.query(User.u_id).filter(User.u_id == u_id).first() is None:
+            return jsonify({
+                'success': False,
+                'message': 'User not found'
+            }), 404
+        
+        meta = upload_staging.begin(kind, u_id, filename.rsplit('.', 1)[1].lower(), size, sha256)
+        upload = staged_upload_dict(meta)
+        upload['chunk_size'] = UPLOAD_CHUNK_BYTES
+        return jsonify({
+            'success': True,
+            'data': upload
+        }), 201
+        
+    except Exception as e:
+        app.logger.error(f"API Begin chunked upload error: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Failed to start upload',
+            'error': str(e)
+        }), 500
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_staged_upload(upload_id):
+    """Status of a staged upload - offset tells a resuming client where to continue"""
+    u_id = request.args.get('u_id', type=int)
+    meta = upload_staging.get(upload_id, owner=u_id, pending=True) if u_id else None
+    if not meta:
+        return jsonify({
+            'success': False,
+            'message': 'Upload not found'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'data': staged_upload_dict(meta)
+    }), 200
+
+@app.route('/api/uploads/<upload_id>', methods=['PATCH'])
+def append_upload_chunk(upload_id):
+    """Append one chunk (raw request body) to a resumable upload
+    
+    Upload-Offset header must equal the bytes already received; otherwise
+    409 with the current offset. Returns the new offset, and complete=true
+    once the whole file is in and its sha256 matched (422 and the upload
+    is dropped if it didn't).
+    """
+    try:
+        u_id = request.args.get('u_id', type=int)
+        offset = request.headers.get('Upload-Offset', type=int)
+        length = request.content_length
+        
+        if not u_id or not upload_staging.get(upload_id, owner=u_id, pending=True):
+            return jsonify({
+                'success': False,
+                'message': 'Upload not found'
+            }), 404
+        
+        if offset is None or offset < 0 or not length:
+            return jsonify({
+                'success': False,
+                'message': 'Upload-Offset and Content-Length headers and a non-empty body are required'
+            }), 400
+        
+        if length > UPLOAD_CHUNK_MAX_BYTES:
+            return jsonify({
+                'success': False,
+                'message': f'Chunk is too large (max {UPLOAD_CHUNK_MAX_BYTES} bytes)'
+            }), 413
+        
+        # Streamed to disk in small blocks - the chunk is never held in memory
+        meta = upload_staging.append(upload_id, offset, request.stream, length)
+        return jsonify({
+            'success': True,
+            'data': staged_upload_dict(meta)
+        }), 200
+        
+    except KeyError:
+        # Completed / discarded by another request while this chunk waited
+        return jsonify({
+            'success': False,
+            'message': 'Upload not found'
+        }), 404
+    except OffsetMismatch as e:
+        return jsonify({
+            'success': False,
+            'message': 'Offset does not match the bytes received so far',
+            'offset': e.offset
+        }), 409
+    except ChecksumMismatch:
+        return jsonify({
+            'success': False,
+            'message': 'Checksum mismatch - the upload was discarded, please upload the file again'
+        }), 422
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        app.logger.error(f"API Upload chunk error: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Failed to save chunk',
+            'error': str(e)
+        }), 500
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def delete_staged_upload(upload_id):
+    """Drop a staged upload that won't be used (e.g. the customer picked another slip)"""
+    u_id = request.args.get('u_id', type=int)
+    if not u_id or not upload_staging.get(upload_id, owner=u_id, pending=True):
+        return jsonify({
+            'success': False,
+            'message': 'Upload not found'
+        }), 404
+    
+    upload_staging.discard(upload_id)
+    return jsonify({
+        'success': True,
+        'message': 'Upload deleted'
+    }), 200
+
+# Checkout form fields are cart_items[<index>][<field>]
+CART_ITEM_KEY_RE = re.compile(r'^cart_items\[(\d+)\]\[(\w+)\]$')
+
+def parse_cart_items(form):
+    """Cart items from the checkout form, in index order
+    
+    Groups every cart_items[i][field] key in one pass over the form.
+    Raises ValueError on a malformed number or a quantity below 1.
+    """
+    fields_by_index = {}
+    for key, value in form.items():
+        match = CART_ITEM_KEY_RE.match(key)
+        if match:
+            fields_by_index.setdefault(int(match.group(1)), {})[match.group(2)] = value
+    
+    cart_items = []
+    for index in sorted(fields_by_index):
+        fields = fields_by_index[index]
+        if not fields.get('product_id'):
+            continue
+        
+        cart_item = {
+            'index': index,  # custom_image_<index> file field
+            'product_id': int(fields['product_id']),
+            'product_name': fields.get('product_name', ''),
+            'product_price': float(fields.get('product_price', 0)),
+            'original_size': fields.get('original_size', '1:1'),
+            'custom_size': fields.get('custom_size', '1:1'),
+            'scale_multiplier': fields.get('scale_multiplier', '1.0'),
+            'quantity': int(fields.get('quantity', 1)),
+            'unit_price': float(fields.get('unit_price', 0)),
+            'subtotal': float(fields.get('subtotal', 0)),
+            'order_details': fields.get('order_details', ''),
+            'has_custom_image': fields.get('has_custom_image', 'false') == 'true',
+            'custom_image_filename': fields.get('custom_image_filename', ''),
+            'custom_image_upload_id': fields.get('custom_image_upload_id')
+        }
+        if cart_item['quantity'] < 1:
+            raise ValueError(f"quantity must be at least 1 (item {index})")
+        cart_items.append(cart_item)
+    return cart_items
+
+def build_order_description(item):
+    """Order description: quantity and custom size, then the customer's notes"""
+    order_description = item.get('order_details', '')
+    size_info = f"จำนวน: {item['quantity']} ชิ้น | อัตราส่วน: {item['custom_size']}"
+    if item.get('scale_multiplier') and item['scale_multiplier'] != '1.0':
+        size_info += f" (×{item['scale_multiplier']})"
+    
+    if order_description:
+        return f"{size_info} | {order_description}"
+    return size_info
+
 @app.route('/api/cart/checkout', methods=['POST'])
 def api_cart_checkout():
-    """API endpoint to checkout cart and create orders with file uploads"""
+    """API endpoint to checkout cart and create orders
+    
+    Files are normally staged first via POST /api/uploads and referenced
+    here by id (slip_upload_id, cart_items[i][custom_image_upload_id]),
+    so this request only carries form fields. Uploading the files in this
+    request (slip, custom_image_<i>) still works.
+    """
     try:
         print("=" * 60)
         print("🛒 Checkout Request Received")
@@ -787,8 +1370,26 @@ def api_cart_checkout():
         
         u_id = int(u_id)
         
-        # Verify user exists
-        user = User.query.get(u_id)
+        # Parse cart items from form data (validated before anything is written)
+        try:
+            cart_items = parse_cart_items(request.form)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': f'Invalid cart item: {e}'
+            }), 400
+        
+        print(f"✅ Parsed {len(cart_items)} cart items")
+        
+        if not cart_items:
+            print("❌ No cart items found!")
+            return jsonify({
+                'success': False,
+                'message': 'Cart is empty'
+            }), 400
+        
+        # Verify user exists (user info for the shipping address in the same SELECT)
+        user = User.query.options(joinedload(User.info)).filter(User.u_id == u_id).first()
         if not user:
             return jsonify({
                 'success': False,
@@ -796,7 +1397,7 @@ def api_cart_checkout():
             }), 404
         
         # Get user info for shipping address
-        user_info = UserInfo.query.filter_by(u_id=u_id).first()
+        user_info = user.info
         if user_info:
             # Build shipping address from user info
             shipping_address = f"{user_info.street_address}, {user_info.city}"
@@ -806,132 +1407,104 @@ def api_cart_checkout():
             # Use provided address or default message
             shipping_address = request.form.get('shipping_address', 'ไม่ได้ระบุที่อยู่จัดส่ง')
         
-        # Handle slip upload
-        slip_filename = None
-        if 'slip' in request.files:
-            slip_file = request.files['slip']
-            if slip_file and slip_file.filename and allowed_file(slip_file.filename):
-                # Create slips directory if not exists
-                slips_folder = os.path.join('static', 'images', 'customers', 'slips')
-                os.makedirs(slips_folder, exist_ok=True)
-                
-                # Generate unique filename
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                file_ext = slip_file.filename.rsplit('.', 1)[1].lower()
-                slip_filename = f"slip_{u_id}_{timestamp}.{file_ext}"
-                
-                # Save slip file
-                slip_path = os.path.join(slips_folder, slip_filename)
-                slip_file.save(slip_path)
-                print(f"✅ Saved slip: {slip_filename}")
-        
-        # Parse cart items from form data
-        print(f"\n📦 Parsing cart items...")
-        cart_items = []
-        index = 0
-        while True:
-            product_id = request.form.get(f'cart_items[{index}][product_id]')
-            if not product_id:
-                break
-            
-            print(f"  Item {index}: Product ID {product_id}")
-            
-            cart_item = {
-                'product_id': int(product_id),
-                'product_name': request.form.get(f'cart_items[{index}][product_name]', ''),
-                'product_price': float(request.form.get(f'cart_items[{index}][product_price]', 0)),
-                'original_size': request.form.get(f'cart_items[{index}][original_size]', '1:1'),
-                'custom_size': request.form.get(f'cart_items[{index}][custom_size]', '1:1'),
-                'scale_multiplier': request.form.get(f'cart_items[{index}][scale_multiplier]', '1.0'),
-                'quantity': int(request.form.get(f'cart_items[{index}][quantity]', 1)),
-                'unit_price': float(request.form.get(f'cart_items[{index}][unit_price]', 0)),
-                'subtotal': float(request.form.get(f'cart_items[{index}][subtotal]', 0)),
-                'order_details': request.form.get(f'cart_items[{index}][order_details]', ''),
-                'has_custom_image': request.form.get(f'cart_items[{index}][has_custom_image]', 'false') == 'true',
-                'custom_image_filename': request.form.get(f'cart_items[{index}][custom_image_filename]', '')
-            }
-            
-            print(f"    - {cart_item['product_name']}: {cart_item['quantity']} x {cart_item['unit_price']}฿ = {cart_item['subtotal']}฿")
-            print(f"    - Has custom image: {cart_item['has_custom_image']}")
-            
-            # Handle custom image upload
-            if cart_item['has_custom_image']:
-                custom_image_key = f'custom_image_{index}'
-                if custom_image_key in request.files:
-                    custom_image = request.files[custom_image_key]
-                    if custom_image and custom_image.filename:
-                        # Create directory if not exists
-                        custom_folder = os.path.join('static', 'images', 'customers', 'img_customize_products')
-                        os.makedirs(custom_folder, exist_ok=True)
-                        
-                        # Save custom image
-                        custom_image_path = os.path.join(custom_folder, cart_item['custom_image_filename'])
-                        custom_image.save(custom_image_path)
-                        print(f"✅ Saved custom image: {cart_item['custom_image_filename']}")
-            
-            cart_items.append(cart_item)
-            index += 1
-        
-        print(f"\n✅ Parsed {len(cart_items)} cart items")
+        # Verify every referenced product in one IN query; unknown products are skipped
+        product_names = dict(db.session.query(Product.p_id, Product.name).filter(
+            Product.p_id.in_({item['product_id'] for item in cart_items})
+        ))
+        skipped_product_ids = sorted({item['product_id'] for item in cart_items} - set(product_names))
+        cart_items = [item for item in cart_items if item['product_id'] in product_names]
         
         if not cart_items:
-            print("❌ No cart items found!")
             return jsonify({
                 'success': False,
-                'message': 'Cart is empty'
-            }), 400
+                'message': 'Products not found',
+                'skipped_product_ids': skipped_product_ids
+            }), 404
         
-        # Create orders for each item in cart
+        # Staged uploads referenced by id must exist, be unexpired and belong to this user
+        staged = {}
+        slip_upload_id = request.form.get('slip_upload_id')
+        for upload_id, kind in [(slip_upload_id, 'slip')] + [
+            (item['custom_image_upload_id'], 'custom_image') for item in cart_items
+        ]:
+            if not upload_id:
+                continue
+            meta = upload_staging.get(upload_id, owner=u_id)
+            if not meta or meta['kind'] != kind or upload_id in staged:
+                return jsonify({
+                    'success': False,
+                    'message': f'Upload {upload_id} not found, expired or already used',
+                    'upload_id': upload_id
+                }), 400
+            staged[upload_id] = meta
+        
+        # Files go into the content-addressed stores (a staged upload is linked
+        # in, not moved, so it is still there for a retry if the insert fails)
+        slip_filename = None
+        if slip_upload_id:
+            slip_filename = slip_store.put_path(
+                upload_staging.path(slip_upload_id), staged[slip_upload_id]['extension']
+            )
+            print(f"✅ Stored staged slip: {slip_filename}")
+        elif 'slip' in request.files:
+            slip_file = request.files['slip']
+            if slip_file and slip_file.filename and allowed_file(slip_file.filename):
+                slip_filename = slip_store.put(slip_file, slip_file.filename.rsplit('.', 1)[1])
+                print(f"✅ Saved slip: {slip_filename}")
+        
+        # Handle custom image uploads
+        for item in cart_items:
+            upload_id = item['custom_image_upload_id']
+            if upload_id:
+                item['has_custom_image'] = True
+                item['custom_image_filename'] = custom_image_store.put_path(
+                    upload_staging.path(upload_id), staged[upload_id]['extension']
+                )
+            elif item['has_custom_image']:
+                custom_image = request.files.get(f"custom_image_{item['index']}")
+                if custom_image and custom_image.filename and allowed_file(custom_image.filename):
+                    item['custom_image_filename'] = custom_image_store.put(
+                        custom_image, custom_image.filename.rsplit('.', 1)[1]
+                    )
+                    print(f"✅ Saved custom image: {item['custom_image_filename']}")
+        
+        # Build every order row in memory, then write them with one bulk INSERT
         print(f"\n🔨 Creating orders...")
+        order_date = get_thai_time()
+        order_rows = []
         created_orders = []
         
         for item in cart_items:
-            # Verify product exists
-            product = Product.query.get(item['product_id'])
-            if not product:
-                continue  # Skip if product not found
-            
-            # Build description with quantity and custom size info
-            order_description = item.get('order_details', '')
-            size_info = f"จำนวน: {item['quantity']} ชิ้น | อัตราส่วน: {item['custom_size']}"
-            if item.get('scale_multiplier') and item['scale_multiplier'] != '1.0':
-                size_info += f" (×{item['scale_multiplier']})"
-            
-            if order_description:
-                order_description = f"{size_info} | {order_description}"
-            else:
-                order_description = size_info
-            
             # Get custom image filename if exists
             custom_img_filename = item['custom_image_filename'] if item['has_custom_image'] else None
             
-            # Create new order with img and bill_img columns
-            new_order = Order(
-                u_id=u_id,
-                p_id=item['product_id'],
-                quantity=item['quantity'],
-                total_amount=item['subtotal'],
-                shipping_address=shipping_address,
-                status_id=1,  # Default to pending
-                description=order_description,
-                img=custom_img_filename,  # รูปสินค้าที่ลูกค้าอัปโหลด
-                bill_img=slip_filename    # รูปสลิป
-            )
-            
-            db.session.add(new_order)
-            print(f"  ✅ Created order for {product.name}")
-            print(f"     - img: {custom_img_filename}")
-            print(f"     - bill_img: {slip_filename}")
+            order_rows.append({
+                'u_id': u_id,
+                'p_id': item['product_id'],
+                'order_date': order_date,
+                'quantity': item['quantity'],
+                'total_amount': item['subtotal'],
+                'shipping_address': shipping_address,
+                'status_id': 1,  # Default to pending
+                'description': build_order_description(item),
+                'img': custom_img_filename,  # รูปสินค้าที่ลูกค้าอัปโหลด
+                'bill_img': slip_filename    # รูปสลิป
+            })
             
             created_orders.append({
                 'product_id': item['product_id'],
-                'product_name': product.name,
+                'product_name': product_names[item['product_id']],
                 'quantity': item['quantity'],
                 'total_amount': float(item['subtotal']),
-                'custom_image': item['custom_image_filename'] if item['has_custom_image'] else None
+                'custom_image': custom_img_filename
             })
         
+        db.session.execute(insert(Order), order_rows)
         db.session.commit()
+        
+        # Orders are committed - the staged copies are no longer needed
+        for upload_id in staged:
+            upload_staging.discard(upload_id)
         print(f"\n🎉 Successfully created {len(created_orders)} orders!")
         print("=" * 60)
         
@@ -941,7 +1514,8 @@ def api_cart_checkout():
             'data': {
                 'orders': created_orders,
                 'total_orders': len(created_orders),
-                'slip_filename': slip_filename
+                'slip_filename': slip_filename,
+                'skipped_product_ids': skipped_product_ids
             }
         }), 201
         
@@ -960,27 +1534,320 @@ def api_cart_checkout():
 
 
 
+def load_categories_by_product(product_ids=None):
+    """Map p_id -> [{'c_id', 'name'}] for many products in one query
+    
+    Loads the links for every product when product_ids is None, otherwise
+    only for the given ids (single IN query).
+    """
+    query = db.session.query(
+        product_categories.c.p_id, Category.c_id, Category.name
+    ).join(Category, Category.c_id == product_categories.c.c_id)
+    
+    if product_ids is not None:
+        if not product_ids:
+            return {}
+        query = query.filter(product_categories.c.p_id.in_(product_ids))
+    
+    categories_by_product = {}
+    for p_id, c_id, name in query.order_by(product_categories.c.p_id, Category.c_id):
+        categories_by_product.setdefault(p_id, []).append({'c_id': c_id, 'name': name})
+    return categories_by_product
+
+def load_ratings_by_product(product_ids):
+    """Rating summaries for the given products, read on every request
+    
+    Returns ({p_id: summary}, etag part, newest updated_at or None). Ratings
+    change with each review write, so they are not cached under the catalog
+    version - the etag part (a hash of the summaries) goes into the
+    response's ETag instead. One primary-key IN query.
+    """
+    ratings = ProductRating.query.filter(ProductRating.p_id.in_(product_ids)).all() if product_ids else []
+    ratings_by_product = {rating.p_id: rating.to_dict() for rating in ratings}
+    digest = hashlib.md5(json.dumps(ratings_by_product, sort_keys=True).encode()).hexdigest()[:12]
+    last_modified = max((rating.updated_at for rating in ratings if rating.updated_at), default=None)
+    return ratings_by_product, f'r{digest}', last_modified
+
+def build_products_data(product_ids=None):
+    """Products as dictionaries - all of them (cached for /api/manage-product) or only product_ids"""
+    query = Product.query
+    if product_ids is not None:
+        query = query.filter(Product.p_id.in_(product_ids))
+    products = query.all()
+    categories_by_product = load_categories_by_product(product_ids)
+    return [product.to_dict(categories_by_product.get(product.p_id, [])) for product in products]
+
+def build_product_detail(p_id):
+    """Single product as a dictionary, or None if it doesn't exist (rating added per request)"""
+    product = Product.query.get(p_id)
+    return product.to_dict() if product else None
+
+# Gallery listing: server-side filter / sort / pagination
+GALLERY_PAGE_DEFAULT_LIMIT = 24
+GALLERY_PAGE_MAX_LIMIT = 100
+# Built pages kept per worker (one per distinct filter / sort / page combination)
+GALLERY_CACHE_MAX_PAGES = int(os.getenv('GALLERY_CACHE_MAX_PAGES', 500))
+
+catalog_cache.limit_group('gallery', GALLERY_CACHE_MAX_PAGES)
+
+# sort parameter -> ORDER BY (p_id as tie-breaker so pages are stable)
+GALLERY_SORTS = {
+    'name': (Product.name.asc(), Product.p_id.asc()),
+    'name-desc': (Product.name.desc(), Product.p_id.desc()),
+    'price': (Product.price.asc(), Product.p_id.asc()),
+    'price-desc': (Product.price.desc(), Product.p_id.desc()),
+    'newest': (Product.created_at.desc(), Product.p_id.desc())
+}
+
+# The same orders for text search pages, sorted in memory on product_search_index summaries
+# (key, reverse) - names compare normalized, like the database's case-insensitive collation
+GALLERY_SEARCH_SORTS = {
+    'name': (lambda product: (normalize(product['name']), product['p_id']), False),
+    'name-desc': (lambda product: (normalize(product['name']), product['p_id']), True),
+    'price': (lambda product: (product['price'] or 0, product['p_id']), False),
+    'price-desc': (lambda product: (product['price'] or 0, product['p_id']), True),
+    'newest': (lambda product: (product['created_at'] or '', product['p_id']), True)
+}
+
+def parse_gallery_params(args):
+    """Validate /api/gallery query parameters, raises ValueError on bad input"""
+    params = {
+        'category': args.get('category', type=int),
+        'min_price': None,
+        'max_price': None,
+        'q': (args.get('q') or '').strip(),
+        'sort': args.get('sort') or 'newest',
+        'page': args.get('page', 1, type=int),
+        'limit': args.get('limit', GALLERY_PAGE_DEFAULT_LIMIT, type=int)
+    }
+    
+    for key in ('min_price', 'max_price'):
+        value = args.get(key)
+        if value not in (None, ''):
+            try:
+                params[key] = float(value)
+            except ValueError:
+                raise ValueError(f'{key} must be a number')
+    
+    if params['sort'] not in GALLERY_SORTS:
+        raise ValueError(f"sort must be one of: {', '.join(GALLERY_SORTS)}")
+    
+    params['page'] = max(1, params['page'])
+    params['limit'] = max(1, min(params['limit'], GALLERY_PAGE_MAX_LIMIT))
+    return params
+
+def gallery_page_payload(params, products, total):
+    """/api/gallery response body for one page of Product rows"""
+    product_ids = [product.p_id for product in products]
+    categories_by_product = load_categories_by_product(product_ids)
+    return {
+        'success': True,
+        'data': [product.to_dict(categories_by_product.get(product.p_id, [])) for product in products],
+        'count': len(products),
+        'total': total,
+        'page': params['page'],
+        'limit': params['limit'],
+        'has_more': params['page'] * params['limit'] < total
+    }
+
+def build_gallery_search_page(params, matches):
+    """Gallery page for a text search: matches (product_search_index summaries) filtered,
+    sorted and paged in memory, then only the page's rows loaded from the database"""
+    if params['category']:
+        matches = [product for product in matches
+                   if any(category['c_id'] == params['category'] for category in product['categories'])]
+    if params['min_price'] is not None:
+        matches = [product for product in matches if (product['price'] or 0) >= params['min_price']]
+    if params['max_price'] is not None:
+        matches = [product for product in matches if (product['price'] or 0) <= params['max_price']]
+    
+    # Only the first page * limit are ordered (heap select), not every match. Matches come
+    # oldest p_id first; newest-first input keeps the heap from being replaced on every item
+    key, reverse = GALLERY_SEARCH_SORTS[params['sort']]
+    end = params['page'] * params['limit']
+    if reverse:
+        top = heapq.nlargest(end, reversed(matches), key=key)
+    else:
+        top = heapq.nsmallest(end, matches, key=key)
+    page_ids = [product['p_id'] for product in top[end - params['limit']:]]
+    
+    rows = {product.p_id: product for product in Product.query.filter(Product.p_id.in_(page_ids))} if page_ids else {}
+    return gallery_page_payload(params, [rows[p_id] for p_id in page_ids if p_id in rows], len(matches))
+
+def build_gallery_page(params):
+    """One page of products matching params, plus the total match count (without ratings)
+    
+    q goes through product_search_index (whole words, like /api/products/search) instead
+    of a LIKE '%q%' scan; the other filters and the sort are indexed SQL.
+    """
+    if params['q']:
+        matches = product_search_index.match_summaries(params['q'])
+        if matches is not None:
+            return build_gallery_search_page(params, matches)
+    
+    query = Product.query
+    
+    if params['category']:
+        # uses the (c_id, p_id) index on product_categories
+        query = query.join(product_categories, product_categories.c.p_id == Product.p_id) \
+                     .filter(product_categories.c.c_id == params['category'])
+    if params['min_price'] is not None:
+        query = query.filter(Product.price >= params['min_price'])
+    if params['max_price'] is not None:
+        query = query.filter(Product.price <= params['max_price'])
+    
+    total = query.order_by(None).count()
+    products = query.order_by(*GALLERY_SORTS[params['sort']]) \
+                    .offset((params['page'] - 1) * params['limit']) \
+                    .limit(params['limit']).all()
+    return gallery_page_payload(params, products, total)
+
 @app.route('/api/gallery', methods=['GET'])
 def api_get_gallery():
-    """API endpoint to get all products for the toy shop"""
+    """API endpoint to get products for the toy shop
+    
+    Query parameters (all optional):
+        category   - c_id
+        min_price / max_price
+        q          - words in the name, categories or description (search index)
+        sort       - name, name-desc, price, price-desc, newest (default)
+        page, limit - 1-based page number and page size (default 24, max 100)
+    """
     try:
-        # ดึงข้อมูลสินค้าทั้งหมดจากตาราง products
-        products = Product.query.all()
+        try:
+            params = parse_gallery_params(request.args)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
         
-        # แปลงข้อมูลแต่ละ object ให้อยู่ในรูปแบบ dictionary
-        products_data = [product.to_dict() for product in products]
+        # ETag covers the normalized parameters, so each filtered page revalidates on its own
+        params_key = hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+        etag_parts = ['gallery', params_key]
+        cacheable = True
+        if params['q']:
+            # While the index is rebuilt after another worker's write, search pages come from
+            # the previous index: not cached, and their ETag names the index version they used
+            product_search_index.ensure_current(catalog_cache.version(), load_search_products)
+            cacheable = product_search_index.version == catalog_cache.version()
+            etag_parts.append(f'i{product_search_index.version}')
+        # Built pages are cached per catalog version (bounded, least recently used dropped first)
+        if cacheable:
+            page = catalog_cache.get(('gallery', params_key), lambda: build_gallery_page(params))
+        else:
+            page = build_gallery_page(params)
+        
+        # Ratings of the page's products are read fresh and get their own ETag part
+        ratings_by_product, ratings_etag, ratings_modified = load_ratings_by_product(
+            [product['p_id'] for product in page['data']]
+        )
+        catalog_last_modified = catalog_cache.get('last_modified', load_catalog_last_modified)
+        
+        return conditional_json(
+            lambda: dict(page, data=[
+                dict(product, rating=ratings_by_product.get(product['p_id']) or rating_summary())
+                for product in page['data']
+            ]),
+            catalog_etag(*etag_parts, ratings_etag),
+            max(filter(None, [catalog_last_modified, ratings_modified]), default=None)
+        )
+        
+    except Exception as e:
+        app.logger.error(f"API Get gallery error: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Failed to fetch gallery products',
+            'error': str(e)
+        }), 500
+
+# Product search (in-memory inverted index, see search_index.py)
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+def load_search_products():
+    """Every product for product_search_index - in its own app context (and session),
+    because after the first build this runs on the index's rebuild thread"""
+    with app.app_context():
+        return build_products_data()
+
+@app.route('/api/products/search', methods=['GET'])
+def search_products():
+    """API endpoint to search products by name, category and description
+    
+    Query parameters:
+        q     - search text (Thai or Latin); words shorter than 2 characters are ignored
+        limit - number of results (default 20, max 100)
+    """
+    try:
+        query = (request.args.get('q') or '').strip()
+        limit = request.args.get('limit', SEARCH_DEFAULT_LIMIT, type=int)
+        limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+        
+        # If the catalog changed on another worker, rebuild in the background (the old index answers meanwhile)
+        product_search_index.ensure_current(catalog_cache.version(), load_search_products)
+        results, total = product_search_index.search(query, limit)
         
         return jsonify({
             'success': True,
-            'data': products_data,
-            'count': len(products_data)
+            'query': query,
+            'data': results,
+            'count': len(results),
+            'total': total
         }), 200
         
     except Exception as e:
-        app.logger.error(f"API Get gallery error: {e}")
+        app.logger.error(f"API Search products error: {e}")
         return jsonify({
             'success': False,
-            'message': 'Failed to fetch gallery products',
+            'message': 'Failed to search products',
+            'error': str(e)
+        }), 500
+
+# Name autocomplete (sorted prefix array, see search_index.PrefixIndex)
+AUTOCOMPLETE_DEFAULT_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+def load_autocomplete_names():
+    """(type, id, name) for every product and category - names only, two light queries
+    (own app context, like load_search_products)"""
+    with app.app_context():
+        names = [('product', p_id, name) for p_id, name in db.session.query(Product.p_id, Product.name)]
+        names += [('category', c_id, name) for c_id, name in db.session.query(Category.c_id, Category.name)]
+        return names
+
+@app.route('/api/autocomplete', methods=['GET'])
+def autocomplete():
+    """API endpoint for product / category name type-ahead
+    
+    Query parameters:
+        prefix - start of any word in the name (Thai or Latin)
+        limit  - number of suggestions (default 10, max 50)
+    """
+    try:
+        prefix = request.args.get('prefix') or ''
+        limit = request.args.get('limit', AUTOCOMPLETE_DEFAULT_LIMIT, type=int)
+        limit = max(1, min(limit, AUTOCOMPLETE_MAX_LIMIT))
+        
+        # Rebuilt (in the background once built) only when the catalog version has moved
+        name_prefix_index.ensure_current(catalog_cache.version(), load_autocomplete_names)
+        suggestions = [
+            {'type': kind, 'id': item_id, 'name': name}
+            for kind, item_id, name in name_prefix_index.complete(prefix, limit)
+        ]
+        
+        return jsonify({
+            'success': True,
+            'prefix': prefix,
+            'data': suggestions,
+            'count': len(suggestions)
+        }), 200
+        
+    except Exception as e:
+        app.logger.error(f"API Autocomplete error: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Failed to load suggestions',
             'error': str(e)
         }), 500
 
@@ -990,26 +1857,42 @@ def get_gallery_detail(p_id):
     API Endpoint สำหรับดึงข้อมูลสินค้าเดียวตาม p_id
     """
     try:
-        # 1. ค้นหาสินค้าจากฐานข้อมูลโดยใช้ p_id
-        product = Product.query.get(p_id)
+        # 1. ค้นหาสินค้าโดยใช้ p_id (จาก cache ถ้า catalog ยังไม่เปลี่ยน)
+        product_data = catalog_cache.get(f'product:{p_id}', lambda: build_product_detail(p_id))
+        if product_data is not None and product_data['image'] and not product_data['image_variants']:
+            # Variants are saved without a catalog version bump (record_image_variants),
+            # so a cached copy still waiting for them is checked against the row
+            variants = db.session.query(Product.image_variants).filter(Product.p_id == p_id).scalar()
+            if variants:
+                catalog_cache.discard(f'product:{p_id}')
+                product_data = catalog_cache.get(f'product:{p_id}', lambda: build_product_detail(p_id))
 
         # 2. ตรวจสอบว่าพบสินค้าหรือไม่
-        if product is None:
+        if product_data is None:
             return jsonify({
                 'success': False,
                 'message': f'Product with p_id {p_id} not found'
             }), 404
 
-        # 3. แปลงข้อมูลสินค้าเป็น dictionary และส่งกลับ
-        product_data = product.to_dict()
-        
+        # 3. ส่งข้อมูลสินค้ากลับ
         # NOTE: product.to_dict() ถูกกำหนดไว้ใน models.py ซึ่งจะแปลง object เป็น dict
         
+        # 4. คะแนนรีวิวอ่านใหม่ทุกครั้ง (ไม่อยู่ใน catalog cache) - มี ETag part ของตัวเอง
+        ratings_by_product, ratings_etag, ratings_modified = load_ratings_by_product([p_id])
+        
+        # 5. ETag / Last-Modified จาก updated_at ของสินค้า + catalog version + rating (ตอบ 304 ถ้าไม่เปลี่ยน)
+        updated_at = product_data['updated_at']
+        updated_at = datetime.strptime(updated_at, '%Y-%m-%d %H:%M:%S') if updated_at else None
+        catalog_last_modified = catalog_cache.get('last_modified', load_catalog_last_modified)
+        last_modified = max(filter(None, [updated_at, catalog_last_modified, ratings_modified]), default=None)
+        etag = catalog_etag('product', p_id, updated_at.strftime('%Y%m%d%H%M%S') if updated_at else 0,
+                            f"i{len(product_data['image_variants'])}", ratings_etag)
+        
         app.logger.info(f"API Get gallery detail successful for p_id: {p_id}")
-        return jsonify({
+        return conditional_json(lambda: {
             'success': True,
-            'data': product_data
-        }), 200
+            'data': dict(product_data, rating=ratings_by_product.get(p_id) or rating_summary())
+        }, etag, last_modified)
         
     except Exception as e:
         app.logger.error(f"API Get gallery detail error for p_id {p_id}: {e}")
@@ -1025,17 +1908,14 @@ def get_manage_products():
     API Endpoint สำหรับดึงรายการสินค้าทั้งหมดสำหรับการจัดการ
     """
     try:
-        # ดึงข้อมูลสินค้าทั้งหมดจากฐานข้อมูล
-        products = Product.query.all()
-
-        # แปลงรายการสินค้าเป็น list of dictionaries โดยใช้ Product.to_dict()
-        products_data = [product.to_dict() for product in products]
+        # ดึงข้อมูลสินค้าทั้งหมด (ใช้ cache เดียวกับ /api/gallery)
+        products_data = catalog_cache.get('products', build_products_data)
         
-        return jsonify({
+        return conditional_json({
             'success': True,
             'data': products_data,
             'count': len(products_data)
-        }), 200
+        }, catalog_etag('manage-product'), catalog_cache.get('last_modified', load_catalog_last_modified))
         
     except Exception as e:
         app.logger.error(f"API Get manage products error: {e}")
@@ -1086,20 +1966,30 @@ def manage_product_api(product_id):
                 product.categories = Category.query.filter(Category.c_id.in_(selected_categories)).all()
             
             # Handle image upload if provided
+            new_image = None
             if 'image' in request.files:
                 file = request.files['image']
-                if file and file.filename:
-                    from werkzeug.utils import secure_filename
-                    filename = secure_filename(file.filename)
-                    file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                    product.image = filename
+                if file and file.filename and allowed_file(file.filename):
+                    # Content-addressed name: can't overwrite another product's image
+                    new_image = product_image_store.put(file, file.filename.rsplit('.', 1)[1])
+                    if new_image != product.image:
+                        product.image = new_image
+                        # Old variants show the previous image; new ones are generated after commit
+                        product.image_variants = None
+                    elif product.image_variants:
+                        new_image = None  # same file re-uploaded, variants still match
 
             # Update timestamp with Thai time (UTC+7)
             from datetime import timedelta
             thai_time = datetime.utcnow() + timedelta(hours=7)
             product.updated_at = thai_time
             
+            version = bump_catalog_version()
             db.session.commit()
+            catalog_cache.bump()
+            sync_search_index(version, upsert_ids=[product_id])
+            if new_image:
+                image_variant_pipeline.submit(product_id, new_image)
             return jsonify({
                 'success': True,
                 'message': 'Product updated successfully'
@@ -1129,7 +2019,10 @@ def manage_product_api(product_id):
                 {'pid': product_id}
             )
             
+            version = bump_catalog_version()
             db.session.commit()
+            catalog_cache.bump()
+            sync_search_index(version, remove_ids=[product_id])
             
             return jsonify({
                 'success': True,
@@ -1162,10 +2055,8 @@ def add_product():
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename and allowed_file(file.filename):
-                from werkzeug.utils import secure_filename
-                filename = secure_filename(file.filename)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                new_product.image = filename
+                # Content-addressed name: can't overwrite another product's image
+                new_product.image = product_image_store.put(file, file.filename.rsplit('.', 1)[1])
         
         # Set timestamps with Thai time
         from datetime import timedelta
@@ -1214,7 +2105,12 @@ def add_product():
         new_product.categories = categories_to_assign
         print(f"DEBUG: Total categories assigned: {len(categories_to_assign)}")
         
+        version = bump_catalog_version()
         db.session.commit()
+        catalog_cache.bump()
+        sync_search_index(version, upsert_ids=[new_product.p_id])
+        if new_product.image:
+            image_variant_pipeline.submit(new_product.p_id, new_product.image)
         
         return jsonify({
             'success': True,
@@ -1288,9 +2184,57 @@ def bad_request(error):
 
 # ==================== Review API Endpoints ====================
 
+def change_product_rating(p_id, add_score=None, remove_score=None):
+    """Apply one review write to the product's rating summary (current transaction)
+    
+    add_score / remove_score are the star values entering / leaving the
+    summary - both for an edited score. Counters are updated with
+    column = column + n, so concurrent review writes can't lose counts.
+    Call before db.session.commit() of the review write.
+    """
+    count, score_sum, histogram = 0, 0, {}
+    for score, sign in ((add_score, 1), (remove_score, -1)):
+        if score is not None:
+            count += sign
+            score_sum += sign * score
+            histogram[score] = histogram.get(score, 0) + sign
+    
+    values = {
+        'review_count': ProductRating.review_count + count,
+        'score_sum': ProductRating.score_sum + score_sum,
+        'updated_at': get_thai_time()
+    }
+    for stars, n in histogram.items():
+        if n:
+            column = getattr(ProductRating, f'score_{stars}')
+            values[column.key] = column + n
+    
+    result = db.session.execute(update(ProductRating).where(ProductRating.p_id == p_id).values(**values))
+    if result.rowcount:
+        return
+    
+    # No summary row yet: build it from the reviews (the pending write is flushed, so it's included)
+    rating = ProductRating(p_id=p_id, review_count=0, score_sum=0,
+                           score_1=0, score_2=0, score_3=0, score_4=0, score_5=0)
+    for score, n in db.session.query(Review.score, func.count()).filter(Review.p_id == p_id).group_by(Review.score):
+        rating.review_count += n
+        rating.score_sum += score * n
+        setattr(rating, f'score_{score}', n)
+    try:
+        with db.session.begin_nested():
+            db.session.add(rating)
+    except IntegrityError:
+        # Another request created the row first (without this write) - apply the change to it
+        db.session.execute(update(ProductRating).where(ProductRating.p_id == p_id).values(**values))
+
 @app.route('/api/products/<int:p_id>/reviews', methods=['GET'])
 def get_product_reviews(p_id):
-    """Get all reviews for a specific product"""
+    """Get reviews for a specific product, newest first
+    
+    Paginated on (review_date, review_id): pass the returned next_cursor
+    back as ?cursor= for the following page. limit defaults to 10 (max 50).
+    A page costs the same few queries however many reviews it holds.
+    """
     try:
         # Check if product exists
         product = Product.query.get(p_id)
@@ -1300,23 +2244,52 @@ def get_product_reviews(p_id):
                 'message': 'Product not found'
             }), 404
         
-        # Get all reviews for this product
-        reviews = Review.query.filter_by(p_id=p_id).order_by(Review.review_date.desc()).all()
+        limit = request.args.get('limit', REVIEWS_PAGE_DEFAULT_LIMIT, type=int)
+        limit = max(1, min(limit, REVIEWS_PAGE_MAX_LIMIT))
         
-        # Calculate average score
-        avg_score = 0
-        if reviews:
-            total_score = sum(r.score for r in reviews)
-            avg_score = round(total_score / len(reviews), 1)
+        # idx_reviews_product_date (p_id, review_date + primary key) serves filter, sort and cursor
+        query = review_query_with_details().filter(Review.p_id == p_id)
         
-        return jsonify({
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                cursor_date, cursor_id = decode_keyset_cursor(cursor)
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'message': 'Invalid cursor'
+                }), 400
+            
+            query = query.filter(or_(
+                Review.review_date < cursor_date,
+                and_(Review.review_date == cursor_date, Review.review_id < cursor_id)
+            ))
+        
+        # Fetch one extra row to know whether another page exists
+        reviews = query.order_by(Review.review_date.desc(), Review.review_id.desc()).limit(limit + 1).all()
+        has_more = len(reviews) > limit
+        reviews = reviews[:limit]
+        
+        # Count / average from the maintained summary instead of the rows
+        rating = db.session.get(ProductRating, p_id)
+        rating = rating.to_dict() if rating else rating_summary()
+        
+        response = jsonify({
             'success': True,
             'data': {
                 'reviews': [review.to_dict() for review in reviews],
-                'total_reviews': len(reviews),
-                'average_score': avg_score
+                'count': len(reviews),
+                'has_more': has_more,
+                'next_cursor': encode_review_cursor(reviews[-1]) if has_more else None,
+                'total_reviews': rating['count'],
+                'average_score': rating['average'],
+                'rating': rating
             }
-        }), 200
+        })
+        # Content-hash ETag so gallerydetail.js revalidates instead of re-downloading
+        response.add_etag()
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
         
     except Exception as e:
         app.logger.error(f"API Get product reviews error: {e}")
@@ -1326,6 +2299,81 @@ def get_product_reviews(p_id):
         }), 500
 
 
+# Order statuses that count as "received" for reviews - reference data, resolved once
+_completed_status_ids = None
+
+def completed_status_ids():
+    """s_ids an order may have to count as completed (looked up once, then cached)
+    
+    Same rule as the original per-request check: status 5, plus the first
+    status (lowest s_id) named 'completed' or 'delivered' or with s_id 5 -
+    one status, not every one that matches.
+    """
+    global _completed_status_ids
+    if _completed_status_ids is None:
+        completed_status = db.session.query(OrderStatus.s_id).filter(or_(
+            OrderStatus.name == 'completed',
+            OrderStatus.name == 'delivered',
+            OrderStatus.s_id == 5  # Directly check for status_id = 5
+        )).order_by(OrderStatus.s_id).first()
+        if completed_status is None:
+            return ()  # statuses not seeded yet - don't cache the miss
+        _completed_status_ids = tuple(sorted({5, completed_status[0]}))
+    return _completed_status_ids
+
+def review_eligibility_query(user_id, p_ids):
+    """(p_id, u_id, oldest completed order_id, latest review_id) per product for user_id
+    
+    Products are the outer side, so a product with no completed order (or
+    a missing user) still gives one row with NULLs. Orders are found via
+    idx_orders_user_product_status, the user's reviews of the product via
+    idx_reviews_product_date.
+    """
+    return db.session.query(Product.p_id, User.u_id, func.min(Order.order_id), func.max(Review.review_id)) \
+        .select_from(Product) \
+        .outerjoin(User, User.u_id == user_id) \
+        .outerjoin(Order, and_(
+            Order.u_id == User.u_id,
+            Order.p_id == Product.p_id,
+            Order.status_id.in_(completed_status_ids())
+        )) \
+        .outerjoin(Review, and_(Review.u_id == User.u_id, Review.p_id == Product.p_id)) \
+        .filter(Product.p_id.in_(p_ids)) \
+        .group_by(Product.p_id, User.u_id)
+
+def load_review_eligibility(user_id, p_ids):
+    """Whether user_id can review each product in p_ids, in one joined query
+    
+    A user reviews a product once, after completing an order of it.
+    Returns (user_found, {p_id: eligibility}); products that don't exist
+    are left out. Each eligibility is
+        can_review - True if there is a completed order and no review yet
+        reason     - 'eligible', 'already_reviewed' or 'not_purchased'
+        order_id   - oldest completed order (a new review is linked to it)
+        review_id  - the user's review of it, if any
+    """
+    rows = review_eligibility_query(user_id, p_ids).all()
+    
+    if not rows:
+        # None of the products exist - still tell a missing user apart
+        return db.session.query(User.u_id).filter(User.u_id == user_id).first() is not None, {}
+    
+    eligibility = {}
+    for p_id, u_id, order_id, review_id in rows:
+        if review_id is not None:
+            reason = 'already_reviewed'
+        elif order_id is not None:
+            reason = 'eligible'
+        else:
+            reason = 'not_purchased'
+        eligibility[p_id] = {
+            'can_review': reason == 'eligible',
+            'reason': reason,
+            'order_id': order_id,
+            'review_id': review_id
+        }
+    return rows[0][1] is not None, eligibility
+
 @app.route('/api/products/<int:p_id>/reviews/can-review', methods=['GET'])
 def check_can_review(p_id):
     """Check if user can write a review for this product"""
@@ -1338,71 +2386,50 @@ def check_can_review(p_id):
                 'message': 'user_id is required'
             }), 400
         
-        # Check if user exists
-        user = User.query.get(user_id)
-        if not user:
+        if not completed_status_ids():
             return jsonify({
                 'success': False,
-                'message': 'User not found'
-            }), 404
+                'message': 'Completed order status not found',
+                'can_review': False
+            }), 200
         
-        # Check if product exists
-        product = Product.query.get(p_id)
-        if not product:
+        # User, product, completed order and existing review in one query
+        user_found, eligibility = load_review_eligibility(user_id, [p_id])
+        
+        if not user_found:
             return jsonify({
                 'success': False,
-                'message': 'Product not found'
+                'message': 'User not found'
             }), 404
         
-        # Find completed status (check by name or by id = 5)
-        completed_status = OrderStatus.query.filter(
-            or_(
-                OrderStatus.name == 'completed', 
-                OrderStatus.name == 'delivered',
-                OrderStatus.s_id == 5  # Directly check for status_id = 5
-            )
-        ).first()
-        
-        if not completed_status:
+        if p_id not in eligibility:
             return jsonify({
                 'success': False,
-                'message': 'Completed order status not found',
-                'can_review': False
-            }), 200
-        
-        # Check if user has a completed order for this product (status_id = 5 or completed status)
-        completed_order = Order.query.filter(
-            Order.u_id == user_id,
-            Order.p_id == p_id,
-            or_(Order.status_id == 5, Order.status_id == completed_status.s_id)
-        ).first()
+                'message': 'Product not found'
+            }), 404
         
-        app.logger.info(f"🔍 Check review eligibility - User: {user_id}, Product: {p_id}, Completed Status ID: {completed_status.s_id}, Found Order: {completed_order is not None}")
+        entry = eligibility[p_id]
         
-        if not completed_order:
+        if entry['can_review']:
             return jsonify({
                 'success': True,
-                'can_review': False,
-                'message': 'You must complete an order for this product before reviewing'
+                'can_review': True,
+                'message': 'You can write a review for this product'
             }), 200
         
-        # Check if this specific order already has a review
-        existing_review = Review.query.filter_by(
-            o_id=completed_order.order_id
-        ).first()
-        
-        if existing_review:
+        if entry['review_id']:
+            existing_review = review_query_with_details().filter(Review.review_id == entry['review_id']).first()
             return jsonify({
                 'success': True,
                 'can_review': False,
                 'message': 'You have already reviewed this order',
-                'review': existing_review.to_dict()
+                'review': existing_review.to_dict() if existing_review else None
             }), 200
         
         return jsonify({
             'success': True,
-            'can_review': True,
-            'message': 'You can write a review for this product'
+            'can_review': False,
+            'message': 'You must complete an order for this product before reviewing'
         }), 200
         
     except Exception as e:
@@ -1412,6 +2439,68 @@ def check_can_review(p_id):
             'message': f'Failed to check review eligibility: {str(e)}'
         }), 500
 
+REVIEW_ELIGIBILITY_MAX_PRODUCTS = 100
+
+@app.route('/api/reviews/eligibility', methods=['GET'])
+def get_review_eligibility():
+    """Review eligibility of one user for many products (e.g. an order history page)
+    
+    Query parameters:
+        user_id - required
+        p_ids   - comma-separated product ids (or repeated ?p_ids=), up to 100
+    
+    data maps each existing p_id to can_review / reason / order_id /
+    review_id (see load_review_eligibility); unknown ids are listed in
+    not_found.
+    """
+    try:
+        user_id = request.args.get('user_id', type=int)
+        if not user_id:
+            return jsonify({
+                'success': False,
+                'message': 'user_id is required'
+            }), 400
+        
+        try:
+            p_ids = sorted({int(p_id) for value in request.args.getlist('p_ids')
+                            for p_id in value.split(',') if p_id.strip()})
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': 'p_ids must be a comma-separated list of product ids'
+            }), 400
+        
+        if not p_ids:
+            return jsonify({
+                'success': False,
+                'message': 'p_ids is required'
+            }), 400
+        
+        if len(p_ids) > REVIEW_ELIGIBILITY_MAX_PRODUCTS:
+            return jsonify({
+                'success': False,
+                'message': f'At most {REVIEW_ELIGIBILITY_MAX_PRODUCTS} products per request'
+            }), 400
+        
+        user_found, eligibility = load_review_eligibility(user_id, p_ids)
+        if not user_found:
+            return jsonify({
+                'success': False,
+                'message': 'User not found'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'data': {str(p_id): entry for p_id, entry in eligibility.items()},
+            'not_found': [p_id for p_id in p_ids if p_id not in eligibility]
+        }), 200
+        
+    except Exception as e:
+        app.logger.error(f"API Review eligibility error: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Failed to check review eligibility: {str(e)}'
+        }), 500
 
 @app.route('/api/products/<int:p_id>/reviews', methods=['POST'])
 def create_review(p_id):
@@ -1440,66 +2529,44 @@ def create_review(p_id):
                 'message': 'Score must be between 1 and 5'
             }), 400
         
-        # Check if user exists
-        user = User.query.get(user_id)
-        if not user:
+        if not completed_status_ids():
             return jsonify({
                 'success': False,
-                'message': 'User not found'
-            }), 404
+                'message': 'Cannot verify order completion status'
+            }), 400
         
-        # Check if product exists
-        product = Product.query.get(p_id)
-        if not product:
+        # User, product, completed order and existing review in one query
+        user_found, eligibility = load_review_eligibility(user_id, [p_id])
+        
+        if not user_found:
             return jsonify({
                 'success': False,
-                'message': 'Product not found'
+                'message': 'User not found'
             }), 404
         
-        # Check if user has completed order for this product
-        completed_status = OrderStatus.query.filter(
-            or_(
-                OrderStatus.name == 'completed', 
-                OrderStatus.name == 'delivered',
-                OrderStatus.s_id == 5  # Directly check for status_id = 5
-            )
-        ).first()
-        
-        if not completed_status:
+        if p_id not in eligibility:
             return jsonify({
                 'success': False,
-                'message': 'Cannot verify order completion status'
-            }), 400
-        
-        # Check for orders with status_id = 5 or the completed status
-        completed_order = Order.query.filter(
-            Order.u_id == user_id,
-            Order.p_id == p_id,
-            or_(Order.status_id == 5, Order.status_id == completed_status.s_id)
-        ).first()
+                'message': 'Product not found'
+            }), 404
         
-        if not completed_order:
+        entry = eligibility[p_id]
+        if not entry['can_review']:
+            if entry['review_id']:
+                return jsonify({
+                    'success': False,
+                    'message': 'You have already reviewed this order'
+                }), 400
             return jsonify({
                 'success': False,
                 'message': 'You must complete an order for this product before reviewing'
             }), 403
         
-        # Check if this specific order already has a review
-        existing_review = Review.query.filter_by(
-            o_id=completed_order.order_id
-        ).first()
-        
-        if existing_review:
-            return jsonify({
-                'success': False,
-                'message': 'You have already reviewed this order'
-            }), 400
-        
         # Create new review with o_id
         new_review = Review(
             p_id=p_id,
             u_id=user_id,
-            o_id=completed_order.order_id,  # Link to the completed order
+            o_id=entry['order_id'],  # Oldest completed order of the product
             title=title,
             description=description,
             score=score,
@@ -1507,6 +2574,18 @@ def create_review(p_id):
         )
         
         db.session.add(new_review)
+        try:
+            db.session.flush()
+        except IntegrityError:
+            # uq_reviews_o_id: a concurrent request reviewed this order first
+            db.session.rollback()
+            return jsonify({
+                'success': False,
+                'message': 'You have already reviewed this order'
+            }), 400
+        
+        # Ratings are versioned on their own (see load_ratings_by_product) - no catalog bump
+        change_product_rating(p_id, add_score=score)
         db.session.commit()
         
         app.logger.info(f"Review created: {new_review.review_id} by user {user_id} for product {p_id}")
@@ -1549,6 +2628,7 @@ def update_review(review_id):
             }), 403
         
         # Update fields
+        old_score = review.score
         if 'score' in data:
             score = data['score']
             if not isinstance(score, int) or score < 1 or score > 5:
@@ -1564,6 +2644,10 @@ def update_review(review_id):
         if 'description' in data:
             review.description = data['description']
         
+        # Only a score change touches the rating summary
+        if review.score != old_score:
+            change_product_rating(review.p_id, add_score=review.score, remove_score=old_score)
+        
         db.session.commit()
         
         app.logger.info(f"Review updated: {review_id}")
@@ -1606,6 +2690,7 @@ def delete_review(review_id):
             }), 403
         
         db.session.delete(review)
+        change_product_rating(review.p_id, remove_score=review.score)
         db.session.commit()
         
         app.logger.info(f"Review deleted: {review_id}")
@@ -1629,6 +2714,7 @@ if __name__ == '__main__':
             db.create_all()
             print("Database tables created successfully!")
             init_roles()
+            init_catalog_version()
         except Exception as e:
             print(f"Error creating database tables: {e}")
     
@@ -0,0 +1,169 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+def _params_key(params):
+    """Hashable key for requests-style params: a dict or (key, value) pairs, values may be lists"""
+    if params is None or isinstance(params, (str, bytes)):
+        return params
+    items = params.items() if hasattr(params, 'items') else params
+    # Sorted by name only (stable), so repeated keys keep their order
+    return tuple(sorted(
+        ((key, tuple(value) if isinstance(value, (list, tuple)) else value) for key, value in items),
+        key=lambda item: str(item[0])
+    ))
+
+
+class _Entry:
+    def __init__(self, response):
+        self.response = response
+        self.fetched_at = time.monotonic()
+        self.etag = response.headers.get('ETag')
+
+
+class _Flight:
+    """A fetch in progress; other callers for the same key wait on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class APIResponseCache:
+    """Stale-while-revalidate cache for API GET responses (frontend side)
+
+    For each path + params:
+      * younger than ttl                -> served from cache (hit)
+      * younger than ttl + stale_ttl    -> served stale, refreshed in the background
+      * older / missing                 -> fetched now (miss)
+    Concurrent fetches of one key are coalesced, so a burst of visitors
+    produces a single backend call. Refreshes send If-None-Match, so an
+    unchanged payload comes back as a 304 with no body.
+
+    If the API is unreachable, raises or answers 5xx, the last good response
+    keeps being served for up to error_ttl seconds after it was fetched.
+    A 4xx is an answer, not a failure (e.g. a deleted product's 404): it
+    drops the cached copy and is returned as-is. Only 2xx responses are
+    cached.
+    """
+
+    def __init__(self, client, ttl=5, stale_ttl=30, error_ttl=300, max_entries=1000):
+        self.client = client
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.error_ttl = error_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> _Entry
+        self._flights = {}             # key -> _Flight
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'stale': 0,
+            'stale_on_error': 0,
+            'coalesced': 0,
+            'revalidated': 0,
+            'errors': 0
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def get(self, path, params=None, **kwargs):
+        """Cached equivalent of client.get(path, params=...)"""
+        key = (path, _params_key(params))
+        entry = self._entries.get(key)
+        age = time.monotonic() - entry.fetched_at if entry else None
+
+        if entry and age < self.ttl:
+            self._count('hits')
+            return entry.response
+
+        if entry and age < self.ttl + self.stale_ttl:
+            self._count('stale')
+            self._start_flight(key, path, params, kwargs, entry, background=True)
+            return entry.response
+
+        self._count('misses')
+        flight = self._start_flight(key, path, params, kwargs, entry, background=False)
+        flight.done.wait()
+
+        if flight.error is None and flight.response is not None and flight.response.status_code < 500:
+            return flight.response
+
+        # Backend failed: fall back to the last good copy while it's within error_ttl
+        if entry and age < self.error_ttl:
+            self._count('stale_on_error')
+            return entry.response
+        if flight.error is not None:
+            raise flight.error
+        return flight.response
+
+    def _start_flight(self, key, path, params, kwargs, entry, background):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.stats['coalesced'] += 1
+                return flight
+            flight = self._flights[key] = _Flight()
+
+        if background:
+            threading.Thread(target=self._fetch, args=(key, path, params, kwargs, entry, flight), daemon=True).start()
+        else:
+            self._fetch(key, path, params, kwargs, entry, flight)
+        return flight
+
+    def _fetch(self, key, path, params, kwargs, entry, flight):
+        try:
+            headers = dict(kwargs.pop('headers', None) or {})
+            if entry and entry.etag:
+                headers['If-None-Match'] = entry.etag
+
+            response = self.client.get(path, params=params, headers=headers, **kwargs)
+
+            if response.status_code == 304 and entry:
+                self._count('revalidated')
+                entry.fetched_at = time.monotonic()
+                response = entry.response
+            elif response.ok:
+                self._store(key, _Entry(response))
+            elif response.status_code < 500:
+                # The resource is gone / the request is invalid now - stop serving the old copy
+                self._drop(key)
+            else:
+                self._count('errors')
+
+            flight.response = response
+        except Exception as e:
+            # Not only RequestException: the embedded client raises whatever the API app does.
+            # Every caller waiting on this flight re-raises it (or gets the stale copy)
+            self._count('errors')
+            flight.error = e
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _drop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        """Counters in Prometheus text format"""
+        with self._lock:
+            stats = dict(self.stats, entries=len(self._entries))
+        return ''.join(f'api_cache_{name} {value}\n' for name, value in stats.items())
@@ -0,0 +1,177 @@
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+from werkzeug.datastructures import MultiDict
+from werkzeug.test import Client
+
+
+class APIClient:
+    """Pooled HTTP client for the frontend -> API hop
+
+    All threads share one connection pool (keep-alive), so page renders
+    reuse open TCP connections to the API instead of opening a new one
+    per call. Each thread gets its own requests.Session on top of that
+    pool because Session cookie handling isn't thread-safe.
+
+    Idempotent GETs are retried with exponential backoff on connection and
+    read errors and on 502/503/504. POST/PATCH are only retried when the
+    connection could not be opened at all (nothing was sent).
+
+    get_many() issues a page's independent GETs in parallel on a bounded
+    thread pool, so page latency is the slowest call rather than the sum.
+    """
+
+    def __init__(self, base_url, pool_size=20, timeout=10, retries=3, backoff_factor=0.3, fanout_workers=8):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=fanout_workers, thread_name_prefix='api-fanout')
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            raise_on_status=False
+        )
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('http://', self._adapter)
+            session.mount('https://', self._adapter)
+            self._local.session = session
+        return session
+
+    def url(self, path):
+        """Absolute API URL for a path like '/gallery'"""
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self._session().request(method, self.url(path), **kwargs)
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def patch(self, path, **kwargs):
+        return self.request('PATCH', path, **kwargs)
+
+    def get_many(self, calls, deadline=None, get=None):
+        """Run several independent GETs concurrently
+
+        calls maps a name to a path or to a (path, kwargs) tuple. Returns a
+        dict of the same names to PendingCall objects; PendingCall.result()
+        returns the response or raises the request's exception. All calls
+        share one overall deadline (seconds, defaults to the client
+        timeout); a call still running when it passes raises
+        requests.exceptions.Timeout.
+
+        get replaces self.get for each call, e.g. an APIResponseCache's get.
+        """
+        get = self.get if get is None else get
+        deadline = self.timeout if deadline is None else deadline
+        deadline_at = time.monotonic() + deadline
+
+        pending = {}
+        for name, call in calls.items():
+            path, kwargs = (call, {}) if isinstance(call, str) else call
+            kwargs = dict(kwargs)
+            kwargs['timeout'] = min(kwargs.get('timeout', self.timeout), deadline)
+            future = self._executor.submit(get, path, **kwargs)
+            pending[name] = PendingCall(path, future, deadline_at)
+        return pending
+
+    def close(self):
+        """Close every pooled connection and stop the fan-out pool"""
+        self._executor.shutdown(wait=False)
+        self._adapter.close()
+
+
+class EmbeddedAPIClient(APIClient):
+    """In-process API client for single-box deployments
+
+    Dispatches calls straight into the API's WSGI app (api_app.app) in the
+    same process instead of over HTTP to localhost, skipping the socket
+    round trip and connection handling. Responses are wrapped as
+    requests.Response objects, so callers use exactly the same contract
+    (status_code, ok, json(), raise_for_status()) as with APIClient.
+
+    Per-call timeouts can't interrupt an in-process call and are ignored;
+    get_many() deadlines still bound how long a page waits. files takes the
+    same forms as in requests (file object, or (filename, file or bytes
+    [, content_type]) tuples) and is sent as multipart form data.
+    """
+
+    def __init__(self, wsgi_app, base_path='/api', timeout=10, fanout_workers=8):
+        self.base_url = base_path.rstrip('/')
+        self.timeout = timeout
+        self._wsgi_app = wsgi_app
+        self._executor = ThreadPoolExecutor(max_workers=fanout_workers, thread_name_prefix='api-fanout')
+
+    def request(self, method, path, params=None, json=None, data=None, files=None, headers=None, timeout=None):
+        url = self.url(path)
+        if files:
+            data = _multipart_data(data, files)
+        result = Client(self._wsgi_app).open(
+            url, method=method, query_string=params, json=json, data=data, headers=headers
+        )
+
+        response = requests.Response()
+        response.status_code = result.status_code
+        response.reason = result.status.split(' ', 1)[-1]
+        response.headers = CaseInsensitiveDict(result.headers.items())
+        response._content = result.get_data()
+        response.encoding = 'utf-8'
+        response.url = url
+        return response
+
+    def close(self):
+        """Stop the fan-out pool"""
+        self._executor.shutdown(wait=False)
+
+
+def _multipart_data(data, files):
+    """requests-style data + files as the form werkzeug's test client encodes as multipart"""
+    form = MultiDict(data.items() if isinstance(data, dict) else data or [])
+    for name, value in files.items() if isinstance(files, dict) else files:
+        if isinstance(value, (tuple, list)):
+            filename, content = value[0], value[1]
+            content_type = value[2] if len(value) > 2 else None
+        else:
+            filename, content, content_type = os.path.basename(getattr(value, 'name', name)), value, None
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        if isinstance(content, bytes):
+            content = io.BytesIO(content)
+        form.add(name, (content, filename, content_type) if content_type else (content, filename))
+    return form
+
+
+class PendingCall:
+    """Result handle for one request started by APIClient.get_many()"""
+
+    def __init__(self, path, future, deadline_at):
+        self.path = path
+        self._future = future
+        self._deadline_at = deadline_at
+
+    def result(self):
+        """The response, or raise the request's exception / a Timeout at the deadline"""
+        remaining = max(0, self._deadline_at - time.monotonic())
+        try:
+            return self._future.result(timeout=remaining)
+        except FutureTimeoutError:
+            raise requests.exceptions.Timeout(f'API call {self.path} exceeded the page deadline')
@@ -1,7 +1,14 @@
 from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
 from functools import wraps
+from api_client import APIClient, EmbeddedAPIClient
+from api_cache import APIResponseCache
+from fragment_cache import FragmentCache
+from markupsafe import Markup
+from image_variants import srcset
+from image_store import is_stored_url
 import requests
 import json
+import os
 
 # Create Flask app instance - Frontend only
 app = Flask(__name__)
@@ -13,7 +20,46 @@ app.config['SESSION_COOKIE_SECURE'] = False  # Set to True in production with HT
 app.config['PERMANENT_SESSION_LIFETIME'] = 3600  # 1 hour
 
 # API Backend URL
-API_BASE_URL = 'http://localhost:5000/api'
+API_BASE_URL = os.getenv('API_BASE_URL', 'http://localhost:5000/api')
+
+# API_MODE=http (default): call the API server over HTTP with a shared pooled client
+#   (keep-alive, retries for GETs)
+# API_MODE=embedded: single-box deployment - call api_app in-process, no HTTP hop
+API_MODE = os.getenv('API_MODE', 'http')
+
+if API_MODE == 'embedded':
+    from api_app import app as api_wsgi_app
+    api = EmbeddedAPIClient(
+        api_wsgi_app,
+        fanout_workers=int(os.getenv('API_FANOUT_WORKERS', '8'))
+    )
+else:
+    api = APIClient(
+        API_BASE_URL,
+        pool_size=int(os.getenv('API_POOL_SIZE', '20')),
+        timeout=float(os.getenv('API_TIMEOUT', '10')),
+        retries=int(os.getenv('API_RETRIES', '3')),
+        fanout_workers=int(os.getenv('API_FANOUT_WORKERS', '8'))
+    )
+
+# Stale-while-revalidate cache for the public catalog pages (home / gallery / detail).
+# Fresh for API_CACHE_TTL s, then served stale while refreshing for API_CACHE_STALE s;
+# if the API is down the last good copy is served for up to API_CACHE_ERROR_TTL s.
+api_cache = APIResponseCache(
+    api,
+    ttl=float(os.getenv('API_CACHE_TTL', '5')),
+    stale_ttl=float(os.getenv('API_CACHE_STALE', '30')),
+    error_ttl=float(os.getenv('API_CACHE_ERROR_TTL', '300'))
+)
+
+# Pre-rendered product grid / category sections, keyed by the API response ETag
+fragment_cache = FragmentCache()
+
+# Overall time budget (seconds) for the API calls a single page makes in parallel
+PAGE_API_DEADLINE = float(os.getenv('PAGE_API_DEADLINE', '8'))
+
+# Orders shown per page on the packing / all-orders pages
+ORDERS_PAGE_SIZE = 50
 
 ROLES = {
     1: 'god',       # ผู้ดูแลระบบสูงสุด - เข้าถึงได้ทุกอย่าง
@@ -126,6 +172,69 @@ def check_user_permissions():
         'can_use_cart': role_id in [1, 2, 3]           # All logged in
     }
 
+def fetch_orders_page(params, cursor=None):
+    """
+    ดึงคำสั่งซื้อทีละหน้าจาก API (keyset pagination)
+    Return (orders, next_cursor, total) หรือ raise ถ้า API ตอบกลับไม่สำเร็จ
+    (total = จำนวนคำสั่งซื้อทั้งหมดตามตัวกรอง มีเฉพาะหน้าแรก, หน้าถัดไปเป็น None)
+    """
+    params = dict(params, limit=ORDERS_PAGE_SIZE)
+    if cursor:
+        params['cursor'] = cursor
+    
+    response = api.get('/orders', params=params)
+    result = response.json()
+    
+    if not result.get('success'):
+        raise RuntimeError(result.get('message', 'Failed to fetch orders'))
+    
+    return add_review_eligibility(result.get('data', [])), result.get('next_cursor'), result.get('total')
+
+def add_review_eligibility(orders):
+    """
+    ตั้ง order['can_review'] ให้คำสั่งซื้อที่ลูกค้ายังรีวิวได้
+    (เรียก /reviews/eligibility ครั้งเดียวต่อหน้า แทนที่จะเรียกทีละสินค้า)
+    """
+    user_id = session.get('user_id')
+    p_ids = sorted({order['p_id'] for order in orders if order.get('p_id')})
+    if session.get('role_id', 3) != 3 or not user_id or not p_ids:
+        return orders
+    
+    try:
+        response = api.get('/reviews/eligibility', params={
+            'user_id': user_id,
+            'p_ids': ','.join(str(p_id) for p_id in p_ids)
+        })
+        result = response.json()
+        eligibility = result.get('data', {}) if result.get('success') else {}
+    except Exception as e:
+        # Without eligibility the page still works, just without review buttons
+        print(f"Error fetching review eligibility: {e}")
+        return orders
+    
+    for order in orders:
+        entry = eligibility.get(str(order.get('p_id'))) or {}
+        # One review per product: offered on its oldest completed order only
+        order['can_review'] = bool(entry.get('can_review')) and order.get('order_id') == entry.get('order_id')
+    return orders
+
+def get_order_list_params():
+    """พารามิเตอร์สำหรับหน้ารายการคำสั่งซื้อ - ลูกค้าเห็นเฉพาะของตัวเอง"""
+    role_id = session.get('role_id', 3)
+    params = {'role_id': role_id}
+    if role_id == 3:  # Customer - only see their own orders
+        params['user_id'] = session.get('user_id')
+    return params
+
+ORDER_STATUS_LABELS = {
+    1: 'Pending',
+    2: 'Processing',
+    3: 'Packing',
+    4: 'Delivery',
+    5: 'Completed',
+    6: 'Cancelled'
+}
+
 # Context Processor: ส่งข้อมูล permissions ไปยัง templates ทุกหน้า
 @app.context_processor
 def inject_user_permissions():
@@ -133,53 +242,107 @@ def inject_user_permissions():
     return {'user_perms': check_user_permissions()}
 
 
+# Content-addressed images (image_store.py) never change under the same URL
+IMMUTABLE_MAX_AGE_SECONDS = 365 * 24 * 3600
+
+
+@app.after_request
+def cache_stored_images(response):
+    """Let browsers / CDNs keep content-addressed static images forever"""
+    if response.status_code == 200 and request.path.startswith('/static/') and is_stored_url(request.path):
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE_SECONDS
+        response.cache_control.immutable = True
+        response.cache_control.no_cache = None
+    return response
+
+
+@app.template_global()
+def product_srcset(product, webp=False):
+    """srcset for a product's image variants (templates/product_image.html), '' if it has none"""
+    return srcset(product.get('image_variants'), lambda file: url_for('static', filename='images/products/' + file), webp)
+
+
+def render_catalog_fragment(template, etag, **context):
+    """Render a partial that depends only on catalog data, reusing the HTML
+    rendered earlier for the same API ETag (etag=None -> render uncached)"""
+    if not etag:
+        return Markup(render_template(template, **context))
+    return fragment_cache.get((template, etag), lambda: Markup(render_template(template, **context)))
+
+
 # ===== PUBLIC ROUTES (ไม่ต้องล็อกอิน) =====
 
 @app.route('/')
 def home():
     """หน้าแรก - เข้าได้ทุกคน"""
     categories_data = []
+    etag = None
     try:
         # Get categories with products
-        response = requests.get(f'{API_BASE_URL}/categories-with-products')
+        response = api_cache.get('/categories-with-products')
         if response.status_code == 200:
             result = response.json()
             if result.get('success'):
                 categories_data = result.get('data', [])
+                etag = response.headers.get('ETag')
     except Exception as e:
         print(f"Error fetching categories with products: {e}")
-        
-    return render_template('home.html', categories=categories_data)
+
+    categories_html = render_catalog_fragment('home_categories.html', etag, categories=categories_data)
+    return render_template('home.html', categories=categories_data, categories_html=categories_html)
+
+# Query parameters forwarded from /gallery to /api/gallery
+GALLERY_QUERY_PARAMS = ('category', 'min_price', 'max_price', 'q', 'sort', 'page')
+
+def get_gallery_params():
+    """ตัวกรอง / การเรียง / หน้า จาก query string ของหน้า gallery"""
+    return {key: request.args[key] for key in GALLERY_QUERY_PARAMS if request.args.get(key)}
+
+def render_gallery_grid(response):
+    """แปลงผลลัพธ์ /api/gallery เป็น (HTML ของกริดสินค้า, ข้อมูลหน้า)"""
+    response.raise_for_status()
+    result = response.json()
+    if not result.get('success'):
+        raise ValueError(result.get('message', 'Could not load gallery items.'))
+    
+    products_html = render_catalog_fragment('gallery_grid.html', response.headers.get('ETag'), products=result.get('data', []))
+    page_info = {
+        'total': result.get('total', 0),
+        'count': result.get('count', 0),
+        'next_page': result['page'] + 1 if result.get('has_more') else None
+    }
+    return products_html, page_info
 
 @app.route('/gallery')
 def gallery():
     """Toy page route - consumes API"""
-    products_data = []
+    products_html = render_catalog_fragment('gallery_grid.html', None, products=[])
+    page_info = {'total': 0, 'count': 0, 'next_page': None}
     categories_data = []
+    filters = get_gallery_params()
+    
+    # เรียก /api/gallery (เฉพาะหน้าที่แสดง) และ /api/categories พร้อมกัน (ไม่ขึ้นต่อกัน)
+    calls = api.get_many({
+        'products': ('/gallery', {'params': filters}),
+        'categories': '/categories'
+    }, deadline=PAGE_API_DEADLINE, get=api_cache.get)
+    
     try:
-        # 1. เรียกใช้งาน API endpoint /api/gallery
-        response = requests.get(f'{API_BASE_URL}/gallery')
-        response.raise_for_status()  # เช็คว่า request สำเร็จหรือไม่ (status code 2xx)
-
-        result = response.json()
-
-        # 2. ตรวจสอบว่า API ส่งข้อมูลกลับมาสำเร็จหรือไม่
-        if result.get('success'):
-            products_data = result.get('data', [])
-            print("--- [Frontend] Data received by gallery() route ---")
-            print(json.dumps(products_data, indent=2, ensure_ascii=False))
-        else:
-            flash(result.get('message', 'Could not load gallery items.'), 'error')
+        # ผลลัพธ์จาก API endpoint /api/gallery
+        products_html, page_info = render_gallery_grid(calls['products'].result())
 
     except requests.exceptions.RequestException as e:
         # แสดง Error กรณีเชื่อมต่อ API Server ไม่ได้
         flash('Error connecting to the API server. Please make sure it is running.', 'error')
+    except ValueError as e:
+        flash(str(e), 'error')
     except Exception as e:
         flash(f'An unexpected error occurred: {e}', 'error')
 
     # Load categories for filtering
     try:
-        categories_response = requests.get(f'{API_BASE_URL}/categories')
+        categories_response = calls['categories'].result()
         categories_response.raise_for_status()
         
         categories_result = categories_response.json()
@@ -189,8 +352,27 @@ def gallery():
     except Exception as e:
         print(f"Error fetching categories for gallery: {e}")
 
-    # 3. ส่งตัวแปร products_data และ categories_data ไปให้ gallery.html
-    return render_template('gallery.html', products=products_data, categories=categories_data, url_for_detail=url_for('gallery_detail', p_id=0))
+    return render_template('gallery.html', products_html=products_html, page_info=page_info,
+                           categories=categories_data, filters=filters,
+                           url_for_detail=url_for('gallery_detail', p_id=0))
+
+@app.route('/gallery/grid')
+def gallery_grid():
+    """HTML ของกริดสินค้าหนึ่งหน้า สำหรับ gallery.js (เปลี่ยนตัวกรอง / โหลดเพิ่ม)"""
+    try:
+        products_html, page_info = render_gallery_grid(api_cache.get('/gallery', params=get_gallery_params()))
+        return jsonify({
+            'success': True,
+            'html': products_html,
+            **page_info
+        }), 200
+    
+    except Exception as e:
+        print(f"Error fetching gallery page: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'ไม่สามารถโหลดสินค้าได้'
+        }), 500
 
 @app.route('/gallery/detail/<int:p_id>')
 def gallery_detail(p_id):
@@ -198,7 +380,7 @@ def gallery_detail(p_id):
     product = None
     try:
         # 1. เรียกใช้งาน API endpoint /api/gallery/detail/<p_id>
-        response = requests.get(f'{API_BASE_URL}/gallery/detail/{p_id}')
+        response = api_cache.get(f'/gallery/detail/{p_id}')
         response.raise_for_status()  # เช็คว่า request สำเร็จหรือไม่ (status code 2xx)
 
         result = response.json()
@@ -230,6 +412,11 @@ def about():
     """เกี่ยวกับเรา - เข้าได้ทุกคน"""
     return render_template('about.html')
 
+@app.route('/metrics/api-cache')
+def api_cache_metrics():
+    """ตัวนับ hit / miss / stale ของ api_cache (Prometheus text format)"""
+    return api_cache.metrics(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
 @app.route('/contact')
 def contact():
     """ติดต่อเรา - เข้าได้ทุกคน"""
@@ -261,7 +448,7 @@ def login():
             }
             print(f"🔍 DEBUG - Sending to API: email={email_or_username}, username={email_or_username}")
             
-            response = requests.post(f'{API_BASE_URL}/login', json=login_data, timeout=10)
+            response = api.post('/login', json=login_data)
             
             result = response.json()
             
@@ -342,7 +529,7 @@ def register():
         api_data = {k: v for k, v in form_data.items() if k != 'confirm_password'}
         
         try:
-            response = requests.post(f'{API_BASE_URL}/register', json=api_data, timeout=10)
+            response = api.post('/register', json=api_data)
             result = response.json()
             
             if result.get('success'):
@@ -379,40 +566,39 @@ def cart():
 @app.route('/orders')
 @customer_or_above
 def all_orders():
-    """คำสั่งซื้อทั้งหมด"""
+    """คำสั่งซื้อทั้งหมด (หน้าแรก - หน้าถัดไปโหลดผ่าน /orders/rows)"""
+    next_cursor = None
+    total = 0
     try:
-        user_id = session.get('user_id')
-        role_id = session.get('role_id', 3)
-        
-        # Build API URL with parameters
-        params = {'role_id': role_id}
-        if role_id == 3:  # Customer - only see their own orders
-            params['user_id'] = user_id
-        
-        response = requests.get(f'{API_BASE_URL}/orders', params=params, timeout=10)
-        result = response.json()
-        
-        if result.get('success'):
-            orders = result.get('data', [])
-        else:
-            flash('❌ ไม่สามารถโหลดข้อมูลคำสั่งซื้อได้', 'error')
-            orders = []
+        orders, next_cursor, total = fetch_orders_page(get_order_list_params())
     
     except Exception as e:
         print(f"Error fetching orders: {e}")
         flash('❌ เกิดข้อผิดพลาดในการโหลดข้อมูล', 'error')
         orders = []
     
-    status_labels = {
-        1: 'Pending',
-        2: 'Processing',
-        3: 'Packing',
-        4: 'Delivery',
-        5: 'Completed',
-        6: 'Cancelled'
-    }
+    return render_template('allorder.html', orders=orders, status_labels=ORDER_STATUS_LABELS, next_cursor=next_cursor,
+                           total=total)
+
+@app.route('/orders/rows')
+@customer_or_above
+def all_orders_rows():
+    """โหลดคำสั่งซื้อหน้าถัดไป (HTML แถวตาราง) สำหรับปุ่มโหลดเพิ่มเติม"""
+    try:
+        orders, next_cursor, _ = fetch_orders_page(get_order_list_params(), request.args.get('cursor'))
+        return jsonify({
+            'success': True,
+            'html': render_template('allorder_rows.html', orders=orders, status_labels=ORDER_STATUS_LABELS),
+            'count': len(orders),
+            'next_cursor': next_cursor
+        }), 200
     
-    return render_template('allorder.html', orders=orders, status_labels=status_labels)
+    except Exception as e:
+        print(f"Error fetching more orders: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'ไม่สามารถโหลดคำสั่งซื้อเพิ่มเติมได้'
+        }), 500
 
 @app.route('/tracking', methods=['GET', 'POST'])
 @customer_or_above
@@ -428,7 +614,7 @@ def tracking():
         else:
             try:
                 # Call API to get order details
-                response = requests.get(f'{API_BASE_URL}/orders/{order_id}', timeout=10)
+                response = api.get(f'/orders/{order_id}')
                 result = response.json()
                 
                 if result.get('success'):
@@ -458,7 +644,7 @@ def manage_product():
     categories = []
     try:
         # เรียก API เพื่อดึงข้อมูล categories
-        response = requests.get(f'{API_BASE_URL}/categories')
+        response = api.get('/categories')
         if response.ok:
             result = response.json()
             if result.get('success'):
@@ -502,10 +688,9 @@ def update_order_status():
             }), 400
         
         # Call API to update order status
-        response = requests.patch(
-            f'{API_BASE_URL}/orders/{order_id}',
-            json={'status_id': status_id},
-            timeout=10
+        response = api.patch(
+            f'/orders/{order_id}',
+            json={'status_id': status_id}
         )
         result = response.json()
         
@@ -531,25 +716,54 @@ def update_order_status():
 @app.route('/packing')
 @staff_or_above
 def packing():
-    """จัดการแพ็คสินค้า - Staff และ God เห็นทุก order"""
+    """จัดการแพ็คสินค้า - Staff และ God เห็นทุก order (หน้าถัดไปโหลดผ่าน /packing/rows)"""
+    next_cursor = None
+    total = 0
     try:
-        # Get all orders (Staff and God can see everything)
-        response = requests.get(f'{API_BASE_URL}/orders', timeout=10)
-        result = response.json()
-        
-        if result.get('success'):
-            # Staff (role_id=2) and God (role_id=1) can see all orders
-            orders = result.get('data', [])
-        else:
-            flash('❌ ไม่สามารถโหลดข้อมูลคำสั่งซื้อได้', 'error')
-            orders = []
+        # Staff (role_id=2) and God (role_id=1) can see all orders
+        orders, next_cursor, total = fetch_orders_page({})
     
     except Exception as e:
         print(f"Error fetching orders for packing: {e}")
         flash('❌ เกิดข้อผิดพลาดในการโหลดข้อมูล', 'error')
         orders = []
     
-    return render_template('packing.html', orders=orders)
+    return render_template('packing.html', orders=orders, next_cursor=next_cursor, total=total)
+
+def get_packing_filter_params():
+    """ตัวกรองของหน้าแพ็คกิ้ง (สถานะ / คำค้นหา) - กรองที่ API ไม่ใช่แค่แถวที่โหลดมาแล้ว"""
+    params = {}
+    status_id = request.args.get('status_id', type=int)
+    if status_id:
+        params['status_id'] = status_id
+    search = (request.args.get('q') or '').strip()
+    if search:
+        params['q'] = search
+    return params
+
+@app.route('/packing/rows')
+@staff_or_above
+def packing_rows():
+    """โหลดคำสั่งซื้อ (HTML แถวตาราง) สำหรับหน้าแพ็คกิ้ง
+    
+    ไม่มี cursor = หน้าแรกของตัวกรองใหม่ (มี total), มี cursor = หน้าถัดไป
+    """
+    try:
+        orders, next_cursor, total = fetch_orders_page(get_packing_filter_params(), request.args.get('cursor'))
+        return jsonify({
+            'success': True,
+            'html': render_template('packing_rows.html', orders=orders),
+            'count': len(orders),
+            'total': total,
+            'next_cursor': next_cursor
+        }), 200
+    
+    except Exception as e:
+        print(f"Error fetching more orders for packing: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'ไม่สามารถโหลดคำสั่งซื้อเพิ่มเติมได้'
+        }), 500
 
 # ===== PROTECTED ROUTES - GOD ONLY =====
 
@@ -558,7 +772,7 @@ def packing():
 def users():
     """จัดการผู้ใช้"""
     try:
-        response = requests.get(f'{API_BASE_URL}/users', timeout=10)
+        response = api.get('/users')
         result = response.json()
         
         if result.get('success'):
@@ -605,7 +819,7 @@ def admin_add_user():
         
         try:
             # Call API to create user
-            response = requests.post(f'{API_BASE_URL}/register', json=form_data, timeout=10)
+            response = api.post('/register', json=form_data)
             result = response.json()
             
             if result.get('success'):
@@ -665,7 +879,7 @@ if __name__ == '__main__':
     print("   2. Staff (พนักงาน) - Manage products & packing")
     print("   3. Customer (ลูกค้า) - Shop & orders")
     print("="*60)
-    print("🔗 API Backend: http://localhost:5000")
+    print(f"🔗 API Backend: {'embedded (in-process)' if API_MODE == 'embedded' else API_BASE_URL}")
     print("🌐 Frontend: http://localhost:8080")
     print("="*60)
     
@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CatalogCache:
+    """In-process cache for catalog payloads (products / categories)
+
+    Every entry is stamped with the catalog version it was built from.
+    Any product or category write calls bump(), which moves the version
+    forward so all older entries become misses. Concurrent misses on the
+    same key are coalesced: one request rebuilds while the others wait
+    and then reuse its result.
+
+    When several worker processes serve the API, each one has its own
+    cache. use_version_source() points the cache at a shared version
+    counter (the catalog_version table) which is re-read at most once
+    every poll_interval seconds, so a write on one worker invalidates the
+    caches of all the others within that interval.
+
+    Keys are unbounded by default (one per product / listing). Keys that
+    come from request parameters should be (group, ...) tuples with a
+    limit_group() cap - the least recently used entries of the group are
+    dropped past it.
+    """
+
+    def __init__(self, poll_interval=1.0):
+        self._lock = threading.Lock()
+        self._version = 0
+        self._entries = {}    # key -> (version, value)
+        self._key_locks = {}  # key -> Lock used while rebuilding that key
+        self._group_limits = {}  # group -> max entries
+        self._groups = {}        # group -> OrderedDict of its keys, least recently used first
+        self._load_version = None
+        self._poll_interval = poll_interval
+        self._checked_at = None
+
+    def use_version_source(self, load_version, poll_interval=None):
+        """Read the catalog version from load_version() instead of a local counter"""
+        with self._lock:
+            self._load_version = load_version
+            if poll_interval is not None:
+                self._poll_interval = poll_interval
+            self._checked_at = None
+
+    def limit_group(self, group, max_entries):
+        """Keep at most max_entries entries whose key is a (group, ...) tuple"""
+        with self._lock:
+            self._group_limits[group] = max_entries
+            self._groups.setdefault(group, OrderedDict())
+
+    def version(self):
+        """Current catalog version"""
+        self._refresh_version()
+        return self._version
+
+    def bump(self):
+        """Invalidate every cached entry (call after a catalog write commits)
+
+        With a shared version source the new version is re-read on the next
+        access, so this worker sees its own write immediately.
+        """
+        with self._lock:
+            if self._load_version is None:
+                self._version += 1
+            self._checked_at = None
+            self._clear()
+
+    def discard(self, key):
+        """Drop one entry without moving the version (a write that touches only that entry)"""
+        with self._lock:
+            self._entries.pop(key, None)
+            group_keys = self._group_keys(key)
+            if group_keys is not None:
+                group_keys.pop(key, None)
+
+    def _refresh_version(self):
+        if self._load_version is None:
+            return
+
+        now = time.monotonic()
+        checked_at = self._checked_at
+        if checked_at is not None and now - checked_at < self._poll_interval:
+            return
+
+        version = self._load_version()
+        with self._lock:
+            self._checked_at = now
+            if version != self._version:
+                self._version = version
+                self._clear()
+
+    def _clear(self):
+        self._entries.clear()
+        self._key_locks.clear()
+        for keys in self._groups.values():
+            keys.clear()
+
+    def _group_keys(self, key):
+        """LRU key order of key's group, or None for an unbounded key"""
+        if isinstance(key, tuple) and key:
+            return self._groups.get(key[0])
+        return None
+
+    def get(self, key, builder):
+        """Return the cached value for key, calling builder() on a miss
+
+        A builder result of None (e.g. product not found) is returned but
+        not cached, so lookups of missing ids can't grow the cache.
+        """
+        self._refresh_version()
+
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == self._version:
+            group_keys = self._group_keys(key)
+            if group_keys is not None:
+                with self._lock:
+                    if key in group_keys:
+                        group_keys.move_to_end(key)
+            return entry[1]
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Another request may have rebuilt the entry while we waited
+            version = self._version
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+
+            value = builder()
+
+            with self._lock:
+                # Don't store a result that a concurrent write already made stale
+                if value is not None and version == self._version:
+                    self._entries[key] = (version, value)
+                    self._track(key)
+            return value
+
+    def _track(self, key):
+        """Record key in its group's LRU order and evict past the limit (holding self._lock)"""
+        group_keys = self._group_keys(key)
+        if group_keys is None:
+            return
+        group_keys[key] = None
+        group_keys.move_to_end(key)
+        while len(group_keys) > self._group_limits[key[0]]:
+            evicted, _ = group_keys.popitem(last=False)
+            self._entries.pop(evicted, None)
+            self._key_locks.pop(evicted, None)
+
+
+catalog_cache = CatalogCache()
@@ -134,6 +134,15 @@ if %ERRORLEVEL% EQU 0 (
     echo ⚠️  phpMyAdmin container not running
 )
 
+REM Bring an existing database volume up to the current schema
+echo Applying database migrations...
+python migrate.py
+if %ERRORLEVEL% NEQ 0 (
+    echo ❌ Database migration failed
+    pause
+    exit /b 1
+)
+
 echo.
 echo 🚀 Step 4: Starting Flask Applications...
 echo.
@@ -131,6 +131,13 @@ else
     echo -e "${YELLOW}⚠️  phpMyAdmin container not running${NC}"
 fi
 
+# Bring an existing database volume up to the current schema
+echo -e "${CYAN}Applying database migrations...${NC}"
+if ! python3 migrate.py; then
+    echo -e "${RED}❌ Database migration failed${NC}"
+    exit 1
+fi
+
 echo -e "\n${BLUE}🚀 Step 4: Starting Flask Applications...${NC}"
 
 # Kill any existing Flask processes
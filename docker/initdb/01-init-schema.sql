@@ -41,6 +41,25 @@ INSERT INTO `categories` (`c_id`, `name`) VALUES
 
 -- --------------------------------------------------------
 
+--
+-- Table structure for table `catalog_version`
+--
+
+CREATE TABLE `catalog_version` (
+  `id` int(11) NOT NULL,
+  `version` bigint(20) NOT NULL DEFAULT 0,
+  `updated_at` timestamp NULL DEFAULT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='bumped on every product/category write';
+
+--
+-- Dumping data for table `catalog_version`
+--
+
+INSERT INTO `catalog_version` (`id`, `version`, `updated_at`) VALUES
+(1, 0, NULL);
+
+-- --------------------------------------------------------
+
 --
 -- Table structure for table `orders`
 --
@@ -102,6 +121,7 @@ CREATE TABLE `products` (
   `size` varchar(50) NOT NULL DEFAULT '',
   `price` decimal(10,2) NOT NULL,
   `image` text NOT NULL,
+  `image_variants` longtext DEFAULT NULL CHECK (json_valid(`image_variants`)),
   `created_at` timestamp NOT NULL DEFAULT current_timestamp(),
   `updated_at` timestamp NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp()
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -133,6 +153,31 @@ INSERT INTO `product_categories` (`p_id`, `c_id`) VALUES
 
 -- --------------------------------------------------------
 
+--
+-- Table structure for table `product_ratings`
+--
+
+CREATE TABLE `product_ratings` (
+  `p_id` int(11) NOT NULL,
+  `review_count` int(11) NOT NULL DEFAULT 0,
+  `score_sum` int(11) NOT NULL DEFAULT 0,
+  `score_1` int(11) NOT NULL DEFAULT 0,
+  `score_2` int(11) NOT NULL DEFAULT 0,
+  `score_3` int(11) NOT NULL DEFAULT 0,
+  `score_4` int(11) NOT NULL DEFAULT 0,
+  `score_5` int(11) NOT NULL DEFAULT 0,
+  `updated_at` datetime DEFAULT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='maintained by the review endpoints';
+
+--
+-- Dumping data for table `product_ratings`
+--
+
+INSERT INTO `product_ratings` (`p_id`, `review_count`, `score_sum`, `score_1`, `score_2`, `score_3`, `score_4`, `score_5`, `updated_at`) VALUES
+(1, 1, 4, 0, 0, 0, 1, 0, '2025-10-10 13:57:11');
+
+-- --------------------------------------------------------
+
 --
 -- Table structure for table `reviews`
 --
@@ -246,14 +291,22 @@ INSERT INTO `user_info` (`u_id`, `firstname`, `lastname`, `street_address`, `cit
 ALTER TABLE `categories`
   ADD PRIMARY KEY (`c_id`);
 
+--
+-- Indexes for table `catalog_version`
+--
+ALTER TABLE `catalog_version`
+  ADD PRIMARY KEY (`id`);
+
 --
 -- Indexes for table `orders`
 --
 ALTER TABLE `orders`
   ADD PRIMARY KEY (`order_id`),
-  ADD KEY `fk_orders_user` (`u_id`),
-  ADD KEY `fk_orders_status` (`status_id`),
-  ADD KEY `fk_orders_product` (`p_id`);
+  ADD KEY `fk_orders_product` (`p_id`),
+  ADD KEY `idx_orders_date_id` (`order_date`,`order_id`),
+  ADD KEY `idx_orders_user_date` (`u_id`,`order_date`,`order_id`),
+  ADD KEY `idx_orders_status_date` (`status_id`,`order_date`,`order_id`),
+  ADD KEY `idx_orders_user_product_status` (`u_id`,`p_id`,`status_id`);
 
 --
 -- Indexes for table `order_statuses`
@@ -266,7 +319,10 @@ ALTER TABLE `order_statuses`
 -- Indexes for table `products`
 --
 ALTER TABLE `products`
-  ADD PRIMARY KEY (`p_id`);
+  ADD PRIMARY KEY (`p_id`),
+  ADD KEY `idx_products_name_id` (`name`,`p_id`),
+  ADD KEY `idx_products_price_id` (`price`,`p_id`),
+  ADD KEY `idx_products_created_id` (`created_at`,`p_id`);
 
 --
 -- Indexes for table `product_categories`
@@ -275,14 +331,20 @@ ALTER TABLE `product_categories`
   ADD PRIMARY KEY (`p_id`,`c_id`),
   ADD KEY `fk_category_link` (`c_id`);
 
+--
+-- Indexes for table `product_ratings`
+--
+ALTER TABLE `product_ratings`
+  ADD PRIMARY KEY (`p_id`);
+
 --
 -- Indexes for table `reviews`
 --
 ALTER TABLE `reviews`
   ADD PRIMARY KEY (`review_id`),
-  ADD KEY `fk_reviews_product` (`p_id`),
+  ADD UNIQUE KEY `uq_reviews_o_id` (`o_id`),
   ADD KEY `fk_reviews_user` (`u_id`),
-  ADD KEY `idx_reviews_o_id` (`o_id`);
+  ADD KEY `idx_reviews_product_date` (`p_id`,`review_date`);
 
 --
 -- Indexes for table `roles`
@@ -371,6 +433,12 @@ ALTER TABLE `product_categories`
   ADD CONSTRAINT `fk_category_link` FOREIGN KEY (`c_id`) REFERENCES `categories` (`c_id`) ON DELETE CASCADE,
   ADD CONSTRAINT `fk_product_link` FOREIGN KEY (`p_id`) REFERENCES `products` (`p_id`) ON DELETE CASCADE;
 
+--
+-- Constraints for table `product_ratings`
+--
+ALTER TABLE `product_ratings`
+  ADD CONSTRAINT `fk_product_ratings_product` FOREIGN KEY (`p_id`) REFERENCES `products` (`p_id`) ON DELETE CASCADE;
+
 --
 -- Constraints for table `reviews`
 --
@@ -0,0 +1,40 @@
+import threading
+from collections import OrderedDict
+
+
+class FragmentCache:
+    """Rendered HTML fragments keyed by (template, API ETag)
+
+    The catalog endpoints return an ETag that changes with the catalog
+    version, so a fragment rendered from an unchanged payload can be
+    reused as-is. After a catalog write the ETag changes, the old entry
+    is simply never asked for again and drops out of the LRU.
+
+    Only cache fragments that depend on the payload alone - per-user
+    parts of the page (navbar, flash messages) stay in the outer template.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, render):
+        """Return the fragment for key, calling render() on a miss"""
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                return html
+
+        html = render()
+
+        with self._lock:
+            self._entries[key] = html
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return html
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
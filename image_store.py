@@ -0,0 +1,123 @@
+import hashlib
+import os
+import re
+import shutil
+import uuid
+
+# Files are copied / hashed in blocks of this size (bounded memory for any file size)
+COPY_BLOCK_BYTES = 64 * 1024
+
+# <2 hex>/<2 hex>/<sha256>.<ext> - 65536 directories keep each one small at any file count
+STORED_NAME_RE = re.compile(r'^([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}\.[a-z0-9]+$')
+# Same, at the end of a URL path (for cache headers)
+STORED_URL_RE = re.compile(r'/([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}\.[a-z0-9]+$')
+
+TMP_DIR = '.tmp'
+
+
+def is_stored_url(path):
+    """True for a URL path ending in a content-addressed name (its bytes never change)"""
+    return STORED_URL_RE.search(path) is not None
+
+
+class ContentAddressedStore:
+    """Image files named by the sha256 of their content
+
+    put() / put_path() return a name like 'ab/cd/abcd...ef.jpg' relative
+    to root - that name is what gets saved in the database, so existing
+    'images/products/' + name URLs keep working. Identical uploads map to
+    the same name and are stored once; different uploads can't overwrite
+    each other, and a name's bytes never change, so URLs of stored files
+    can be cached forever.
+
+    New files are written to root/.tmp and renamed into place, so a
+    stored name is either absent or complete. Stored files may be shared
+    by several rows and are never deleted here (the orphan sweep removes
+    the ones nothing references).
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, name):
+        """Filesystem path of a stored name"""
+        return os.path.join(self.root, *name.split('/'))
+
+    def put(self, file, extension):
+        """Store a werkzeug FileStorage (or any object with .stream / .read); returns the name"""
+        stream = getattr(file, 'stream', file)
+        tmp_path, digest = self._write_tmp(stream)
+        return self._commit(tmp_path, digest, extension)
+
+    def put_path(self, source_path, extension, move=False):
+        """Store the file at source_path; returns the name
+
+        The source is left in place unless move=True (then it is renamed
+        into the store when new, or removed when the content is already
+        stored).
+        """
+        digest = hashlib.sha256()
+        with open(source_path, 'rb') as f:
+            for block in iter(lambda: f.read(COPY_BLOCK_BYTES), b''):
+                digest.update(block)
+        digest = digest.hexdigest()
+
+        name = self._name(digest, extension)
+        if self._reuse(name):
+            if move:
+                os.remove(source_path)
+            return name
+
+        if move:
+            tmp_path = source_path
+        else:
+            tmp_path = self.tmp_path()
+            try:
+                # A hard link costs no copy; fall back to copying across filesystems
+                os.link(source_path, tmp_path)
+            except OSError:
+                shutil.copyfile(source_path, tmp_path)
+        return self._commit(tmp_path, digest, extension)
+
+    def tmp_path(self):
+        """A fresh temp file path inside the store (same filesystem, so put_path(move=True) is a rename)"""
+        tmp_dir = os.path.join(self.root, TMP_DIR)
+        os.makedirs(tmp_dir, exist_ok=True)
+        return os.path.join(tmp_dir, uuid.uuid4().hex + '.part')
+
+    def _write_tmp(self, stream):
+        digest = hashlib.sha256()
+        tmp_path = self.tmp_path()
+        try:
+            with open(tmp_path, 'wb') as f:
+                for block in iter(lambda: stream.read(COPY_BLOCK_BYTES), b''):
+                    digest.update(block)
+                    f.write(block)
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        return tmp_path, digest.hexdigest()
+
+    def _reuse(self, name):
+        """True if name is already stored; touches it so the new reference is inside
+        the orphan sweep's grace period (upload_gc.py)"""
+        try:
+            os.utime(self.path(name))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _name(self, digest, extension):
+        return f"{digest[:2]}/{digest[2:4]}/{digest}.{extension.lower().lstrip('.')}"
+
+    def _commit(self, tmp_path, digest, extension):
+        name = self._name(digest, extension)
+        if self._reuse(name):
+            os.remove(tmp_path)
+            return name
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        return name
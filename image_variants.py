@@ -0,0 +1,117 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+from image_store import ContentAddressedStore
+
+# Widths generated for each product image; the browser picks one through
+# srcset. 320 / 640 cover gallery cards at 1x / 2x, 1280 the detail page.
+VARIANT_WIDTHS = (320, 640, 1280)
+
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+
+
+def _fallback_format(image):
+    """Format for browsers without WebP: PNG keeps transparency, JPEG otherwise"""
+    if image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info):
+        return 'png'
+    return 'jpeg'
+
+
+def generate_variants(folder, image):
+    """Write resized + WebP copies of folder/image; returns the variant list
+
+    Runs in a worker process (only needs Pillow and the file). Variants
+    are saved in folder's content-addressed store (image_store.py), so
+    their URLs are immutable like the original's.
+
+    Returns [{'width', 'height', 'format', 'file', 'bytes'}], file a store
+    name relative to folder, smallest first. Widths at or above the original are skipped
+    (no upscaling) - an image narrower than the smallest width still gets
+    one re-encoded copy at its own width.
+    """
+    store = ContentAddressedStore(folder)
+
+    with Image.open(os.path.join(folder, image)) as original:
+        original = ImageOps.exif_transpose(original)
+        fallback = _fallback_format(original)
+        widths = [width for width in VARIANT_WIDTHS if width < original.width] or [original.width]
+
+        variants = []
+        for width in widths:
+            height = max(1, round(original.height * width / original.width))
+            resized = original.resize((width, height), Image.LANCZOS) if width != original.width else original
+            if fallback == 'png':
+                resized = resized.convert('RGBA')
+            else:
+                resized = resized.convert('RGB')
+
+            for image_format in ('webp', fallback):
+                tmp_path = store.tmp_path()
+                if image_format == 'webp':
+                    resized.save(tmp_path, 'WEBP', quality=WEBP_QUALITY, method=4)
+                elif image_format == 'jpeg':
+                    resized.save(tmp_path, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+                else:
+                    resized.save(tmp_path, 'PNG', optimize=True)
+                name = store.put_path(tmp_path, 'jpg' if image_format == 'jpeg' else image_format, move=True)
+                variants.append({
+                    'width': width,
+                    'height': height,
+                    'format': image_format,
+                    'file': name,
+                    'bytes': os.path.getsize(store.path(name))
+                })
+    return variants
+
+
+class ImageVariantPipeline:
+    """Generates product image variants on a process pool after upload
+
+    submit() returns immediately; resizing / encoding happens in worker
+    processes (CPU bound, so threads would serialize on the GIL) and
+    on_done(p_id, image, future) is called in this process when the job
+    ends - future.result() is the variant list, or raises what the worker
+    raised. The pool is started on first use, with the spawn start method:
+    a forked child of a threaded server process could inherit locks held
+    by other threads (logging, the SQLAlchemy pool) and deadlock on them.
+    """
+
+    def __init__(self, folder, on_done, max_workers=2):
+        self.folder = folder
+        self.on_done = on_done
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def submit(self, p_id, image):
+        """Queue variant generation for product p_id's image; returns the Future"""
+        future = self._pool().submit(generate_variants, self.folder, image)
+        future.add_done_callback(lambda done: self.on_done(p_id, image, done))
+        return future
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+def srcset(variants, url_for_file, webp=False):
+    """'url 320w, url 640w' for the WebP variants, or the JPEG / PNG ones ('' if none)"""
+    return ', '.join(
+        f"{url_for_file(variant['file'])} {variant['width']}w"
+        for variant in variants or [] if (variant['format'] == 'webp') == webp
+    )
@@ -0,0 +1,148 @@
+"""Versioned schema migrations for the EchoArty database
+
+    python3 migrate.py            apply pending migrations/NNNN_name.sql in order
+    python3 migrate.py status     list applied and pending migrations
+    python3 migrate.py images     generate missing product image variants (thumbnails + WebP)
+
+Applied versions are recorded in the schema_migrations table. Migration
+files are written idempotently (IF NOT EXISTS / IF EXISTS), so running
+them against a database created from docker/initdb is a no-op, and a
+migration that failed half way can simply be run again. The hot queries'
+index use is checked by tests/test_query_plans.py.
+"""
+import os
+import re
+import sys
+
+from sqlalchemy import text
+
+from api_app import app, image_variant_pipeline
+from models import db, Product, get_thai_time
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_FILE_RE = re.compile(r'^(\d{4})_(\w+)\.sql$')
+
+
+def load_migrations():
+    """[(version, name, path)] sorted by version"""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = MIGRATION_FILE_RE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    return sorted(migrations)
+
+
+def split_statements(sql):
+    """Split a migration file into statements (drops -- comment lines)"""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    return [statement.strip() for statement in '\n'.join(lines).split(';') if statement.strip()]
+
+
+def ensure_migrations_table(connection):
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " version INT NOT NULL PRIMARY KEY,"
+        " name VARCHAR(100) NOT NULL,"
+        " applied_at DATETIME NOT NULL)"
+    ))
+
+
+def applied_versions(connection):
+    ensure_migrations_table(connection)
+    return {row[0] for row in connection.execute(text('SELECT version FROM schema_migrations'))}
+
+
+def migrate():
+    """Apply every migration not yet recorded in schema_migrations"""
+    if db.engine.dialect.name not in ('mysql', 'mariadb'):
+        print(f"Migrations are written for MariaDB, not {db.engine.dialect.name} - "
+              "use db.create_all() for a local database")
+        return 1
+
+    with db.engine.connect() as connection:
+        done = applied_versions(connection)
+        connection.commit()
+
+        pending = [migration for migration in load_migrations() if migration[0] not in done]
+        if not pending:
+            print("✅ Database schema is up to date")
+            return 0
+
+        for version, name, path in pending:
+            print(f"⏳ Applying {version:04d}_{name} ...")
+            with open(path, encoding='utf-8') as f:
+                statements = split_statements(f.read())
+            try:
+                # MariaDB commits DDL implicitly, so a migration is not atomic;
+                # its statements are idempotent and it is only recorded once all ran
+                for statement in statements:
+                    connection.execute(text(statement))
+                connection.execute(
+                    text('INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :applied_at)'),
+                    {'version': version, 'name': name, 'applied_at': get_thai_time()}
+                )
+                connection.commit()
+            except Exception as e:
+                connection.rollback()
+                print(f"❌ Migration {version:04d}_{name} failed: {e}")
+                return 1
+            print(f"✅ Applied {version:04d}_{name}")
+    return 0
+
+
+def status():
+    with db.engine.connect() as connection:
+        done = applied_versions(connection)
+        connection.commit()
+    for version, name, _ in load_migrations():
+        print(f"{'applied' if version in done else 'pending'}  {version:04d}_{name}")
+    return 0
+
+
+# ======= IMAGE VARIANTS =======
+
+def images():
+    """Queue every product image without variants on the variant pipeline and wait for it"""
+    products = db.session.query(Product.p_id, Product.image).filter(
+        Product.image.isnot(None), Product.image != '', Product.image_variants.is_(None)
+    ).all()
+    queued = []
+    for p_id, image in products:
+        if not os.path.isfile(os.path.join(image_variant_pipeline.folder, image)):
+            print(f"⚠️  Product {p_id}: {image} not found, skipped")
+            continue
+        image_variant_pipeline.submit(p_id, image)
+        queued.append(p_id)
+    # Waits for the workers and for the callbacks that save the variants
+    image_variant_pipeline.shutdown(wait=True)
+
+    db.session.expire_all()
+    failed = 0
+    for product in Product.query.filter(Product.p_id.in_(queued)).all() if queued else []:
+        if not product.image_variants:
+            failed += 1
+            print(f"❌ Product {product.p_id}: {product.image} failed (see log)")
+            continue
+        original = os.path.getsize(os.path.join(image_variant_pipeline.folder, product.image))
+        smallest = min(variant['bytes'] for variant in product.image_variants)
+        print(f"✅ Product {product.p_id}: {product.image} {original // 1024} KB -> "
+              f"{len(product.image_variants)} variants, smallest {smallest // 1024} KB")
+    print(f"\n{len(queued) - failed} of {len(products)} product images processed")
+    return 1 if failed else 0
+
+
+COMMANDS = {
+    'migrate': migrate,
+    'status': status,
+    'images': images,
+}
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'migrate'
+    if command not in COMMANDS:
+        print(__doc__)
+        sys.exit(2)
+
+    with app.app_context():
+        sys.exit(COMMANDS[command]())
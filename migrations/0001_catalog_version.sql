@@ -0,0 +1,11 @@
+-- Catalog version counter shared by all API workers (catalog cache,
+-- search index and autocomplete are rebuilt when it changes)
+
+CREATE TABLE IF NOT EXISTS `catalog_version` (
+  `id` int(11) NOT NULL,
+  `version` bigint(20) NOT NULL DEFAULT 0,
+  `updated_at` timestamp NULL DEFAULT NULL,
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='bumped on every product/category write';
+
+INSERT IGNORE INTO `catalog_version` (`id`, `version`, `updated_at`) VALUES (1, 0, NULL);
@@ -0,0 +1,9 @@
+-- Keyset pagination of /api/orders and server-side gallery sorting
+
+ALTER TABLE `orders`
+  ADD KEY IF NOT EXISTS `idx_orders_date_id` (`order_date`,`order_id`);
+
+ALTER TABLE `products`
+  ADD KEY IF NOT EXISTS `idx_products_name_id` (`name`,`p_id`),
+  ADD KEY IF NOT EXISTS `idx_products_price_id` (`price`,`p_id`),
+  ADD KEY IF NOT EXISTS `idx_products_created_id` (`created_at`,`p_id`);
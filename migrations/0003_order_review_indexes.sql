@@ -0,0 +1,32 @@
+-- Composite indexes for the order / review access paths
+--
+-- The single-column FK keys they replace are left prefixes of the new
+-- indexes, so the foreign keys keep an index to use and the old keys are
+-- dropped afterwards (one less index to maintain per insert).
+--
+-- uq_reviews_o_id fails if an order already has more than one review;
+-- find those first with:
+--   SELECT o_id, COUNT(*) FROM reviews GROUP BY o_id HAVING COUNT(*) > 1;
+
+-- /api/orders for a customer: WHERE u_id = ? ORDER BY order_date DESC, order_id DESC
+-- /api/orders by status:      WHERE status_id = ? ORDER BY order_date DESC, order_id DESC
+-- review eligibility:         WHERE u_id = ? AND p_id = ? AND status_id IN (...)
+--                             (covering - order_id is the primary key)
+ALTER TABLE `orders`
+  ADD KEY IF NOT EXISTS `idx_orders_user_date` (`u_id`,`order_date`,`order_id`),
+  ADD KEY IF NOT EXISTS `idx_orders_status_date` (`status_id`,`order_date`,`order_id`),
+  ADD KEY IF NOT EXISTS `idx_orders_user_product_status` (`u_id`,`p_id`,`status_id`);
+
+ALTER TABLE `orders`
+  DROP KEY IF EXISTS `fk_orders_user`,
+  DROP KEY IF EXISTS `fk_orders_status`;
+
+-- Product reviews: WHERE p_id = ? ORDER BY review_date DESC
+-- One review per order: WHERE o_id = ?
+ALTER TABLE `reviews`
+  ADD KEY IF NOT EXISTS `idx_reviews_product_date` (`p_id`,`review_date`),
+  ADD UNIQUE KEY IF NOT EXISTS `uq_reviews_o_id` (`o_id`);
+
+ALTER TABLE `reviews`
+  DROP KEY IF EXISTS `fk_reviews_product`,
+  DROP KEY IF EXISTS `idx_reviews_o_id`;
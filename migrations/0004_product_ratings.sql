@@ -0,0 +1,25 @@
+-- Per-product rating summary maintained by the review endpoints
+-- (create_review / update_review / delete_review), backfilled from reviews
+
+CREATE TABLE IF NOT EXISTS `product_ratings` (
+  `p_id` int(11) NOT NULL,
+  `review_count` int(11) NOT NULL DEFAULT 0,
+  `score_sum` int(11) NOT NULL DEFAULT 0,
+  `score_1` int(11) NOT NULL DEFAULT 0,
+  `score_2` int(11) NOT NULL DEFAULT 0,
+  `score_3` int(11) NOT NULL DEFAULT 0,
+  `score_4` int(11) NOT NULL DEFAULT 0,
+  `score_5` int(11) NOT NULL DEFAULT 0,
+  `updated_at` datetime DEFAULT NULL,
+  PRIMARY KEY (`p_id`),
+  CONSTRAINT `fk_product_ratings_product` FOREIGN KEY (`p_id`) REFERENCES `products` (`p_id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- REPLACE so re-running the migration recomputes rather than double counts
+REPLACE INTO `product_ratings`
+  (`p_id`, `review_count`, `score_sum`, `score_1`, `score_2`, `score_3`, `score_4`, `score_5`, `updated_at`)
+SELECT `p_id`, COUNT(*), SUM(`score`),
+  SUM(`score` = 1), SUM(`score` = 2), SUM(`score` = 3), SUM(`score` = 4), SUM(`score` = 5),
+  NOW()
+FROM `reviews`
+GROUP BY `p_id`;
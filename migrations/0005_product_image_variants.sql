@@ -0,0 +1,6 @@
+-- Resized / WebP copies of each product image, written by the image
+-- variant pipeline (image_variants.py) after an upload; NULL until then.
+-- Existing images: python3 migrate.py images
+
+ALTER TABLE `products`
+  ADD COLUMN IF NOT EXISTS `image_variants` longtext DEFAULT NULL CHECK (json_valid(`image_variants`)) AFTER `image`;
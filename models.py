@@ -78,23 +78,41 @@ class Product(db.Model):
     description = db.Column(db.Text, nullable=True)
     price = db.Column(db.Numeric(10, 2), nullable=False)
     image = db.Column(db.String(255), nullable=True)
+    # Resized / WebP copies of image (image_variants.py), NULL until generated
+    image_variants = db.Column(db.JSON(none_as_null=True), nullable=True)
     size = db.Column(db.String(50), nullable=True, default='1:1')
     created_at = db.Column(db.DateTime, nullable=True, default=get_thai_time)
     updated_at = db.Column(db.DateTime, nullable=True, default=get_thai_time, onupdate=get_thai_time)
     
+    # Gallery sort orders (p_id breaks ties) - see migrations/
+    __table_args__ = (
+        db.Index('idx_products_name_id', 'name', 'p_id'),
+        db.Index('idx_products_price_id', 'price', 'p_id'),
+        db.Index('idx_products_created_id', 'created_at', 'p_id'),
+    )
+    
     # Many-to-Many relationship to Category
     categories = db.relationship('Category', secondary=product_categories, 
                                 backref=db.backref('products', lazy='dynamic'))
     
-    def to_dict(self):
-        """Convert product to dictionary"""
+    def to_dict(self, categories=None):
+        """Convert product to dictionary
+        
+        categories: pre-loaded [{'c_id', 'name'}] list for this product. List
+        endpoints pass it in so serializing N products doesn't lazy-load
+        self.categories N times.
+        """
+        if categories is None:
+            categories = [{'c_id': cat.c_id, 'name': cat.name} for cat in self.categories]
+        
         return {
             'p_id': self.p_id,
             'name': self.name,
             'description': self.description,
             'price': float(self.price) if self.price else 0,
-            'categories': [{'c_id': cat.c_id, 'name': cat.name} for cat in self.categories],
+            'categories': categories,
             'image': self.image,
+            'image_variants': self.image_variants or [],
             'size': self.size or '1:1',
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
             'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S') if self.updated_at else None
@@ -103,6 +121,55 @@ class Product(db.Model):
     def __repr__(self):
         return f'<Product {self.name}>'
 
+class CatalogVersion(db.Model):
+    """Single-row counter bumped by every product/category write
+
+    Each API worker compares it with the version its catalog cache was
+    built from, so caches stay consistent across processes.
+    """
+    __tablename__ = 'catalog_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=True, default=get_thai_time, onupdate=get_thai_time)
+    
+    def __repr__(self):
+        return f'<CatalogVersion {self.version}>'
+
+class ProductRating(db.Model):
+    """Review summary per product: count, score sum and 1-5 star histogram
+    
+    Kept in step with the reviews table by the review endpoints (same
+    transaction as the review write), so list pages can show ratings
+    without reading reviews.
+    """
+    __tablename__ = 'product_ratings'
+    p_id = db.Column(db.Integer, db.ForeignKey('products.p_id', ondelete='CASCADE'), primary_key=True)
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Integer, nullable=False, default=0)
+    score_1 = db.Column(db.Integer, nullable=False, default=0)
+    score_2 = db.Column(db.Integer, nullable=False, default=0)
+    score_3 = db.Column(db.Integer, nullable=False, default=0)
+    score_4 = db.Column(db.Integer, nullable=False, default=0)
+    score_5 = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=True, default=get_thai_time, onupdate=get_thai_time)
+    
+    def to_dict(self):
+        """Convert rating summary to dictionary"""
+        return rating_summary(self.review_count, self.score_sum,
+                              [self.score_1, self.score_2, self.score_3, self.score_4, self.score_5])
+    
+    def __repr__(self):
+        return f'<ProductRating {self.p_id} - {self.review_count} reviews>'
+
+def rating_summary(count=0, score_sum=0, histogram=(0, 0, 0, 0, 0)):
+    """Rating summary dictionary (also used for products with no reviews yet)"""
+    return {
+        'count': count,
+        'sum': score_sum,
+        'average': round(score_sum / count, 1) if count else 0,
+        'histogram': {str(stars): n for stars, n in enumerate(histogram, 1)}
+    }
+
 class Order(db.Model):
     __tablename__ = 'orders'
     order_id = db.Column(db.Integer, primary_key=True)
@@ -117,6 +184,14 @@ class Order(db.Model):
     img = db.Column(db.String(255), nullable=True)
     bill_img = db.Column(db.String(255), nullable=True)
     
+    # Order list / review eligibility access paths - see migrations/
+    __table_args__ = (
+        db.Index('idx_orders_date_id', 'order_date', 'order_id'),
+        db.Index('idx_orders_user_date', 'u_id', 'order_date', 'order_id'),
+        db.Index('idx_orders_status_date', 'status_id', 'order_date', 'order_id'),
+        db.Index('idx_orders_user_product_status', 'u_id', 'p_id', 'status_id'),
+    )
+    
     # Relationships
     user = db.relationship('User', backref=db.backref('orders', lazy=True))
     product = db.relationship('Product', backref=db.backref('orders', lazy=True))
@@ -157,6 +232,12 @@ class Review(db.Model):
     review_date = db.Column(db.DateTime, nullable=False, default=get_thai_time)
     score = db.Column(db.Integer, nullable=False)  # 1-5 stars
     
+    # One review per order; product reviews newest first - see migrations/
+    __table_args__ = (
+        db.Index('uq_reviews_o_id', 'o_id', unique=True),
+        db.Index('idx_reviews_product_date', 'p_id', 'review_date'),
+    )
+    
     # Relationships
     user = db.relationship('User', backref=db.backref('reviews', lazy=True))
     product = db.relationship('Product', backref=db.backref('reviews', lazy=True))
@@ -0,0 +1,396 @@
+import bisect
+import heapq
+import logging
+import re
+import threading
+import unicodedata
+
+# Thai is written without spaces, so a run of Thai characters (including
+# its vowel / tone marks, which aren't isalnum) is split into character
+# bigrams; other scripts are split into words
+_RUN_RE = re.compile(r'[\u0e00-\u0e7f]+|[^\W_\u0e00-\u0e7f]+')
+
+logger = logging.getLogger(__name__)
+
+MIN_QUERY_LENGTH = 2
+
+# A posting list switches from a set of p_ids to an int bitset (bit p_id
+# set) once it holds more than 1/DENSE_RATIO of the id range: from there
+# on the bitset is smaller, and AND / popcount on it run in C
+DENSE_RATIO = 128
+DENSE_MIN = 64
+
+if hasattr(int, 'bit_count'):
+    _popcount = int.bit_count
+else:  # Python < 3.10
+    def _popcount(bits):
+        return bin(bits).count('1')
+
+
+def normalize(text):
+    """Case-fold and NFKC-normalize text for indexing / matching"""
+    return unicodedata.normalize('NFKC', text or '').casefold()
+
+
+def _is_thai(char):
+    return '\u0e00' <= char <= '\u0e7f'
+
+
+def tokenize(text):
+    """Set of index tokens: Latin (etc.) words and Thai character bigrams"""
+    tokens = set()
+    for run in _RUN_RE.findall(normalize(text)):
+        if _is_thai(run[0]) and len(run) > 1:
+            tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.add(run)
+    return tokens
+
+
+def _to_bits(ids):
+    bits = 0
+    for p_id in ids:
+        bits |= 1 << p_id
+    return bits
+
+
+def _bit_tester(bits):
+    """O(1) membership test for an int bitset (shifting a big int per test isn't)"""
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    size = len(data)
+    return lambda p_id: (p_id >> 3) < size and (data[p_id >> 3] >> (p_id & 7)) & 1
+
+
+def _contains(matches):
+    return _bit_tester(matches) if isinstance(matches, int) else matches.__contains__
+
+
+def _count(matches):
+    return _popcount(matches) if isinstance(matches, int) else len(matches)
+
+
+def _newest(matches, limit, exclude=None):
+    """Up to limit highest p_ids in matches (a set or bitset), skipping exclude"""
+    if isinstance(matches, int):
+        if exclude:
+            matches &= ~(exclude if isinstance(exclude, int) else _to_bits(exclude))
+        top = []
+        while matches and len(top) < limit:
+            p_id = matches.bit_length() - 1
+            top.append(p_id)
+            matches ^= 1 << p_id
+        return top
+
+    if exclude:
+        excluded = _contains(exclude)
+        matches = [p_id for p_id in matches if not excluded(p_id)]
+    return heapq.nlargest(limit, matches)
+
+
+class _Doc:
+    __slots__ = ('summary', 'description')
+
+    def __init__(self, product):
+        self.summary = {
+            'p_id': product['p_id'],
+            'name': product.get('name'),
+            'price': product.get('price'),
+            'image': product.get('image'),
+            'image_variants': product.get('image_variants') or [],
+            'categories': product.get('categories') or [],
+            'created_at': product.get('created_at')
+        }
+        self.description = product.get('description')
+
+    def title_tokens(self):
+        return tokenize(' '.join(
+            [self.summary['name'] or ''] + [category.get('name') or '' for category in self.summary['categories']]
+        ))
+
+    def tokens(self):
+        return self.title_tokens() | tokenize(self.description)
+
+
+class _Postings:
+    """token -> p_ids, each list stored as a set (rare tokens) or an int bitset"""
+
+    def __init__(self, dense_min=DENSE_MIN):
+        self.dense_min = dense_min
+        self.lists = {}
+
+    def add(self, token, p_id):
+        ids = self.lists.get(token)
+        if ids is None:
+            self.lists[token] = {p_id}
+        elif isinstance(ids, int):
+            self.lists[token] = ids | (1 << p_id)
+        else:
+            ids.add(p_id)
+            if len(ids) >= self.dense_min:
+                self.lists[token] = _to_bits(ids)
+
+    def discard(self, token, p_id):
+        ids = self.lists.get(token)
+        if ids is None:
+            return
+        if isinstance(ids, int):
+            ids &= ~(1 << p_id)
+            self.lists[token] = ids
+        else:
+            ids.discard(p_id)
+        if not ids:
+            del self.lists[token]
+
+    def densify(self):
+        """Convert every list at or above dense_min to a bitset (after a bulk load)"""
+        for token, ids in self.lists.items():
+            if not isinstance(ids, int) and len(ids) >= self.dense_min:
+                self.lists[token] = _to_bits(ids)
+
+    def match(self, tokens):
+        """p_ids having every token, as a set or an int bitset"""
+        sparse, dense = [], []
+        for token in tokens:
+            ids = self.lists.get(token)
+            if not ids:
+                return set()
+            (dense if isinstance(ids, int) else sparse).append(ids)
+
+        if dense:
+            bits = dense[0]
+            for other in dense[1:]:
+                bits &= other
+            if not sparse:
+                return bits
+
+        # Rare tokens bound the work: filter the smallest set by the others
+        sparse.sort(key=len)
+        matches = sparse[0]
+        for ids in sparse[1:]:
+            matches = matches & ids
+        if dense and matches:
+            in_bits = _bit_tester(bits)
+            matches = {p_id for p_id in matches if in_bits(p_id)}
+        return matches
+
+
+class _VersionedIndex:
+    """Rebuild bookkeeping shared by the indexes: which catalog version they reflect
+
+    The first ensure_current() builds the index in the calling thread -
+    there is nothing to serve before that. Later, when the version has
+    moved (another worker wrote), the rebuild runs on a background thread
+    and searches keep using the previous index until the new one is
+    swapped in, so no request waits for a full rebuild.
+    """
+
+    def __init__(self):
+        self._build_lock = threading.Lock()
+        self._version = None
+        self._built = False
+        self._rebuilding = False
+
+    @property
+    def version(self):
+        return self._version
+
+    def ensure_current(self, version, load, background=True):
+        """Rebuild from load() unless the index already reflects version
+
+        load is called on the rebuild thread, so it has to set up its own
+        database session. background=False always rebuilds synchronously.
+        """
+        if self._version == version:
+            return
+        if self._built and background:
+            with self._build_lock:
+                if self._rebuilding or self._version == version:
+                    return
+                self._rebuilding = True
+            threading.Thread(target=self._rebuild_in_background, args=(version, load),
+                             name=f'{type(self).__name__}-rebuild', daemon=True).start()
+            return
+        with self._build_lock:
+            if self._version != version:
+                self.rebuild(load(), version)
+                self._built = True
+
+    def _rebuild_in_background(self, version, load):
+        try:
+            self.rebuild(load(), version)
+        except Exception:
+            # Keep serving the previous index; the next ensure_current() tries again
+            logger.exception('%s rebuild failed', type(self).__name__)
+        finally:
+            with self._build_lock:
+                self._rebuilding = False
+
+    def rebuild(self, entries, version):
+        raise NotImplementedError
+
+
+class ProductSearchIndex(_VersionedIndex):
+    """In-memory inverted index for product search
+
+    Product name, category names and description are tokenized with
+    tokenize(): whole words for Latin text, character bigrams for Thai
+    (so a Thai query matches wherever all of its bigrams occur, without a
+    word segmenter). A product matches when it has every query token.
+    Posting lists of common tokens are int bitsets, so broad queries are a
+    few big-int ANDs; rare tokens are sets and bound the work of selective
+    queries.
+
+    Products whose name or categories match rank before description-only
+    matches, newest (highest p_id) first within each group.
+
+    The index tracks the catalog version it reflects. apply() updates it
+    in place for this worker's own writes; if the version shows another
+    worker wrote in between, the index is marked stale and ensure_current()
+    rebuilds it from the database in the background while searches use
+    the previous copy.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._docs = {}  # p_id -> _Doc
+        self._postings = _Postings()        # any field
+        self._title_postings = _Postings()  # name / categories
+
+    def rebuild(self, products, version):
+        docs = {product['p_id']: _Doc(product) for product in products}
+        dense_min = max(DENSE_MIN, (max(docs, default=0) + 1) // DENSE_RATIO)
+        postings, title_postings = _Postings(dense_min), _Postings(dense_min)
+
+        for p_id, doc in docs.items():
+            title_tokens = doc.title_tokens()
+            for token in title_tokens | tokenize(doc.description):
+                postings.lists.setdefault(token, set()).add(p_id)
+            for token in title_tokens:
+                title_postings.lists.setdefault(token, set()).add(p_id)
+        postings.densify()
+        title_postings.densify()
+
+        with self._lock:
+            self._docs, self._postings, self._title_postings = docs, postings, title_postings
+            self._version = version
+
+    def invalidate(self):
+        """Mark the index stale so the next ensure_current() rebuilds it"""
+        with self._lock:
+            self._version = None
+
+    def apply(self, version, upsert=(), remove=()):
+        """Apply one committed catalog write (products as to_dict() dictionaries)
+
+        version is the catalog version that write produced. Anything other
+        than the next version means a write was missed, so the index is
+        marked stale instead.
+        """
+        with self._lock:
+            if self._version is None or version != self._version + 1:
+                self._version = None
+                return
+
+            for p_id in list(remove) + [product['p_id'] for product in upsert]:
+                doc = self._docs.pop(p_id, None)
+                if doc is not None:
+                    for token in doc.tokens():
+                        self._postings.discard(token, p_id)
+                    for token in doc.title_tokens():
+                        self._title_postings.discard(token, p_id)
+
+            for product in upsert:
+                doc = self._docs[product['p_id']] = _Doc(product)
+                for token in doc.tokens():
+                    self._postings.add(token, product['p_id'])
+                for token in doc.title_tokens():
+                    self._title_postings.add(token, product['p_id'])
+            self._version = version
+
+    def match_summaries(self, query):
+        """Summaries of every product having all words of query, unordered
+
+        Returns None when query has no word long enough to search for, so
+        the caller can treat it as no text filter at all.
+        """
+        tokens = {token for token in tokenize(query) if len(token) >= MIN_QUERY_LENGTH}
+        if not tokens:
+            return None
+
+        with self._lock:
+            matches = self._postings.match(tokens)
+            if isinstance(matches, int):
+                # Testing each doc against the bitset is linear; peeling bits off a big int isn't
+                contains = _bit_tester(matches)
+                return [doc.summary for p_id, doc in self._docs.items() if contains(p_id)]
+            return [self._docs[p_id].summary for p_id in matches]
+
+    def search(self, query, limit=20):
+        """Return (top `limit` product summaries, total number of matches)"""
+        tokens = {token for token in tokenize(query) if len(token) >= MIN_QUERY_LENGTH}
+        if not tokens:
+            return [], 0
+
+        with self._lock:
+            matches = self._postings.match(tokens)
+            total = _count(matches)
+            if not total:
+                return [], 0
+
+            # Name / category matches first, newest first within each group
+            title_matches = self._title_postings.match(tokens)
+            top = _newest(title_matches, limit)
+            if len(top) < limit:
+                top += _newest(matches, limit - len(top), exclude=title_matches)
+            return [self._docs[p_id].summary for p_id in top], total
+
+
+class PrefixIndex(_VersionedIndex):
+    """Sorted-array prefix lookup for product / category name autocomplete
+
+    Every name is stored under its normalized full text and under the
+    text starting at each later word ("Giant Robot" is also found by
+    "rob"). Keys are kept in one sorted list, so a lookup is a bisect to
+    the first key >= prefix and a short forward scan. The whole structure
+    is rebuilt (in the background, see _VersionedIndex) when the catalog
+    version changes; load for ensure_current() returns [(type, id, name)].
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._index = ([], [])  # (sorted keys, (type, id, name) entries parallel to them)
+
+    def rebuild(self, names, version):
+        pairs = []
+        for entry in names:
+            key = normalize(entry[2]).strip()
+            for match in re.finditer(r'\S+', key):
+                pairs.append((key[match.start():], entry))
+        pairs.sort(key=lambda pair: pair[0])
+
+        # Publish keys and entries as one object so readers never see a mismatched pair,
+        # and the version only once the new index is visible
+        self._index = ([key for key, _ in pairs], [entry for _, entry in pairs])
+        self._version = version
+
+    def complete(self, prefix, limit=10):
+        """Up to limit (type, id, name) entries with a word starting with prefix"""
+        prefix = normalize(prefix).strip()
+        if not prefix:
+            return []
+
+        keys, entries = self._index
+        results, seen = [], set()
+        i = bisect.bisect_left(keys, prefix)
+        while i < len(keys) and len(results) < limit and keys[i].startswith(prefix):
+            entry = entries[i]
+            if entry[:2] not in seen:
+                seen.add(entry[:2])
+                results.append(entry)
+            i += 1
+        return results
+
+
+product_search_index = ProductSearchIndex()
+name_prefix_index = PrefixIndex()
@@ -5,6 +5,7 @@ document.addEventListener("DOMContentLoaded", function() {
   setupSearch();
   setupFilters();
   setupSort();
+  setupLoadMore();
   initializeOrderCount();
 });
 
@@ -158,6 +159,55 @@ function sortOrders(order) {
   rows.forEach(row => tbody.appendChild(row));
 }
 
+// ======= LOAD MORE (PAGINATION) =======
+function setupLoadMore() {
+  const loadMoreBtn = document.getElementById('loadMoreBtn');
+  if (!loadMoreBtn) return;
+  
+  loadMoreBtn.addEventListener('click', loadMoreOrders);
+}
+
+async function loadMoreOrders() {
+  const loadMoreBtn = document.getElementById('loadMoreBtn');
+  const cursor = loadMoreBtn.dataset.nextCursor;
+  if (!cursor) return;
+  
+  const originalText = loadMoreBtn.innerHTML;
+  loadMoreBtn.innerHTML = '<i class="fas fa-spinner fa-spin me-1"></i> กำลังโหลด...';
+  loadMoreBtn.disabled = true;
+  
+  try {
+    const response = await fetch(`${loadMoreBtn.dataset.url}?cursor=${encodeURIComponent(cursor)}`, {
+      headers: { 'X-Requested-With': 'XMLHttpRequest' }
+    });
+    const data = await response.json();
+    
+    if (!response.ok || !data.success) {
+      throw new Error(data.message || 'Failed to load orders');
+    }
+    
+    document.getElementById('orderTableBody').insertAdjacentHTML('beforeend', data.html);
+    loadMoreBtn.dataset.nextCursor = data.next_cursor || '';
+    if (!data.next_cursor) {
+      document.getElementById('loadMoreContainer').style.display = 'none';
+    }
+    
+    // Re-apply search, filter and sort to include the new rows
+    performSearch(document.getElementById('orderSearch')?.value.trim() || '');
+    applyFilters();
+    const sortOrder = document.getElementById('sortOrder');
+    if (sortOrder) {
+      sortOrders(sortOrder.value);
+    }
+  } catch (error) {
+    console.error('Error loading more orders:', error);
+    alert('ไม่สามารถโหลดคำสั่งซื้อเพิ่มเติมได้ กรุณาลองใหม่อีกครั้ง');
+  } finally {
+    loadMoreBtn.innerHTML = originalText;
+    loadMoreBtn.disabled = false;
+  }
+}
+
 // ======= ORDER COUNT =======
 function initializeOrderCount() {
   updateOrderCount();
@@ -169,7 +219,9 @@ function updateOrderCount() {
   const orderCount = document.getElementById('orderCount');
   
   if (orderCount && rows.length > 0) {
-    orderCount.innerHTML = `<i class="fas fa-box me-1"></i> แสดง ${visibleRows.length} จาก ${rows.length} คำสั่งซื้อ`;
+    // Total of all the customer's orders (from the API), not just the pages loaded so far
+    const total = Math.max(parseInt(orderCount.dataset.total, 10) || 0, rows.length);
+    orderCount.innerHTML = `<i class="fas fa-box me-1"></i> แสดง ${visibleRows.length} จาก ${total} คำสั่งซื้อ`;
   }
 }
 
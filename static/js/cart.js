@@ -327,6 +327,136 @@ function generateQRCode(amount) {
   }, 1000);
 }
 
+// ======= STAGED UPLOADS (/api/uploads) =======
+// Files are uploaded ahead of checkout (in parallel); checkout then only sends their ids
+const API_BASE_URL = (() => {
+  const host = window.location.hostname;
+  const protocol = window.location.protocol;
+  if (host === 'localhost' || host === '127.0.0.1') {
+    return 'http://localhost:5000/api';
+  }
+  return `${protocol}//${host}:5000/api`;
+})();
+
+// Slip upload started when the file is picked: Promise of its upload_id
+let stagedSlip = null;
+
+async function stageUpload(file, kind, filename) {
+  const userId = sessionStorage.getItem('user_id') || localStorage.getItem('user_id');
+  const formData = new FormData();
+  formData.append('u_id', parseInt(userId));
+  formData.append('kind', kind);
+  formData.append('file', file, filename || file.name);
+
+  const response = await fetch(`${API_BASE_URL}/uploads`, {
+    method: 'POST',
+    body: formData
+  });
+  const result = await response.json();
+
+  if (!response.ok || !result.success) {
+    throw new Error(result.message || 'อัปโหลดไฟล์ไม่สำเร็จ');
+  }
+  return result.data.upload_id;
+}
+
+// ======= RESUMABLE UPLOADS (/api/uploads/sessions) =======
+// Large files are sent in chunks; after a dropped connection the upload
+// continues from the offset the server has instead of starting over
+const CHUNKED_UPLOAD_THRESHOLD = 2 * 1024 * 1024;
+const UPLOAD_CHUNK_RETRIES = 5;  // per chunk, for network errors and offset conflicts (409)
+
+// Exponential backoff before retry number `attempt` (2s, 4s, 8s, ...)
+function uploadRetryDelay(attempt) {
+  return new Promise(resolve => setTimeout(resolve, 1000 * 2 ** attempt));
+}
+
+async function sha256Hex(blob) {
+  const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+  return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function stageUploadChunked(blob, kind, filename) {
+  const userId = parseInt(sessionStorage.getItem('user_id') || localStorage.getItem('user_id'));
+
+  const beginResponse = await fetch(`${API_BASE_URL}/uploads/sessions`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ u_id: userId, kind: kind, filename: filename, size: blob.size, sha256: await sha256Hex(blob) })
+  });
+  const begin = await beginResponse.json();
+  if (!beginResponse.ok || !begin.success) {
+    throw new Error(begin.message || 'อัปโหลดไฟล์ไม่สำเร็จ');
+  }
+
+  const uploadUrl = `${API_BASE_URL}/uploads/${begin.data.upload_id}?u_id=${userId}`;
+  let offset = begin.data.offset;
+  let retries = 0;
+
+  while (offset < blob.size) {
+    let response;
+    try {
+      response = await fetch(uploadUrl, {
+        method: 'PATCH',
+        headers: { 'Upload-Offset': String(offset), 'Content-Type': 'application/offset+octet-stream' },
+        body: blob.slice(offset, offset + begin.data.chunk_size)
+      });
+    } catch (error) {
+      // Network dropped: wait, ask the server how much it got and resume from there
+      if (++retries > UPLOAD_CHUNK_RETRIES) {
+        throw error;
+      }
+      await uploadRetryDelay(retries);
+      try {
+        const status = await (await fetch(uploadUrl)).json();
+        if (status.success) {
+          offset = status.data.offset;
+        }
+      } catch (statusError) {
+        // still offline - the next attempt will tell
+      }
+      continue;
+    }
+
+    const result = await response.json();
+    if (response.status === 409) {
+      // Server is at a different offset (or still writing an earlier attempt of this chunk):
+      // back off, then continue from the offset it reported
+      if (++retries > UPLOAD_CHUNK_RETRIES) {
+        throw new Error(result.message || 'อัปโหลดไฟล์ไม่สำเร็จ');
+      }
+      await uploadRetryDelay(retries);
+      offset = result.offset;
+      continue;
+    }
+    if (!response.ok || !result.success) {
+      throw new Error(result.message || 'อัปโหลดไฟล์ไม่สำเร็จ');
+    }
+    offset = result.data.offset;
+    retries = 0;
+  }
+  return begin.data.upload_id;
+}
+
+// Large files (and only where the page can hash them) go through the resumable upload
+function stageFile(blob, kind, filename) {
+  if (blob.size > CHUNKED_UPLOAD_THRESHOLD && window.crypto && crypto.subtle) {
+    return stageUploadChunked(blob, kind, filename || blob.name);
+  }
+  return stageUpload(blob, kind, filename);
+}
+
+// Custom image stored in the cart as a data URL -> Blob
+function dataUrlToBlob(dataUrl) {
+  const byteString = atob(dataUrl.split(',')[1]);
+  const mimeString = dataUrl.split(',')[0].split(':')[1].split(';')[0];
+  const ia = new Uint8Array(byteString.length);
+  for (let i = 0; i < byteString.length; i++) {
+    ia[i] = byteString.charCodeAt(i);
+  }
+  return new Blob([ia], { type: mimeString });
+}
+
 // ======= SLIP UPLOAD =======
 function setupSlipUpload() {
   const fileInput = document.getElementById("slipFile");
@@ -340,10 +470,15 @@ function setupSlipUpload() {
         previewSlip(file, previewContainer);
         updateUploadStatus("กรุณารอสักครู่...", "text-info", statusDiv);
 
-        // Simulate upload process
-        setTimeout(() => {
-          updateUploadStatus("อัปโหลดสำเร็จ!", "status-success", statusDiv);
-        }, 1500);
+        // Upload now so checkout doesn't wait for it
+        stagedSlip = stageFile(file, 'slip');
+        stagedSlip.then(
+          () => updateUploadStatus("อัปโหลดสำเร็จ!", "status-success", statusDiv),
+          (error) => {
+            stagedSlip = null;  // retried at checkout
+            updateUploadStatus(`อัปโหลดไม่สำเร็จ: ${error.message}`, "text-danger", statusDiv);
+          }
+        );
       }
     });
   }
@@ -382,16 +517,23 @@ async function submitPayment() {
   showNotification("กำลังส่งข้อมูล...", "info");
 
   try {
-    // Create FormData to send files
+    // Upload the slip (unless already staged) and every custom image in parallel
+    const slipUpload = stagedSlip || stageFile(fileInput.files[0], 'slip');
+    const imageUploads = cart.map((item, index) => {
+      if (!(item.custom_image && item.custom_image.data)) {
+        return null;
+      }
+      const extension = item.custom_image.name.split('.').pop() || 'jpg';
+      return stageFile(dataUrlToBlob(item.custom_image.data), 'custom_image', `custom_${index}.${extension}`);
+    });
+    const [slipUploadId, ...imageUploadIds] = await Promise.all([slipUpload, ...imageUploads]);
+
+    // Checkout only references the staged files by id
     const formData = new FormData();
     formData.append('u_id', parseInt(userId));
     formData.append('shipping_address', shippingAddress);
-    
-    // Add slip file
-    const slipFile = fileInput.files[0];
-    formData.append('slip', slipFile);
+    formData.append('slip_upload_id', slipUploadId);
 
-    // Add cart items and their custom images
     cart.forEach((item, index) => {
       formData.append(`cart_items[${index}][product_id]`, item.product_id);
       formData.append(`cart_items[${index}][product_name]`, item.product_name);
@@ -403,54 +545,16 @@ async function submitPayment() {
       formData.append(`cart_items[${index}][unit_price]`, item.unit_price || item.product_price);
       formData.append(`cart_items[${index}][subtotal]`, item.subtotal || (item.unit_price * item.quantity));
       formData.append(`cart_items[${index}][order_details]`, item.order_details || '');
-
-      // Add custom image if exists
-      if (item.custom_image && item.custom_image.data) {
-        // Convert base64 to blob
-        const byteString = atob(item.custom_image.data.split(',')[1]);
-        const mimeString = item.custom_image.data.split(',')[0].split(':')[1].split(';')[0];
-        const ab = new ArrayBuffer(byteString.length);
-        const ia = new Uint8Array(ab);
-        for (let i = 0; i < byteString.length; i++) {
-          ia[i] = byteString.charCodeAt(i);
-        }
-        const blob = new Blob([ab], { type: mimeString });
-        
-        // Generate unique filename
-        const extension = item.custom_image.name.split('.').pop() || 'jpg';
-        const filename = `custom_${userId}_${Date.now()}_${index}.${extension}`;
-        
-        formData.append(`custom_image_${index}`, blob, filename);
-        formData.append(`cart_items[${index}][has_custom_image]`, 'true');
-        formData.append(`cart_items[${index}][custom_image_filename]`, filename);
-      } else {
-        formData.append(`cart_items[${index}][has_custom_image]`, 'false');
+      if (imageUploadIds[index]) {
+        formData.append(`cart_items[${index}][custom_image_upload_id]`, imageUploadIds[index]);
       }
     });
 
-    // Debug: Log FormData contents
     console.log('🚀 Sending checkout request...');
     console.log('📦 Cart items:', cart.length);
     console.log('💳 User ID:', userId);
-    
-    // Log FormData (for debugging)
-    for (let pair of formData.entries()) {
-      if (pair[1] instanceof Blob) {
-        console.log(`${pair[0]}: [File: ${pair[1].size} bytes]`);
-      } else {
-        console.log(`${pair[0]}: ${pair[1]}`);
-      }
-    }
 
-    // Create checkout request
-    // Note: API server runs on port 5000, frontend runs on port 8080
-    const host = window.location.hostname;
-    const protocol = window.location.protocol;
-    const apiUrl = (host === 'localhost' || host === '127.0.0.1')
-      ? 'http://localhost:5000/api/cart/checkout'
-      : `${protocol}//${host}:5000/api/cart/checkout`;
-    
-    const response = await fetch(apiUrl, {
+    const response = await fetch(`${API_BASE_URL}/cart/checkout`, {
       method: 'POST',
       body: formData  // ส่ง FormData แทน JSON (ไม่ต้องใส่ Content-Type header)
     });
@@ -470,6 +574,7 @@ async function submitPayment() {
     if (result.success) {
       // Clear cart after successful checkout
       localStorage.removeItem('cart');
+      stagedSlip = null;
       
       showNotification(
         `สั่งซื้อสำเร็จ! สร้างออเดอร์ ${result.data.total_orders} รายการ`,
@@ -1,40 +1,41 @@
-// Gallery filtering and search functionality
-let allProducts = [];
+// Gallery filtering, sorting and paging
+// Filtering / sorting / paging run on the server (/api/gallery); this file only
+// requests the page being shown via /gallery/grid and swaps the HTML in.
 let categories = [];
-let filteredProducts = [];
-let currentCategoryFilter = 'all';
-let currentSearchQuery = '';
+let currentFilters = {};
+let searchTimer = null;
+
+const SEARCH_DEBOUNCE_MS = 300;
+
+// Auto-detect API URL based on current host
+const API_BASE_URL = (() => {
+    const host = window.location.hostname;
+    const protocol = window.location.protocol;
+    if (host === 'localhost' || host === '127.0.0.1') {
+        return 'http://localhost:5000/api';
+    }
+    return `${protocol}//${host}:5000/api`;
+})();
 
 // Initialize when DOM loads
 document.addEventListener('DOMContentLoaded', function() {
-    // Store original products data
-    loadProductsData();
-    // Load categories from API
+    // Filters the page was rendered with (?category=&sort=&q=...)
+    loadFiltersFromUrl();
+    // Load categories from template data
     loadCategoriesData();
     // Initialize event listeners
     initializeEventListeners();
+    updateActiveFilterDisplay();
 });
 
-// Load products data from the page
-function loadProductsData() {
-    const productCards = document.querySelectorAll('.toy-card');
-    allProducts = Array.from(productCards).map(card => {
-        const nameEl = card.querySelector('.card-title');
-        const descEl = card.querySelector('.card-text');
-        const priceEl = card.querySelector('.price-badge');
-        const categoryEls = card.querySelectorAll('.category-badge');
-        
-        return {
-            element: card,
-            name: nameEl ? nameEl.textContent.trim() : '',
-            description: descEl ? descEl.textContent.trim() : '',
-            price: parseFloat(priceEl ? priceEl.textContent.replace(/[^0-9.]/g, '') : '0'),
-            categories: Array.from(categoryEls).map(cat => cat.textContent.trim())
-        };
+// Read current filters from the page URL
+function loadFiltersFromUrl() {
+    const params = new URLSearchParams(window.location.search);
+    ['category', 'min_price', 'max_price', 'q', 'sort'].forEach(key => {
+        if (params.get(key)) {
+            currentFilters[key] = params.get(key);
+        }
     });
-    
-    filteredProducts = [...allProducts];
-    updateResultCount();
 }
 
 // Load categories from template data
@@ -44,34 +45,11 @@ function loadCategoriesData() {
     if (container) {
         try {
             const categoriesJson = container.getAttribute('data-categories');
-            const categoriesFromTemplate = JSON.parse(categoriesJson);
-            
-            if (categoriesFromTemplate && categoriesFromTemplate.length > 0) {
-                categories = categoriesFromTemplate;
-                populateCategoryFilter();
-                return;
-            }
+            categories = JSON.parse(categoriesJson) || [];
         } catch (error) {
             console.error('Error parsing categories data:', error);
         }
     }
-    
-    // Fallback: extract categories from products
-    extractCategoriesFromProducts();
-}
-
-// Extract categories from existing products as fallback
-function extractCategoriesFromProducts() {
-    const categorySet = new Set();
-    allProducts.forEach(product => {
-        product.categories.forEach(cat => {
-            if (cat && cat !== 'ไม่ระบุหมวดหมู่') {
-                categorySet.add(cat);
-            }
-        });
-    });
-    
-    categories = Array.from(categorySet).map(name => ({ name }));
     populateCategoryFilter();
 }
 
@@ -79,28 +57,25 @@ function extractCategoriesFromProducts() {
 function populateCategoryFilter() {
     const filterList = document.getElementById('categoryFilterList');
     if (!filterList) return;
-    
+
     // Keep the "all" option and add dynamic categories
     const dynamicCategories = categories.map(category => `
         <a
             href="javascript:void(0)"
             class="list-group-item list-group-item-action category-filter-btn"
-            data-category-name="${category.name}"
+            data-category-id="${category.c_id}"
         >
             <i class="fas fa-tag me-2"></i>${category.name}
         </a>
     `).join('');
-    
+
     // Insert after the "show all" option
     const allOption = filterList.querySelector('[data-category-id="all"]');
     if (allOption) {
         allOption.insertAdjacentHTML('afterend', dynamicCategories);
     }
-    
-    // Add click listeners to new category buttons
-    filterList.querySelectorAll('.category-filter-btn').forEach(btn => {
-        btn.addEventListener('click', handleCategoryFilter);
-    });
+
+    setActiveCategoryButton(currentFilters.category || 'all');
 }
 
 // Initialize event listeners
@@ -109,53 +84,54 @@ function initializeEventListeners() {
     const searchInput = document.getElementById('searchInput');
     if (searchInput) {
         searchInput.addEventListener('input', handleSearch);
+        setupAutocomplete(searchInput, document.getElementById('searchSuggestions'));
     }
-    
+
     // Sort dropdown
-    const sortOptions = document.querySelectorAll('.sort-option');
-    sortOptions.forEach(option => {
+    document.querySelectorAll('.sort-option').forEach(option => {
         option.addEventListener('click', handleSort);
+        if (option.getAttribute('data-sort') === currentFilters.sort) {
+            updateSortLabel(option.textContent);
+        }
     });
-    
-    // Category filter buttons (initial)
-    const categoryBtns = document.querySelectorAll('.category-filter-btn');
-    categoryBtns.forEach(btn => {
+
+    // Category filter buttons
+    document.querySelectorAll('.category-filter-btn').forEach(btn => {
         btn.addEventListener('click', handleCategoryFilter);
     });
+
+    // Price range
+    const applyPriceBtn = document.getElementById('applyPriceBtn');
+    if (applyPriceBtn) {
+        applyPriceBtn.addEventListener('click', handlePriceFilter);
+    }
+
+    // Load more
+    const loadMoreBtn = document.getElementById('loadMoreBtn');
+    if (loadMoreBtn) {
+        loadMoreBtn.addEventListener('click', loadMoreProducts);
+    }
 }
 
-// Handle search input
+// Handle search input (debounced so typing doesn't fire a request per key)
 function handleSearch(event) {
-    currentSearchQuery = event.target.value.toLowerCase().trim();
-    applyFilters();
+    const query = event.target.value.trim();
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => {
+        setFilter('q', query);
+        applyFilters();
+    }, SEARCH_DEBOUNCE_MS);
 }
 
 // Handle category filter
 function handleCategoryFilter(event) {
     event.preventDefault();
-    
-    // Update active state
-    document.querySelectorAll('.category-filter-btn').forEach(btn => {
-        btn.classList.remove('active');
-    });
-    event.target.classList.add('active');
-    
-    // Get category filter
-    const categoryId = event.target.getAttribute('data-category-id');
-    const categoryName = event.target.getAttribute('data-category-name');
-    
-    if (categoryId === 'all') {
-        currentCategoryFilter = 'all';
-    } else {
-        currentCategoryFilter = categoryName || categoryId;
-    }
-    
-    // Update active filter display
-    updateActiveFilterDisplay();
-    
-    // Apply filters
+
+    const categoryId = event.currentTarget.getAttribute('data-category-id');
+    setFilter('category', categoryId === 'all' ? '' : categoryId);
+    setActiveCategoryButton(categoryId);
     applyFilters();
-    
+
     // Close offcanvas on mobile
     const offcanvas = bootstrap.Offcanvas.getInstance(document.getElementById('categoryFilter'));
     if (offcanvas) {
@@ -163,129 +139,179 @@ function handleCategoryFilter(event) {
     }
 }
 
+// Handle price range
+function handlePriceFilter(event) {
+    event.preventDefault();
+    setFilter('min_price', document.getElementById('minPriceInput').value);
+    setFilter('max_price', document.getElementById('maxPriceInput').value);
+    applyFilters();
+
+    const offcanvas = bootstrap.Offcanvas.getInstance(document.getElementById('categoryFilter'));
+    if (offcanvas) {
+        offcanvas.hide();
+    }
+}
+
 // Handle sorting
 function handleSort(event) {
     event.preventDefault();
-    
-    const sortType = event.target.getAttribute('data-sort');
-    let sortedProducts = [...filteredProducts];
-    
-    switch (sortType) {
-        case 'name':
-            sortedProducts.sort((a, b) => a.name.localeCompare(b.name));
-            break;
-        case 'name-desc':
-            sortedProducts.sort((a, b) => b.name.localeCompare(a.name));
-            break;
-        case 'price':
-            sortedProducts.sort((a, b) => a.price - b.price);
-            break;
-        case 'price-desc':
-            sortedProducts.sort((a, b) => b.price - a.price);
-            break;
-    }
-    
-    // Re-arrange DOM elements
-    const container = document.querySelector('.toy-container .row:last-child');
-    if (container) {
-        sortedProducts.forEach(product => {
-            container.appendChild(product.element.parentNode); // Append the column div
-        });
+
+    setFilter('sort', event.target.getAttribute('data-sort'));
+    updateSortLabel(event.target.textContent);
+    applyFilters();
+}
+
+function setFilter(key, value) {
+    if (value) {
+        currentFilters[key] = value;
+    } else {
+        delete currentFilters[key];
     }
-    
-    // Update dropdown text
+}
+
+function setActiveCategoryButton(categoryId) {
+    document.querySelectorAll('.category-filter-btn').forEach(btn => {
+        btn.classList.toggle('active', btn.getAttribute('data-category-id') === String(categoryId));
+    });
+}
+
+function updateSortLabel(text) {
     const dropdownToggle = document.getElementById('sortDropdown');
     if (dropdownToggle) {
-        dropdownToggle.innerHTML = `<i class="fas fa-sort me-2"></i>${event.target.textContent}`;
+        dropdownToggle.innerHTML = `<i class="fas fa-sort me-2"></i>${text}`;
     }
 }
 
-// Apply all filters
-function applyFilters() {
-    filteredProducts = allProducts.filter(product => {
-        // Search filter
-        const matchesSearch = !currentSearchQuery || 
-            product.name.toLowerCase().includes(currentSearchQuery) ||
-            product.description.toLowerCase().includes(currentSearchQuery) ||
-            product.categories.some(cat => cat.toLowerCase().includes(currentSearchQuery));
-        
-        // Category filter
-        const matchesCategory = currentCategoryFilter === 'all' ||
-            product.categories.some(cat => cat === currentCategoryFilter);
-        
-        return matchesSearch && matchesCategory;
+// Grid requests for the current filters; applyFilters() aborts them when the filters change,
+// so a slow response for old filters can't overwrite a newer one
+let gridController = new AbortController();
+
+// Request one page of the grid from the server
+async function fetchGridPage(page) {
+    const container = document.querySelector('.toy-container');
+    const params = new URLSearchParams(currentFilters);
+    if (page > 1) {
+        params.set('page', page);
+    }
+
+    const response = await fetch(`${container.getAttribute('data-grid-url')}?${params}`, {
+        headers: { "X-Requested-With": "XMLHttpRequest" },
+        signal: gridController.signal,
     });
-    
-    // Show/hide products
-    updateProductDisplay();
-    updateResultCount();
-    updateActiveFilterDisplay();
+    const data = await response.json();
+
+    if (!response.ok || !data.success) {
+        throw new Error(data.message || "Failed to load products");
+    }
+    return data;
 }
 
-// Update product display
-function updateProductDisplay() {
-    allProducts.forEach(product => {
-        const isVisible = filteredProducts.includes(product);
-        const columnDiv = product.element.parentNode; // Get the column div
-        
-        if (isVisible) {
-            columnDiv.style.display = '';
-            product.element.classList.remove('hidden');
-            product.element.classList.add('fade-in');
+// Apply all filters: reload the first page for the current filters
+async function applyFilters() {
+    // Keep the URL shareable / reload-safe
+    const params = new URLSearchParams(currentFilters);
+    const query = params.toString();
+    history.replaceState(null, '', query ? `${window.location.pathname}?${query}` : window.location.pathname);
+
+    // Drop pending grid requests (filter or load more) made for the previous filters
+    gridController.abort();
+    const controller = gridController = new AbortController();
+
+    const grid = document.getElementById('productGrid');
+    grid.classList.add('opacity-50');
+
+    try {
+        const data = await fetchGridPage(1);
+
+        if (data.total === 0 && hasActiveFilters()) {
+            grid.innerHTML = noResultsHtml();
         } else {
-            columnDiv.style.display = 'none';
-            product.element.classList.add('hidden');
-            product.element.classList.remove('fade-in');
+            grid.innerHTML = data.html;
         }
-    });
-    
-    // Show/hide no results message
-    const container = document.querySelector('.toy-container .row:last-child');
-    let noResultsDiv = container.querySelector('.no-results-container');
-    
-    if (filteredProducts.length === 0) {
-        if (!noResultsDiv) {
-            noResultsDiv = document.createElement('div');
-            noResultsDiv.className = 'col-12 no-results-container';
-            noResultsDiv.innerHTML = `
-                <div class="no-results">
-                    <i class="fas fa-search"></i>
-                    <h4>ไม่พบสินค้าที่ค้นหา</h4>
-                    <p class="text-muted">ลองเปลี่ยนคำค้นหาหรือเลือกหมวดหมู่อื่น</p>
-                    <button type="button" class="btn btn-primary" onclick="clearAllFilters()">
-                        <i class="fas fa-refresh me-2"></i>แสดงทั้งหมด
-                    </button>
-                </div>
-            `;
-            container.appendChild(noResultsDiv);
+        updateResultCount(data.total);
+        updateLoadMore(data.next_page);
+    } catch (error) {
+        if (error.name !== 'AbortError') {
+            console.error("Error loading products:", error);
+        }
+    } finally {
+        // A newer applyFilters() owns the grid now
+        if (controller === gridController) {
+            grid.classList.remove('opacity-50');
+            updateActiveFilterDisplay();
+        }
+    }
+}
+
+// ======= LOAD MORE (PAGINATION) =======
+async function loadMoreProducts() {
+    const loadMoreBtn = document.getElementById('loadMoreBtn');
+    const nextPage = parseInt(loadMoreBtn.getAttribute('data-next-page'), 10);
+    if (!nextPage) return;
+
+    const originalText = loadMoreBtn.innerHTML;
+    loadMoreBtn.innerHTML = '<i class="fas fa-spinner fa-spin me-2"></i>กำลังโหลด...';
+    loadMoreBtn.disabled = true;
+
+    try {
+        const data = await fetchGridPage(nextPage);
+        document.getElementById('productGrid').insertAdjacentHTML('beforeend', data.html);
+        updateResultCount(data.total);
+        updateLoadMore(data.next_page);
+    } catch (error) {
+        if (error.name !== 'AbortError') {
+            console.error("Error loading more products:", error);
         }
-        noResultsDiv.style.display = '';
-    } else if (noResultsDiv) {
-        noResultsDiv.style.display = 'none';
+    } finally {
+        loadMoreBtn.innerHTML = originalText;
+        loadMoreBtn.disabled = false;
     }
 }
 
+function updateLoadMore(nextPage) {
+    document.getElementById('loadMoreBtn').setAttribute('data-next-page', nextPage || '');
+    document.getElementById('loadMoreContainer').style.display = nextPage ? '' : 'none';
+}
+
+function noResultsHtml() {
+    return `
+        <div class="col-12 no-results-container">
+            <div class="no-results">
+                <i class="fas fa-search"></i>
+                <h4>ไม่พบสินค้าที่ค้นหา</h4>
+                <p class="text-muted">ลองเปลี่ยนคำค้นหาหรือเลือกหมวดหมู่อื่น</p>
+                <button type="button" class="btn btn-primary" onclick="clearAllFilters()">
+                    <i class="fas fa-refresh me-2"></i>แสดงทั้งหมด
+                </button>
+            </div>
+        </div>
+    `;
+}
+
 // Update result count
-function updateResultCount() {
+function updateResultCount(total) {
     const countEl = document.getElementById('resultCount');
     if (countEl) {
-        countEl.textContent = filteredProducts.length;
+        countEl.textContent = total;
     }
 }
 
+function hasActiveFilters() {
+    return Boolean(currentFilters.category || currentFilters.q || currentFilters.min_price || currentFilters.max_price);
+}
+
 // Update active filter display
 function updateActiveFilterDisplay() {
     const activeFiltersDiv = document.getElementById('activeFilters');
     const activeCategorySpan = document.getElementById('activeCategory');
-    
-    const hasActiveFilters = currentCategoryFilter !== 'all' || currentSearchQuery;
-    
-    if (hasActiveFilters) {
+
+    if (hasActiveFilters()) {
         activeFiltersDiv.style.display = '';
-        
-        if (currentCategoryFilter !== 'all') {
+
+        if (currentFilters.category) {
+            const category = categories.find(cat => String(cat.c_id) === String(currentFilters.category));
             activeCategorySpan.style.display = '';
-            activeCategorySpan.querySelector('.filter-text').textContent = currentCategoryFilter;
+            activeCategorySpan.querySelector('.filter-text').textContent = category ? category.name : currentFilters.category;
         } else {
             activeCategorySpan.style.display = 'none';
         }
@@ -296,43 +322,39 @@ function updateActiveFilterDisplay() {
 
 // Clear category filter
 function clearCategoryFilter() {
-    currentCategoryFilter = 'all';
-    
-    // Update active state
-    document.querySelectorAll('.category-filter-btn').forEach(btn => {
-        btn.classList.remove('active');
-    });
-    document.querySelector('[data-category-id="all"]').classList.add('active');
-    
+    setFilter('category', '');
+    setActiveCategoryButton('all');
     applyFilters();
 }
 
 // Clear all filters
 function clearAllFilters() {
-    currentCategoryFilter = 'all';
-    currentSearchQuery = '';
-    
+    currentFilters = {};
+
     // Reset search input
     const searchInput = document.getElementById('searchInput');
     if (searchInput) {
         searchInput.value = '';
     }
-    
-    // Reset category selection
-    document.querySelectorAll('.category-filter-btn').forEach(btn => {
-        btn.classList.remove('active');
+    ['minPriceInput', 'maxPriceInput'].forEach(id => {
+        const input = document.getElementById(id);
+        if (input) {
+            input.value = '';
+        }
     });
-    document.querySelector('[data-category-id="all"]').classList.add('active');
-    
+
+    // Reset category selection
+    setActiveCategoryButton('all');
+
     // Reset sort dropdown
     const dropdownToggle = document.getElementById('sortDropdown');
     if (dropdownToggle) {
         dropdownToggle.innerHTML = '<i class="fas fa-sort me-2"></i>เรียง';
     }
-    
+
     applyFilters();
 }
 
 // Expose functions globally
 window.clearCategoryFilter = clearCategoryFilter;
-window.clearAllFilters = clearAllFilters;
\ No newline at end of file
+window.clearAllFilters = clearAllFilters;
@@ -565,26 +565,71 @@ document.addEventListener("DOMContentLoaded", function() {
     loadReviews(productId);
     checkCanReview(productId);
     setupReviewForm(productId);
+    
+    const loadMoreBtn = document.getElementById('loadMoreReviewsBtn');
+    if (loadMoreBtn) {
+      loadMoreBtn.addEventListener('click', () => loadMoreReviews(productId));
+    }
   }
 });
 
+const REVIEWS_PAGE_SIZE = 10;
+
+// Fetch one page of reviews (newest first); cursor comes from the previous page
+async function fetchReviewsPage(productId, cursor) {
+  const params = new URLSearchParams({ limit: REVIEWS_PAGE_SIZE });
+  if (cursor) {
+    params.set('cursor', cursor);
+  }
+  
+  const response = await fetch(`${API_BASE_URL}/products/${productId}/reviews?${params}`);
+  const data = await response.json();
+  
+  if (!data.success) {
+    throw new Error(data.message || 'Failed to load reviews');
+  }
+  return data.data;
+}
+
+// Load the first page (also used to refresh after a new review)
 async function loadReviews(productId) {
   try {
-    const response = await fetch(`${API_BASE_URL}/products/${productId}/reviews`);
-    const data = await response.json();
-    
-    if (data.success) {
-      displayReviews(data.data);
-    } else {
-      console.error('Failed to load reviews:', data.message);
-    }
+    displayReviews(await fetchReviewsPage(productId));
   } catch (error) {
     console.error('Error loading reviews:', error);
   }
 }
 
+// ======= LOAD MORE REVIEWS (PAGINATION) =======
+async function loadMoreReviews(productId) {
+  const loadMoreBtn = document.getElementById('loadMoreReviewsBtn');
+  const cursor = loadMoreBtn.getAttribute('data-next-cursor');
+  if (!cursor) return;
+  
+  const originalText = loadMoreBtn.innerHTML;
+  loadMoreBtn.innerHTML = '<i class="fas fa-spinner fa-spin me-2"></i>กำลังโหลด...';
+  loadMoreBtn.disabled = true;
+  
+  try {
+    const data = await fetchReviewsPage(productId, cursor);
+    document.getElementById('reviewsList').insertAdjacentHTML('beforeend', data.reviews.map(reviewHtml).join(''));
+    updateLoadMoreReviews(data.next_cursor);
+  } catch (error) {
+    console.error('Error loading more reviews:', error);
+  } finally {
+    loadMoreBtn.innerHTML = originalText;
+    loadMoreBtn.disabled = false;
+  }
+}
+
+function updateLoadMoreReviews(nextCursor) {
+  document.getElementById('loadMoreReviewsBtn').setAttribute('data-next-cursor', nextCursor || '');
+  document.getElementById('loadMoreReviewsContainer').style.display = nextCursor ? '' : 'none';
+}
+
 function displayReviews(data) {
-  const { reviews, total_reviews, average_score } = data;
+  const { reviews, total_reviews, average_score, next_cursor } = data;
+  updateLoadMoreReviews(next_cursor);
   
   // Update rating summary
   const avgScoreEl = document.getElementById('avgScore');
@@ -612,7 +657,12 @@ function displayReviews(data) {
       </div>
     `;
   } else {
-    reviewsList.innerHTML = reviews.map(review => `
+    reviewsList.innerHTML = reviews.map(reviewHtml).join('');
+  }
+}
+
+function reviewHtml(review) {
+  return `
       <div class="review-item">
         <div class="reviewer-info">
           <div class="reviewer-avatar">${getInitial(review.customer_name || review.username)}</div>
@@ -625,8 +675,7 @@ function displayReviews(data) {
         </div>
         ${review.description ? `<p class="mb-0">${review.description}</p>` : ''}
       </div>
-    `).join('');
-  }
+    `;
 }
 
 function generateStars(score) {
@@ -687,6 +736,11 @@ async function checkCanReview(productId) {
       // Show write review button
       console.log('✨ User CAN review - showing button');
       document.getElementById('writeReviewSection').style.display = 'block';
+      
+      // Came from the "write a review" button on the order history page
+      if (window.location.hash === '#write-review') {
+        bootstrap.Modal.getOrCreateInstance(document.getElementById('reviewModal')).show();
+      }
     } else {
       console.log('❌ User CANNOT review:', data.message);
     }
@@ -275,3 +275,60 @@ function showNotification(message, type = 'info') {
         }
     }, 5000);
 }
+
+// ======= AUTOCOMPLETE (/api/autocomplete) =======
+// Shared by the gallery and manage product search boxes: fills a <datalist> with
+// product / category names while typing
+const SUGGEST_DEBOUNCE_MS = 150;
+
+// Same host detection as the page scripts (each of them declares its own API_BASE_URL)
+const AUTOCOMPLETE_URL = (() => {
+    const host = window.location.hostname;
+    const protocol = window.location.protocol;
+    if (host === 'localhost' || host === '127.0.0.1') {
+        return 'http://localhost:5000/api/autocomplete';
+    }
+    return `${protocol}//${host}:5000/api/autocomplete`;
+})();
+
+function setupAutocomplete(input, datalist) {
+    if (!input || !datalist) return;
+
+    const state = { timer: null, controller: null };
+    input.addEventListener('input', () => {
+        clearTimeout(state.timer);
+        const prefix = input.value.trim();
+        if (!prefix) {
+            datalist.innerHTML = '';
+            return;
+        }
+        state.timer = setTimeout(() => loadSuggestions(prefix, datalist, state), SUGGEST_DEBOUNCE_MS);
+    });
+}
+
+async function loadSuggestions(prefix, datalist, state) {
+    // Drop the previous request - only the latest prefix matters
+    if (state.controller) {
+        state.controller.abort();
+    }
+    state.controller = new AbortController();
+
+    try {
+        const response = await fetch(`${AUTOCOMPLETE_URL}?prefix=${encodeURIComponent(prefix)}&limit=8`, {
+            signal: state.controller.signal,
+        });
+        const data = await response.json();
+        if (!data.success) return;
+
+        datalist.innerHTML = '';
+        [...new Set(data.data.map(item => item.name))].forEach(name => {
+            const option = document.createElement('option');
+            option.value = name;
+            datalist.appendChild(option);
+        });
+    } catch (error) {
+        if (error.name !== 'AbortError') {
+            console.error('Error loading suggestions:', error);
+        }
+    }
+}
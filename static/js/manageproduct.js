@@ -37,6 +37,8 @@ function setupEnhancedSearch() {
   const clearBtn = document.getElementById('clearSearchBtn');
   
   if (searchInput) {
+    setupAutocomplete(searchInput, document.getElementById('productSuggestions'));
+    
     // Real-time search with debounce
     searchInput.addEventListener('input', function() {
       const query = this.value.trim();
@@ -3,6 +3,7 @@ document.addEventListener("DOMContentLoaded", function () {
   initializePacking();
   setupFilterButtons();
   setupSearchBox();
+  setupLoadMore();
 });
 
 function initializePacking() {
@@ -10,7 +11,14 @@ function initializePacking() {
   setupNotifications();
 }
 
-// ======= FILTER FUNCTIONALITY =======
+// ======= FILTER / SEARCH (server side) =======
+// Status and search text go to /packing/rows, which asks /api/orders for the first
+// page of matching orders, so orders that weren't loaded yet are found too
+const SEARCH_DEBOUNCE_MS = 300;
+let searchTimer = null;
+// Row requests for the current filters; a filter change aborts them (stale pages are dropped)
+let ordersController = new AbortController();
+
 function setupFilterButtons() {
   const filterButtons = document.querySelectorAll('.filter-btn');
   
@@ -22,71 +30,89 @@ function setupFilterButtons() {
       // Add active class to clicked button
       this.classList.add('active');
       
-      // Get filter status
-      const filterStatus = this.getAttribute('data-status');
-      
-      // Filter orders
-      filterOrders(filterStatus);
+      // Reload from the first page for the new status
+      reloadOrders();
     });
   });
 }
 
-function filterOrders(status) {
-  const rows = document.querySelectorAll('.order-row');
-  let visibleCount = 0;
-  
-  rows.forEach(row => {
-    if (status === 'all') {
-      row.style.display = '';
-      visibleCount++;
-    } else {
-      const rowStatus = row.getAttribute('data-status');
-      if (rowStatus === status) {
-        row.style.display = '';
-        visibleCount++;
-      } else {
-        row.style.display = 'none';
-      }
-    }
-  });
-  
-  // Show/hide empty message
-  updateEmptyState(visibleCount);
-}
-
-// ======= SEARCH FUNCTIONALITY =======
 function setupSearchBox() {
   const searchInput = document.getElementById('searchInput');
   
   if (searchInput) {
     searchInput.addEventListener('input', function() {
-      const searchTerm = this.value.toLowerCase();
-      searchOrders(searchTerm);
+      clearTimeout(searchTimer);
+      searchTimer = setTimeout(reloadOrders, SEARCH_DEBOUNCE_MS);
     });
   }
 }
 
-function searchOrders(searchTerm) {
-  const rows = document.querySelectorAll('.order-row');
-  let visibleCount = 0;
-  
-  rows.forEach(row => {
-    const orderId = row.querySelector('.order-id').textContent.toLowerCase();
-    const customerName = row.querySelector('.customer-name').textContent.toLowerCase();
-    const description = row.querySelector('.order-description').textContent.toLowerCase();
-    
-    if (orderId.includes(searchTerm) || 
-        customerName.includes(searchTerm) || 
-        description.includes(searchTerm)) {
-      row.style.display = '';
-      visibleCount++;
-    } else {
-      row.style.display = 'none';
-    }
+// Query string for the active status button and search text
+function currentOrderFilters() {
+  const params = new URLSearchParams();
+  const activeFilter = document.querySelector('.filter-btn.active');
+  const status = activeFilter ? activeFilter.getAttribute('data-status') : 'all';
+  if (status !== 'all') {
+    params.set('status_id', status);
+  }
+  const searchInput = document.getElementById('searchInput');
+  const search = searchInput ? searchInput.value.trim() : '';
+  if (search) {
+    params.set('q', search);
+  }
+  return params;
+}
+
+// One page of order rows (HTML) from /packing/rows
+async function fetchOrderRows(params) {
+  const loadMoreBtn = document.getElementById('loadMoreBtn');
+  const response = await fetch(`${loadMoreBtn.getAttribute('data-url')}?${params}`, {
+    headers: { "X-Requested-With": "XMLHttpRequest" },
+    signal: ordersController.signal,
   });
+  const data = await response.json();
   
-  // Show/hide empty message
-  updateEmptyState(visibleCount);
+  if (!response.ok || !data.success) {
+    throw new Error(data.message || "Failed to load orders");
+  }
+  return data;
+}
+
+// Replace the table with the first page for the current filters
+async function reloadOrders() {
+  ordersController.abort();
+  const controller = ordersController = new AbortController();
+  
+  const tbody = document.querySelector('#ordersTable tbody');
+  tbody.classList.add('opacity-50');
+  
+  try {
+    const data = await fetchOrderRows(currentOrderFilters());
+    tbody.querySelectorAll('.order-row').forEach(row => row.remove());
+    appendOrderRows(data.html);
+    updateEmptyState(data.count);
+    updateLoadMore(data.next_cursor);
+  } catch (error) {
+    if (error.name !== 'AbortError') {
+      console.error("Error loading orders:", error);
+      showNotification("ไม่สามารถโหลดคำสั่งซื้อได้", "error");
+    }
+  } finally {
+    // A newer reloadOrders() owns the table now
+    if (controller === ordersController) {
+      tbody.classList.remove('opacity-50');
+    }
+  }
+}
+
+function appendOrderRows(html) {
+  // Rows go above the (hidden) empty-state row
+  const noOrdersRow = document.querySelector('.no-orders-row');
+  if (noOrdersRow) {
+    noOrdersRow.insertAdjacentHTML('beforebegin', html);
+  } else {
+    document.querySelector('#ordersTable tbody').insertAdjacentHTML('beforeend', html);
+  }
 }
 
 function updateEmptyState(visibleCount) {
@@ -101,6 +127,48 @@ function updateEmptyState(visibleCount) {
   }
 }
 
+// ======= LOAD MORE (PAGINATION) =======
+function setupLoadMore() {
+  const loadMoreBtn = document.getElementById('loadMoreBtn');
+  
+  if (loadMoreBtn) {
+    loadMoreBtn.addEventListener('click', loadMoreOrders);
+  }
+}
+
+function updateLoadMore(nextCursor) {
+  document.getElementById('loadMoreBtn').setAttribute('data-next-cursor', nextCursor || '');
+  document.getElementById('loadMoreContainer').style.display = nextCursor ? '' : 'none';
+}
+
+async function loadMoreOrders() {
+  const loadMoreBtn = document.getElementById('loadMoreBtn');
+  const cursor = loadMoreBtn.getAttribute('data-next-cursor');
+  if (!cursor) return;
+  
+  const originalText = loadMoreBtn.innerHTML;
+  loadMoreBtn.innerHTML = '<i class="fas fa-spinner fa-spin me-2"></i>กำลังโหลด...';
+  loadMoreBtn.disabled = true;
+  
+  try {
+    // Next page of the same filters the table was loaded with
+    const params = currentOrderFilters();
+    params.set('cursor', cursor);
+    const data = await fetchOrderRows(params);
+    
+    appendOrderRows(data.html);
+    updateLoadMore(data.next_cursor);
+  } catch (error) {
+    if (error.name !== 'AbortError') {
+      console.error("Error loading more orders:", error);
+      showNotification("ไม่สามารถโหลดคำสั่งซื้อเพิ่มเติมได้", "error");
+    }
+  } finally {
+    loadMoreBtn.innerHTML = originalText;
+    loadMoreBtn.disabled = false;
+  }
+}
+
 // ======= STATUS TRANSLATIONS =======
 const STATUS_TRANSLATIONS = {
   Pending: "Pending (รอดำเนินการ)",
@@ -0,0 +1,459 @@
+"""Benchmarks for the hot API paths, on a throwaway database
+
+    python -m tests.bench home        /api/categories-with-products at 10 .. 1000 categories
+    python -m tests.bench products    /api/manage-product and /api/gallery at 100 .. 5000 products
+    python -m tests.bench modes       gallery / packing pages with API_MODE=http vs embedded
+    python -m tests.bench checkout    100 concurrent /api/cart/checkout clients, p50 / p95 latency
+    python -m tests.bench search      product search index at 1000 .. 50000 products, p50 / p99
+    python -m tests.bench autocomplete  /api/autocomplete at 1000 .. 50000 products, p50 / p99
+    python -m tests.bench gc          upload_gc.py orphan scan over 10000 / 100000 files, files/s
+
+Each benchmark seeds its own data into TEST_DATABASE_URL (default: a
+temporary SQLite file, removed afterwards) and prints one row per data
+size. Numbers are for comparing before / after a change on the same
+machine, not absolute targets - MariaDB adds a network round trip per
+query, so query counts matter more there than here.
+"""
+import contextlib
+import hashlib
+import io
+import itertools
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+_db_file = None
+if 'TEST_DATABASE_URL' not in os.environ:
+    _db_file = tempfile.NamedTemporaryFile(prefix='echoarty-bench-', suffix='.db', delete=False).name
+    os.environ['TEST_DATABASE_URL'] = f'sqlite:///{_db_file}?timeout=60'
+
+from tests.fixtures import api_app, app, db, count_queries, reset_database, seed_catalog, seed_users, seed_orders
+from models import Category, Product, product_categories
+import upload_gc
+
+REPEAT = 10
+
+
+def measure(fn, repeat=REPEAT):
+    """(median ms, SQL statements per call) of fn() over repeat calls"""
+    fn()
+    timings = []
+    with count_queries() as counter:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), counter.count / repeat
+
+
+def categories_with_products_per_category():
+    """The home feed as it was built before the windowed query: 1 + N queries"""
+    categories_data = []
+    for category in Category.query.all():
+        products = Product.query.join(product_categories).filter(
+            product_categories.c.c_id == category.c_id
+        ).limit(api_app.HOME_PRODUCTS_PER_CATEGORY).all()
+        if products:
+            categories_data.append({'c_id': category.c_id, 'products': [product.p_id for product in products]})
+    return categories_data
+
+
+def bench_home():
+    """/api/categories-with-products: windowed query vs the old per-category loop"""
+    client = app.test_client()
+
+    def uncached_request():
+        api_app.catalog_cache.bump()
+        assert client.get('/api/categories-with-products').status_code == 200
+
+    print(f"{'categories':>10} {'products':>9} {'endpoint ms':>12} {'queries':>8} "
+          f"{'build ms':>9} {'queries':>8} {'1+N loop ms':>12} {'queries':>8}")
+    for n_categories in (10, 100, 500, 1000):
+        reset_database()
+        seed_catalog(n_categories * 10, n_categories)
+        endpoint_ms, endpoint_queries = measure(uncached_request)
+        build_ms, build_queries = measure(api_app.build_categories_with_products)
+        loop_ms, loop_queries = measure(categories_with_products_per_category, repeat=3)
+        print(f"{n_categories:>10} {n_categories * 10:>9} {endpoint_ms:>12.1f} {endpoint_queries:>8.0f} "
+              f"{build_ms:>9.1f} {build_queries:>8.0f} {loop_ms:>12.1f} {loop_queries:>8.0f}")
+        db.session.remove()
+    print("endpoint = uncached request (catalog_cache bumped first, so it includes the version re-read)")
+
+
+def products_with_lazy_categories():
+    """Product list as serialized before the batch load: one categories query per product"""
+    return [product.to_dict() for product in Product.query.all()]
+
+
+def bench_products():
+    """Product list endpoints: one IN query for all category links vs a lazy load per product"""
+    client = app.test_client()
+
+    def uncached(url):
+        def request():
+            api_app.catalog_cache.bump()
+            assert client.get(url).status_code == 200
+        return request
+
+    print(f"{'products':>8} {'manage-product ms':>18} {'queries':>8} {'gallery page ms':>16} {'queries':>8} "
+          f"{'lazy loop ms':>13} {'queries':>8}")
+    for n_products in (100, 1000, 5000):
+        reset_database()
+        seed_catalog(n_products, 20, categories_per_product=2)
+        manage_ms, manage_queries = measure(uncached('/api/manage-product'))
+        gallery_ms, gallery_queries = measure(uncached('/api/gallery?limit=100'))
+        lazy_ms, lazy_queries = measure(products_with_lazy_categories, repeat=3)
+        print(f"{n_products:>8} {manage_ms:>18.1f} {manage_queries:>8.0f} {gallery_ms:>16.1f} {gallery_queries:>8.0f} "
+              f"{lazy_ms:>13.1f} {lazy_queries:>8.0f}")
+        db.session.remove()
+    print("requests are uncached (catalog_cache bumped first); lazy loop = Product.to_dict() without preloaded categories")
+
+
+def bench_modes():
+    """Frontend pages through APIClient (HTTP to a local API server) vs EmbeddedAPIClient (in-process)"""
+    from werkzeug.serving import make_server
+    from api_client import APIClient, EmbeddedAPIClient
+
+    reset_database()
+    seed_orders(500, seed_users(50), seed_catalog(200, 10))
+    db.session.remove()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    clients = {
+        'http': APIClient(f'http://127.0.0.1:{server.server_port}/api'),
+        'embedded': EmbeddedAPIClient(app),
+    }
+
+    # app.py prints debug output on every request - keep it out of the table
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as frontend
+    client = frontend.app.test_client()
+    with client.session_transaction() as session:
+        session.update({'logged_in': True, 'user_id': 1, 'role_id': 1})
+
+    def page(url):
+        def request():
+            frontend.api_cache.clear()  # every render goes to the API
+            with contextlib.redirect_stdout(io.StringIO()):
+                assert client.get(url).status_code == 200
+        return request
+
+    pages = ('/gallery', '/packing')
+    print(f"{'mode':>9} " + ' '.join(f'{url + " ms":>15}' for url in pages))
+    try:
+        for mode, api in clients.items():
+            frontend.api = frontend.api_cache.client = api
+            timings = [measure(page(url))[0] for url in pages]
+            print(f"{mode:>9} " + ' '.join(f'{ms:>15.2f}' for ms in timings))
+    finally:
+        server.shutdown()
+        for api in clients.values():
+            api.close()
+    print("200 products, 500 orders; api_cache cleared before each render (fragment cache left on)")
+
+
+SEARCH_QUERIES = {
+    'broad': 'product',             # every product
+    'two words': 'product 4242',    # one dense + one rare token
+    'rare': 'description 31337',
+    'no match': 'robot',
+}
+
+
+def percentile(timings, fraction):
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def bench_search():
+    """product_search_index: rebuild time, search p50 / p99, and a search while another worker's write rebuilds it"""
+    client = app.test_client()
+
+    print(f"{'products':>8} {'build ms':>9} " + ' '.join(f'{name + " p50/p99 ms":>24}' for name in SEARCH_QUERIES)
+          + f" {'endpoint ms':>12} {'gallery q rare/all ms':>22} {'during rebuild ms':>18} {'rebuild ms':>11}")
+    for n_products in (1000, 10000, 50000):
+        reset_database()
+        seed_catalog(n_products, 20)
+        db.session.remove()
+        index = api_app.product_search_index
+
+        started = time.perf_counter()
+        index.ensure_current(api_app.catalog_cache.version(), api_app.load_search_products, background=False)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        columns = []
+        for query in SEARCH_QUERIES.values():
+            timings = []
+            for _ in range(200):
+                started = time.perf_counter()
+                index.search(query, 20)
+                timings.append((time.perf_counter() - started) * 1000)
+            columns.append(f'{statistics.median(timings):.3f} / {percentile(timings, 0.99):.3f}')
+
+        endpoint_ms, _ = measure(lambda: client.get('/api/products/search?q=product+4242'), repeat=50)
+
+        def gallery(query):
+            def request():
+                api_app.catalog_cache.bump()
+                assert client.get(f'/api/gallery?q={query}').status_code == 200
+            return measure(request)[0]
+        gallery_ms = (gallery('product+4242'), gallery('product'))
+
+        # Another worker's write: the shared version moves without this worker's index seeing it
+        api_app.bump_catalog_version()
+        db.session.commit()
+        api_app.catalog_cache.bump()
+        started = time.perf_counter()
+        assert client.get('/api/products/search?q=product+4242').status_code == 200
+        during_ms = (time.perf_counter() - started) * 1000
+        # Later searches keep asking, as live traffic would, until the new index is swapped in
+        while index.version != api_app.catalog_cache.version():
+            time.sleep(0.01)
+            index.ensure_current(api_app.catalog_cache.version(), api_app.load_search_products)
+        rebuild_ms = (time.perf_counter() - started) * 1000
+
+        print(f"{n_products:>8} {build_ms:>9.0f} " + ' '.join(f'{column:>24}' for column in columns)
+              + f" {endpoint_ms:>12.2f} {f'{gallery_ms[0]:.1f} / {gallery_ms[1]:.1f}':>22} {during_ms:>18.2f} {rebuild_ms:>11.0f}")
+        db.session.remove()
+    print("p50/p99 = ProductSearchIndex.search() alone; endpoint = GET /api/products/search median; "
+          "gallery q = uncached /api/gallery?q= page, one match / every product matching; "
+          "during rebuild = first search after another worker's write (served by the old index)")
+
+
+AUTOCOMPLETE_PREFIXES = {
+    'one letter': 'p',           # every product name
+    'word': 'prod',
+    'second word': '4242',       # matched from the start of the name's second word
+    'category': 'category 1',
+    'no match': 'zz',
+}
+
+
+def bench_autocomplete():
+    """/api/autocomplete: p50 / p99 per prefix, against a LIKE query on the product names"""
+    client = app.test_client()
+
+    print(f"{'products':>8} {'build ms':>9} " + ' '.join(f'{name + " p50/p99 ms":>24}' for name in AUTOCOMPLETE_PREFIXES)
+          + f" {'LIKE no match p50/p99':>22}")
+    for n_products in (1000, 10000, 50000):
+        reset_database()
+        seed_catalog(n_products, 20)
+        db.session.remove()
+
+        started = time.perf_counter()
+        api_app.name_prefix_index.ensure_current(api_app.catalog_cache.version(), api_app.load_autocomplete_names,
+                                                 background=False)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        def timed(request, repeat=200):
+            request()
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                request()
+                timings.append((time.perf_counter() - started) * 1000)
+            return f'{statistics.median(timings):.2f} / {percentile(timings, 0.99):.2f}'
+
+        columns = []
+        for prefix in AUTOCOMPLETE_PREFIXES.values():
+            def request():
+                assert client.get(f'/api/autocomplete?prefix={prefix}&limit=8').status_code == 200
+            columns.append(timed(request))
+
+        # What a type-ahead without the index would run; a rare prefix has to scan every name
+        like_ms = timed(lambda: db.session.query(Product.p_id, Product.name)
+                        .filter(Product.name.ilike('%zz%')).limit(8).all(), repeat=50)
+
+        print(f"{n_products:>8} {build_ms:>9.0f} " + ' '.join(f'{column:>24}' for column in columns)
+              + f" {like_ms:>22}")
+        db.session.remove()
+    print("p50/p99 = GET /api/autocomplete?limit=8 (the limit the search boxes ask for); "
+          "LIKE no match = name ILIKE '%zz%' LIMIT 8 straight on the products table")
+
+
+GC_ORPHAN_EVERY = 10  # one file in ten is unreferenced
+
+
+def make_upload_tree(root, n_files):
+    """n_files small files in the image store layout (aa/bb/<digest>.jpg); returns the referenced names
+
+    Every GC_ORPHAN_EVERY-th file is unreferenced, half of those older than the grace period.
+    """
+    referenced = set()
+    old = time.time() - 48 * 3600
+    for i in range(n_files):
+        digest = hashlib.sha1(str(i).encode()).hexdigest()
+        name = f'{digest[:2]}/{digest[2:4]}/{digest}.jpg'
+        path = os.path.join(root, *name.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'x')
+        if i % GC_ORPHAN_EVERY:
+            referenced.add(name)
+        elif i % (2 * GC_ORPHAN_EVERY) == 0:
+            os.utime(path, (old, old))
+    return referenced
+
+
+def orphans_walk_and_stat(root, referenced, older_than):
+    """The scan as a plain os.walk with a stat() of every file, for comparison"""
+    orphans = []
+    for directory, _, files in os.walk(root):
+        for file in files:
+            path = os.path.join(directory, file)
+            stat = os.stat(path)
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            if name not in referenced and stat.st_mtime < older_than:
+                orphans.append(name)
+    return orphans
+
+
+def bench_gc():
+    """upload_gc scan: files/s of find_orphans (os.scandir, stat only for unreferenced files) vs os.walk + stat"""
+    print(f"{'files':>7} {'orphans':>8} {'scandir ms':>11} {'files/s':>10} {'stat calls':>11} "
+          f"{'walk+stat ms':>13} {'files/s':>10} {'stat calls':>11}")
+    for n_files in (10000, 100000):
+        with tempfile.TemporaryDirectory(prefix='echoarty-gc-bench-') as root:
+            referenced = make_upload_tree(root, n_files)
+            older_than = time.time() - upload_gc.DEFAULT_GRACE_HOURS * 3600
+
+            def scandir_scan():
+                counts = {'scanned': 0, 'referenced': 0, 'recent': 0}
+                return [name for name, _, _ in upload_gc.find_orphans(root, referenced, older_than, counts)]
+
+            orphans = scandir_scan()
+            assert sorted(orphans) == sorted(orphans_walk_and_stat(root, referenced, older_than))
+            scandir_ms, _ = measure(scandir_scan, repeat=5)
+            walk_ms, _ = measure(lambda: orphans_walk_and_stat(root, referenced, older_than), repeat=5)
+            # find_orphans stats only the unreferenced files, the walk stats every file
+            scandir_stats, walk_stats = n_files - len(referenced), n_files
+
+            print(f"{n_files:>7} {len(orphans):>8} {scandir_ms:>11.0f} {n_files / scandir_ms * 1000:>10.0f} "
+                  f"{scandir_stats:>11} {walk_ms:>13.0f} {n_files / walk_ms * 1000:>10.0f} {walk_stats:>11}")
+    print(f"Image store layout (aa/bb/<digest>.jpg), 1 file in {GC_ORPHAN_EVERY} unreferenced; "
+          "warm page cache, so this is CPU / syscall cost - a cold disk widens the gap")
+
+
+CHECKOUT_CLIENTS = 100
+CHECKOUTS = int(os.getenv('BENCH_CHECKOUTS', 400))
+CHECKOUT_ITEMS = int(os.getenv('BENCH_CHECKOUT_ITEMS', 20))
+# Added to every SQL statement to mimic the network round trip to MariaDB
+QUERY_RTT_MS = float(os.getenv('BENCH_QUERY_RTT_MS', 0))
+
+
+def checkout_form(u_id, product_ids, n):
+    """Form of cart checkout n: CHECKOUT_ITEMS items, no custom images"""
+    form = {'u_id': str(u_id), 'shipping_address': '1 Road, Bangkok'}
+    for i in range(CHECKOUT_ITEMS):
+        p_id = product_ids[(n * 7 + i) % len(product_ids)]
+        form.update({
+            f'cart_items[{i}][product_id]': str(p_id),
+            f'cart_items[{i}][product_name]': f'Product {p_id}',
+            f'cart_items[{i}][product_price]': '10',
+            f'cart_items[{i}][unit_price]': '10',
+            f'cart_items[{i}][quantity]': '2',
+            f'cart_items[{i}][subtotal]': '20',
+            f'cart_items[{i}][has_custom_image]': 'false',
+        })
+    return form
+
+
+def bench_checkout():
+    """Checkout load test: CHECKOUT_CLIENTS threads posting CHECKOUTS carts to a threaded server
+
+    Runs unchanged against older revisions too (copy tests/ into a
+    git worktree of the revision), which is how before / after is compared.
+    """
+    import requests
+    from sqlalchemy import event, text
+    from werkzeug.serving import make_server
+    from models import Order
+
+    reset_database()
+    if db.engine.dialect.name == 'sqlite':
+        db.session.execute(text('PRAGMA journal_mode=WAL'))
+    user_ids = seed_users(CHECKOUT_CLIENTS)
+    product_ids = seed_catalog(300, 10)
+    db.session.remove()
+
+    statements = itertools.count()
+    event.listen(db.engine, 'before_cursor_execute', lambda *args: next(statements))
+    if QUERY_RTT_MS:
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: time.sleep(QUERY_RTT_MS / 1000))
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/api/cart/checkout'
+
+    jobs = iter(range(CHECKOUTS))
+    jobs_lock = threading.Lock()
+    latencies, failures = [], []
+
+    def client():
+        session = requests.Session()
+        while True:
+            with jobs_lock:
+                n = next(jobs, None)
+            if n is None:
+                return
+            started = time.perf_counter()
+            response = session.post(url, data=checkout_form(user_ids[n % len(user_ids)], product_ids, n))
+            elapsed = time.perf_counter() - started
+            with jobs_lock:
+                if response.status_code == 201:
+                    latencies.append(elapsed * 1000)
+                else:
+                    failures.append(response.status_code)
+
+    # The checkout route prints debug output per item
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client) for _ in range(CHECKOUT_CLIENTS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+    server.shutdown()
+
+    total_statements = next(statements)
+    orders = Order.query.count()
+    latencies.sort()
+    print(f"{CHECKOUT_CLIENTS} clients, {CHECKOUTS} checkouts x {CHECKOUT_ITEMS} items, +{QUERY_RTT_MS:g} ms per statement")
+    print(f"ok {len(latencies)}  failed {len(failures)}  orders {orders}")
+    if latencies:
+        print(f"p50 {statistics.median(latencies):.0f} ms  p95 {latencies[int(len(latencies) * 0.95) - 1]:.0f} ms  "
+              f"throughput {len(latencies) / wall:.0f} checkouts/s  "
+              f"{total_statements / len(latencies):.1f} statements/checkout")
+
+
+COMMANDS = {
+    'home': bench_home,
+    'products': bench_products,
+    'modes': bench_modes,
+    'checkout': bench_checkout,
+    'search': bench_search,
+    'autocomplete': bench_autocomplete,
+    'gc': bench_gc,
+}
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command not in COMMANDS:
+        print(__doc__)
+        sys.exit(2)
+
+    try:
+        with app.app_context():
+            COMMANDS[command]()
+    finally:
+        if _db_file:
+            os.remove(_db_file)
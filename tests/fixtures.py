@@ -0,0 +1,110 @@
+"""Shared setup for the tests and benchmarks
+
+Importing this module points the API at a throwaway database
+(TEST_DATABASE_URL, default in-memory SQLite) and temporary upload
+folders before api_app is loaded, so nothing here can touch the real
+database or static/ files.
+"""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+os.environ['DATABASE_URL'] = os.getenv('TEST_DATABASE_URL', 'sqlite://')
+os.environ.setdefault('UPLOAD_STAGING_DIR', tempfile.mkdtemp(prefix='echoarty-staging-'))
+
+from sqlalchemy import event
+
+import api_app
+from api_app import app
+from search_index import ProductSearchIndex, PrefixIndex
+from models import db, User, UserInfo, Role, Order, OrderStatus, Product, Category
+
+app.config['TESTING'] = True
+
+ORDER_STATUSES = ['Pending', 'Processing', 'Packing', 'Delivery', 'Completed', 'Cancelled']
+
+
+class QueryCounter:
+    """SQL statements sent to the database while active (before_cursor_execute)"""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries():
+    counter = QueryCounter()
+    event.listen(db.engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', counter)
+
+
+def reset_database():
+    """Empty schema with roles, order statuses and the catalog version row"""
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    db.session.add_all([Role(role_id=role_id, role_name=name) for role_id, name in
+                        [(1, 'admin'), (2, 'moderator'), (3, 'user')]])
+    db.session.add_all([OrderStatus(s_id=s_id, name=name) for s_id, name in enumerate(ORDER_STATUSES, 1)])
+    db.session.commit()
+    api_app.init_catalog_version()
+    api_app.catalog_cache.bump()
+    # Fresh indexes build synchronously on first use, instead of serving the previous test's data
+    api_app.product_search_index = ProductSearchIndex()
+    api_app.name_prefix_index = PrefixIndex()
+
+
+def seed_catalog(n_products, n_categories=1, categories_per_product=1):
+    """n_categories categories and n_products products spread over them; returns the product ids"""
+    categories = [Category(name=f'Category {i}') for i in range(n_categories)]
+    db.session.add_all(categories)
+    products = []
+    for i in range(n_products):
+        product = Product(name=f'Product {i}', description=f'Description {i}', price=Decimal(10 + i % 500),
+                          image='dummy.jpg')
+        product.categories = [categories[(i + k) % n_categories] for k in range(min(categories_per_product, n_categories))]
+        products.append(product)
+    db.session.add_all(products)
+    db.session.commit()
+    return [product.p_id for product in products]
+
+
+def seed_users(n_users):
+    """n_users customers with their user_info rows; returns the user ids"""
+    users = [User(username=f'user{i}', password='x', email=f'user{i}@example.com', role_id=3) for i in range(n_users)]
+    db.session.add_all(users)
+    db.session.flush()
+    db.session.add_all([UserInfo(u_id=user.u_id, firstname='First', lastname=f'Last {i}', street_address='1 Road',
+                                 city='Bangkok', postal_code='10100', telephone='0800000000')
+                        for i, user in enumerate(users)])
+    db.session.commit()
+    return [user.u_id for user in users]
+
+
+def seed_orders(n_orders, user_ids, product_ids, status_id=None):
+    """n_orders orders cycling over users, products and statuses (one minute apart)"""
+    base = datetime(2025, 1, 1)
+    db.session.add_all([
+        Order(u_id=user_ids[i % len(user_ids)], p_id=product_ids[i % len(product_ids)], quantity=1,
+              total_amount=Decimal(100), status_id=status_id or i % len(ORDER_STATUSES) + 1,
+              shipping_address='1 Road, Bangkok', order_date=base + timedelta(minutes=i))
+        for i in range(n_orders)
+    ])
+    db.session.commit()
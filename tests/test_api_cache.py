@@ -0,0 +1,74 @@
+"""APIResponseCache must hand every failure to the waiting callers and key any params (user-011)"""
+import threading
+import unittest
+
+from api_cache import APIResponseCache
+
+
+class FakeResponse:
+
+    def __init__(self, status_code=200, body=None):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.headers = {}
+        self.body = body
+
+
+class FakeClient:
+    """client.get() that blocks until released, then answers or raises"""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def get(self, path, params=None, headers=None, **kwargs):
+        self.calls.append((path, params))
+        self.started.set()
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return FakeResponse(body=params)
+
+
+class APIResponseCacheTest(unittest.TestCase):
+
+    def test_coalesced_callers_get_any_client_error(self):
+        client = FakeClient(error=RuntimeError('api app crashed'))
+        cache = APIResponseCache(client)
+        errors = []
+
+        def fetch():
+            try:
+                cache.get('/gallery')
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=fetch) for _ in range(5)]
+        threads[0].start()
+        self.assertTrue(client.started.wait(5))
+        for thread in threads[1:]:
+            thread.start()
+        client.release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(errors), 5)
+        self.assertTrue(all(isinstance(e, RuntimeError) for e in errors), errors)
+        self.assertEqual(cache.stats['errors'], 1)
+
+    def test_list_params_are_cached(self):
+        client = FakeClient()
+        client.release.set()
+        cache = APIResponseCache(client)
+
+        first = cache.get('/gallery', params={'category': [1, 2], 'sort': 'name'})
+        self.assertIs(cache.get('/gallery', params={'sort': 'name', 'category': [1, 2]}), first)
+        self.assertIs(cache.get('/gallery', params=[('sort', 'name'), ('category', (1, 2))]), first)
+        cache.get('/gallery', params={'category': [2, 1], 'sort': 'name'})
+        self.assertEqual(len(client.calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""Saving image variants refreshes only that product, not the whole catalog (user-023)"""
+import unittest
+from concurrent.futures import Future
+
+from tests.fixtures import api_app, app, db, reset_database, seed_catalog
+from models import Product
+
+VARIANTS = [{'file': 'dummy-320.webp', 'width': 320, 'format': 'webp', 'bytes': 1024}]
+
+
+def done(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class ImageVariantsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.context = app.app_context()
+        self.context.push()
+        reset_database()
+        seed_catalog(3)
+        self.client = app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+
+    def detail(self, p_id):
+        response = self.client.get(f'/api/gallery/detail/{p_id}')
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()['data'], response.headers['ETag']
+
+    def test_variants_skip_the_catalog_version(self):
+        before, etag = self.detail(2)
+        self.assertEqual(before['image_variants'], [])
+        version = api_app.load_catalog_version()
+        api_app.catalog_cache.get('other', lambda: 'still cached')
+
+        api_app.record_image_variants(2, 'dummy.jpg', done(VARIANTS))
+
+        self.assertEqual(api_app.load_catalog_version(), version)
+        self.assertEqual(api_app.catalog_cache.get('other', lambda: 'rebuilt'), 'still cached')
+        after, new_etag = self.detail(2)
+        self.assertEqual(after['image_variants'], VARIANTS)
+        self.assertNotEqual(new_etag, etag)
+
+    def test_other_workers_pick_up_variants(self):
+        self.detail(1)
+        # Written by another worker: this worker's cache entry was not dropped
+        Product.query.filter_by(p_id=1).update({'image_variants': VARIANTS})
+        db.session.commit()
+        self.assertEqual(self.detail(1)[0]['image_variants'], VARIANTS)
+
+    def test_replaced_image_is_left_alone(self):
+        api_app.record_image_variants(3, 'old.jpg', done(VARIANTS))
+        self.assertEqual(self.detail(3)[0]['image_variants'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
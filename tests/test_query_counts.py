@@ -0,0 +1,194 @@
+"""Query counts of the list endpoints must not grow with the number of rows"""
+import unittest
+
+from tests.fixtures import api_app, app, db, count_queries, reset_database, seed_catalog, seed_users, seed_orders
+from models import OrderStatus
+
+
+class QueryCountTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.context = app.app_context()
+        self.context.push()
+        reset_database()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+
+    def queries(self, url, uncached=False):
+        """Number of SQL statements one GET of url runs (after a warm-up request)
+
+        uncached=True empties catalog_cache first, so the payload is rebuilt.
+        """
+        self.assertEqual(self.client.get(url).status_code, 200)
+        if uncached:
+            api_app.catalog_cache.bump()
+        with count_queries() as counter:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return counter.count, response.get_json()
+
+
+class OrderQueryCountTest(QueryCountTestCase):
+    """/api/orders loads users, user_info, products and statuses with the orders (user-001)"""
+
+    def seed(self, n_orders):
+        reset_database()
+        # Every order has its own user and product, so lazy loads would show up per row
+        seed_orders(n_orders, seed_users(n_orders), seed_catalog(n_orders))
+
+    def test_order_list_query_count_is_constant(self):
+        self.seed(1)
+        single, data = self.queries('/api/orders?role_id=1&limit=200')
+        self.assertEqual(data['count'], 1)
+
+        self.seed(150)
+        many, data = self.queries('/api/orders?role_id=1&limit=200')
+        self.assertEqual(data['count'], 150)
+        self.assertEqual(many, single)
+        order = data['data'][0]
+        self.assertTrue(order['customer_name'] and order['product_name'] and order['status_name'])
+
+    def test_order_detail_query_count(self):
+        self.seed(3)
+        count, data = self.queries('/api/orders/2')
+        self.assertEqual(count, 1)
+        self.assertEqual(data['data']['order_id'], 2)
+
+
+class OrderListTotalTest(QueryCountTestCase):
+    """/api/orders reports the total for its filters and searches beyond the first page (user-002)"""
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def test_total_counts_every_page(self):
+        seed_orders(120, seed_users(3), seed_catalog(5))
+        first = self.get('/api/orders?role_id=1&limit=50')
+        self.assertEqual((first['count'], first['total']), (50, 120))
+        later = self.get(f"/api/orders?role_id=1&limit=50&cursor={first['next_cursor']}")
+        self.assertEqual(later['count'], 50)
+        self.assertIsNone(later['total'])
+
+        by_status = self.get('/api/orders?role_id=1&limit=5&status_id=2')
+        self.assertEqual(by_status['total'], 20)
+        self.assertTrue(all(order['status_id'] == 2 for order in by_status['data']))
+
+    def test_search_by_order_id_and_customer(self):
+        seed_orders(120, seed_users(3), seed_catalog(5))
+        # The oldest order is far past the first page
+        found = self.get('/api/orders?role_id=1&limit=10&q=%231')
+        self.assertEqual([order['order_id'] for order in found['data']], [1])
+
+        found = self.get('/api/orders?role_id=1&limit=10&q=last+2')
+        self.assertEqual(found['total'], 40)
+        self.assertTrue(all(order['customer_name'] == 'First Last 2' for order in found['data']))
+
+        found = self.get('/api/orders?role_id=1&limit=10&q=user1&status_id=2')
+        self.assertTrue(found['data'])
+        self.assertTrue(all(order['username'] == 'user1' and order['status_id'] == 2 for order in found['data']))
+
+
+class ReviewEligibilityStatusTest(QueryCountTestCase):
+    """Only status 5 and the first completed / delivered status make an order reviewable (user-019)"""
+
+    def setUp(self):
+        super().setUp()
+        api_app._completed_status_ids = None
+
+    def tearDown(self):
+        api_app._completed_status_ids = None
+        super().tearDown()
+
+    def test_later_delivered_status_is_not_completed(self):
+        db.session.add(OrderStatus(s_id=7, name='delivered'))
+        db.session.commit()
+        user_ids, product_ids = seed_users(1), seed_catalog(2)
+        seed_orders(1, user_ids, product_ids[:1], status_id=7)
+        seed_orders(1, user_ids, product_ids[1:], status_id=5)
+
+        response = self.client.get(f'/api/reviews/eligibility?user_id={user_ids[0]}&p_ids=1,2')
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()['data']
+        self.assertFalse(data['1']['can_review'])
+        self.assertTrue(data['2']['can_review'])
+        self.assertEqual(api_app.completed_status_ids(), (5,))
+
+
+class HomeFeedQueryCountTest(QueryCountTestCase):
+    """/api/categories-with-products is one windowed query however many categories (user-003)"""
+
+    def test_home_feed_query_count_is_constant(self):
+        seed_catalog(30, 3)
+        few, data = self.queries('/api/categories-with-products', uncached=True)
+        self.assertEqual(data['count'], 3)
+
+        reset_database()
+        seed_catalog(600, 60)
+        many, data = self.queries('/api/categories-with-products', uncached=True)
+        self.assertEqual(data['count'], 60)
+        self.assertEqual(many, few)
+        self.assertTrue(all(len(category['products']) == api_app.HOME_PRODUCTS_PER_CATEGORY
+                            for category in data['data']))
+
+
+class ProductListQueryCountTest(QueryCountTestCase):
+    """Product lists load every product's categories in one IN query (user-006)"""
+
+    def assert_constant(self, url):
+        seed_catalog(5, 3, categories_per_product=2)
+        few, data = self.queries(url, uncached=True)
+        self.assertEqual(len(data['data']), 5)
+
+        reset_database()
+        seed_catalog(300, 3, categories_per_product=2)
+        many, data = self.queries(url, uncached=True)
+        self.assertEqual(len(data['data']), 100 if 'gallery' in url else 300)
+        self.assertEqual(many, few)
+        self.assertTrue(all(len(product['categories']) == 2 for product in data['data']))
+
+    def test_manage_product_query_count_is_constant(self):
+        self.assert_constant('/api/manage-product')
+
+    def test_gallery_query_count_is_constant(self):
+        self.assert_constant('/api/gallery?limit=100')
+
+
+class GallerySearchTest(QueryCountTestCase):
+    """/api/gallery?q= searches product_search_index, the other filters still apply (user-013)"""
+
+    def ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        return [product['p_id'] for product in data['data']], data['total']
+
+    def test_search_matches_sql_filters_and_sorts(self):
+        seed_catalog(120, 4, categories_per_product=2)
+        # Every product is named "Product <i>", so q=product must give the same pages as no q
+        for sort in api_app.GALLERY_SORTS:
+            for filters in ('', '&category=2', '&min_price=50&max_price=100', '&category=3&min_price=20'):
+                url = f'/api/gallery?sort={sort}&limit=10&page=2{filters}'
+                with self.subTest(url=url):
+                    self.assertEqual(self.ids(url + '&q=product'), self.ids(url))
+
+    def test_search_runs_no_like_scan(self):
+        seed_catalog(300, 3)
+        count, data = self.queries('/api/gallery?q=product+42', uncached=True)
+        self.assertEqual([product['p_id'] for product in data['data']], [43])
+        self.assertEqual(data['total'], 1)
+        with count_queries() as counter:
+            api_app.catalog_cache.bump()
+            self.client.get('/api/gallery?q=description+7&category=2')
+        self.assertFalse([sql for sql in counter.statements if 'LIKE' in sql.upper()])
+
+        few, _ = self.queries('/api/gallery?q=product', uncached=True)
+        self.assertEqual(few, count)
+
+
+if __name__ == '__main__':
+    unittest.main()
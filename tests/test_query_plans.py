@@ -0,0 +1,140 @@
+"""The hot order / review / gallery queries must be served by their indexes (user-016)
+
+Each query mirrors the one its endpoint builds and is checked with EXPLAIN
+(EXPLAIN QUERY PLAN on SQLite): the driving table has to be read through
+the expected index, in index order (no sort of the result in memory), and
+every joined table through an index. Run against MariaDB with
+TEST_DATABASE_URL to check the production planner.
+"""
+import re
+import unittest
+
+from sqlalchemy import text
+
+from tests.fixtures import api_app, app, db, reset_database, seed_catalog, seed_users, seed_orders
+from models import Order, Product, Review
+
+_SQLITE_INDEX_RE = re.compile(r'USING (?:COVERING )?INDEX (\w+)|USING (INTEGER PRIMARY KEY)')
+
+
+def explain_plan(query):
+    """Return [(table, index, sorts, detail)] for one query, in join order
+
+    index is the index the table is read through (PRIMARY for the primary
+    key), or None when every row of the table is read. sorts is True when
+    the rows have to be sorted in memory (temp b-tree / filesort) instead
+    of coming out of the index in order.
+    """
+    connection = db.session.connection()
+    sql = str(query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+
+    if db.engine.dialect.name == 'sqlite':
+        plan = []
+        for row in connection.execute(text('EXPLAIN QUERY PLAN ' + sql)):
+            detail = row[-1]
+            if detail.startswith(('SCAN', 'SEARCH')):
+                match = _SQLITE_INDEX_RE.search(detail)
+                index = match and (match.group(1) or 'PRIMARY')
+                plan.append((detail.split()[1], index, False, detail))
+            elif 'TEMP B-TREE' in detail and plan:
+                table, index, _, access = plan[-1]
+                plan[-1] = (table, index, True, access)
+        return plan
+
+    plan = []
+    for row in connection.execute(text('EXPLAIN ' + sql)).mappings():
+        extra = row.get('Extra') or ''
+        detail = f"type={row['type']} key={row['key']} {extra}".strip()
+        # type ALL = every row of the table is read
+        index = row['key'] if row['type'] != 'ALL' else None
+        plan.append((row['table'], index, 'filesort' in extra, detail))
+    return plan
+
+
+class QueryPlanTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.context = app.app_context()
+        cls.context.push()
+        reset_database()
+        # Enough rows that a planner with statistics doesn't scan a near-empty table on purpose
+        user_ids = seed_users(50)
+        product_ids = seed_catalog(200, 10)
+        seed_orders(3000, user_ids, product_ids)
+        db.session.add_all([
+            Review(p_id=order.p_id, o_id=order.order_id, u_id=order.u_id, score=5, review_date=order.order_date)
+            for order in Order.query.filter_by(status_id=5).limit(300)
+        ])
+        db.session.commit()
+        if db.engine.dialect.name != 'sqlite':
+            for table in ('orders', 'reviews', 'products'):
+                db.session.execute(text(f'ANALYZE TABLE {table}'))
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        cls.context.pop()
+
+    def assert_plan(self, query, table, index):
+        """table is read through index in index order, and every table through some index"""
+        plan = explain_plan(query)
+        message = '\n'.join(detail for *_, detail in plan)
+        driving = [step for step in plan if step[0] == table]
+        self.assertTrue(driving, message)
+        self.assertEqual(driving[0][1], index, message)
+        self.assertFalse(any(sorts for _, _, sorts, _ in plan), message)
+        self.assertTrue(all(step[1] for step in plan), message)
+
+    def order_listing(self, **filters):
+        """GET /api/orders: newest first on (order_date, order_id), one extra row for has_more"""
+        return api_app.order_query_with_details().filter_by(**filters) \
+            .order_by(Order.order_date.desc(), Order.order_id.desc()) \
+            .limit(api_app.ORDERS_PAGE_DEFAULT_LIMIT + 1)
+
+    def test_staff_order_listing(self):
+        self.assert_plan(self.order_listing(), 'orders', 'idx_orders_date_id')
+
+    def test_customer_order_listing(self):
+        self.assert_plan(self.order_listing(u_id=1), 'orders', 'idx_orders_user_date')
+
+    def test_order_listing_by_status(self):
+        self.assert_plan(self.order_listing(status_id=1), 'orders', 'idx_orders_status_date')
+
+    def test_customer_order_listing_by_status(self):
+        plan = explain_plan(self.order_listing(u_id=1, status_id=1))
+        # Either composite index answers it; both keep the date order
+        self.assertIn(plan[0][1], ('idx_orders_user_date', 'idx_orders_status_date'), plan[0][3])
+        self.assertFalse(any(sorts for _, _, sorts, _ in plan), plan)
+
+    def test_review_eligibility(self):
+        plan = explain_plan(api_app.review_eligibility_query(1, [1, 2, 3]))
+        indexes = {table: index for table, index, _, _ in plan}
+        self.assertEqual(indexes.get('orders'), 'idx_orders_user_product_status', plan)
+        self.assertEqual(indexes.get('reviews'), 'idx_reviews_product_date', plan)
+
+    def test_product_reviews(self):
+        query = api_app.review_query_with_details().filter(Review.p_id == 1) \
+            .order_by(Review.review_date.desc(), Review.review_id.desc()) \
+            .limit(api_app.REVIEWS_PAGE_DEFAULT_LIMIT + 1)
+        plan = explain_plan(query)
+        self.assertEqual(plan[0][:2], ('reviews', 'idx_reviews_product_date'), plan)
+        self.assertTrue(all(step[1] for step in plan), plan)
+
+    def test_gallery_sorts(self):
+        expected = {
+            'name': 'idx_products_name_id',
+            'name-desc': 'idx_products_name_id',
+            'price': 'idx_products_price_id',
+            'price-desc': 'idx_products_price_id',
+            'newest': 'idx_products_created_id',
+        }
+        self.assertEqual(set(expected), set(api_app.GALLERY_SORTS))
+        for sort, index in expected.items():
+            with self.subTest(sort=sort):
+                query = Product.query.order_by(*api_app.GALLERY_SORTS[sort]).limit(api_app.GALLERY_PAGE_DEFAULT_LIMIT)
+                self.assert_plan(query, 'products', index)
+
+
+if __name__ == '__main__':
+    unittest.main()
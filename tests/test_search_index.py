@@ -0,0 +1,73 @@
+"""Search index rebuilds must not block searches once an index exists (user-014)"""
+import threading
+import unittest
+
+from search_index import ProductSearchIndex, PrefixIndex
+
+
+def products(*names):
+    return [{'p_id': p_id, 'name': name, 'description': '', 'categories': []} for p_id, name in enumerate(names, 1)]
+
+
+class BackgroundRebuildTest(unittest.TestCase):
+
+    def test_first_build_is_synchronous(self):
+        index = ProductSearchIndex()
+        index.ensure_current(1, lambda: products('Giant Robot'))
+        self.assertEqual(index.version, 1)
+        self.assertEqual(index.search('robot')[1], 1)
+
+    def test_stale_index_keeps_answering_while_rebuilding(self):
+        index = ProductSearchIndex()
+        index.ensure_current(1, lambda: products('Giant Robot'))
+
+        release, loading = threading.Event(), threading.Event()
+
+        def slow_load():
+            loading.set()
+            release.wait(5)
+            return products('Giant Robot', 'Robot Cat')
+
+        # Returns at once; the old index still answers while the load is running
+        index.ensure_current(2, slow_load)
+        self.assertTrue(loading.wait(5))
+        self.assertEqual(index.version, 1)
+        self.assertEqual(index.search('robot')[1], 1)
+        # A second stale request doesn't start another rebuild
+        index.ensure_current(2, self.fail)
+
+        release.set()
+        for _ in range(500):
+            if index.version == 2:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(index.version, 2)
+        self.assertEqual(index.search('robot')[1], 2)
+
+    def test_failed_rebuild_keeps_the_old_index(self):
+        index = PrefixIndex()
+        index.ensure_current(1, lambda: [('product', 1, 'Giant Robot')])
+
+        def broken_load():
+            raise RuntimeError('database went away')
+
+        with self.assertLogs('search_index', 'ERROR'):
+            index.ensure_current(2, broken_load)
+            for _ in range(500):
+                if not index._rebuilding:
+                    break
+                threading.Event().wait(0.01)
+        self.assertEqual(index.version, 1)
+        self.assertEqual(index.complete('rob'), [('product', 1, 'Giant Robot')])
+
+        # The next request tries again
+        index.ensure_current(2, lambda: [('product', 1, 'Giant Robot'), ('category', 1, 'Robots')])
+        for _ in range(500):
+            if index.version == 2:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(len(index.complete('rob')), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+"""Find and remove uploaded files nothing references any more
+
+    python3 upload_gc.py                  dry run: report orphaned files, change nothing
+    python3 upload_gc.py quarantine       move orphans to UPLOAD_QUARANTINE_DIR (default uploads/quarantine)
+    python3 upload_gc.py delete           delete orphans
+
+    --grace-hours N   only touch files not modified for N hours (default 24)
+
+Referenced files are products.image (and its image_variants),
+orders.bill_img and orders.img, each relative to its upload folder.
+Files younger than the grace period are kept even when unreferenced -
+an upload can be on disk a moment before the row that references it is
+committed. Quarantined files keep their relative path, so restoring one
+is moving it back. Expired staged uploads (UPLOAD_STAGING_DIR) are
+purged as well unless it's a dry run.
+"""
+import os
+import shutil
+import sys
+import time
+
+from sqlalchemy import select
+
+from api_app import app, UPLOAD_FOLDER, SLIPS_FOLDER, CUSTOM_IMAGES_FOLDER, upload_staging
+from models import db, Order, Product
+
+DEFAULT_GRACE_HOURS = 24
+QUARANTINE_DIR = os.getenv('UPLOAD_QUARANTINE_DIR', os.path.join('uploads', 'quarantine'))
+
+# Rows are streamed from the database in batches of this size
+STREAM_BATCH_ROWS = 10000
+
+# Orphans listed one by one per folder (the totals always cover all of them)
+LIST_LIMIT = 50
+
+# Fallback images the templates / JS point at directly (no row references them)
+ALWAYS_KEEP = {
+    'products': {'dummy.jpg', 'placeholder.jpg'},
+}
+
+
+def upload_folders():
+    """{folder key: directory} of the folders the collector manages"""
+    return {
+        'products': UPLOAD_FOLDER,
+        'slips': SLIPS_FOLDER,
+        'custom_images': CUSTOM_IMAGES_FOLDER,
+    }
+
+
+def _stream(statement):
+    return db.session.execute(statement.execution_options(yield_per=STREAM_BATCH_ROWS))
+
+
+def load_references():
+    """{folder key: set of referenced names} from a streaming pass over products and orders"""
+    references = {key: set(ALWAYS_KEEP.get(key, ())) for key in upload_folders()}
+
+    for image, variants in _stream(select(Product.image, Product.image_variants)):
+        if image:
+            references['products'].add(image)
+        for variant in variants or []:
+            references['products'].add(variant['file'])
+
+    for bill_img, img in _stream(select(Order.bill_img, Order.img)):
+        if bill_img:
+            references['slips'].add(bill_img)
+        if img:
+            references['custom_images'].add(img)
+    return references
+
+
+def walk_files(root):
+    """Yield (name relative to root with '/' separators, os.DirEntry) for every file under root
+
+    os.scandir returns the entry type with the directory listing, so no
+    stat() call is made here - only for the files that turn out to be
+    unreferenced.
+    """
+    stack = [(root, '')]
+    while stack:
+        directory, prefix = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append((entry.path, prefix + entry.name + '/'))
+                    elif entry.is_file(follow_symlinks=False):
+                        yield prefix + entry.name, entry
+        except FileNotFoundError:
+            continue
+
+
+def find_orphans(root, referenced, older_than, counts):
+    """Yield (name, entry, size) for unreferenced files under root last modified before older_than
+
+    Adds to counts['scanned'], counts['referenced'] and counts['recent']
+    (unreferenced but inside the grace period) as it goes.
+    """
+    for name, entry in walk_files(root):
+        counts['scanned'] += 1
+        if name in referenced:
+            counts['referenced'] += 1
+            continue
+        try:
+            stat = entry.stat(follow_symlinks=False)
+        except FileNotFoundError:
+            continue
+        if stat.st_mtime >= older_than:
+            counts['recent'] += 1
+            continue
+        yield name, entry, stat.st_size
+
+
+def collect(mode='report', grace_hours=DEFAULT_GRACE_HOURS, quarantine_dir=QUARANTINE_DIR, verbose=True):
+    """Report / quarantine / delete orphaned uploads; returns the stats per folder"""
+    started = time.perf_counter()
+    references = load_references()
+    loaded = time.perf_counter()
+    older_than = time.time() - grace_hours * 3600
+
+    stats = {}
+    for key, root in upload_folders().items():
+        folder_stats = stats[key] = {'scanned': 0, 'referenced': 0, 'recent': 0, 'orphans': 0, 'orphan_bytes': 0}
+        for name, entry, size in find_orphans(root, references[key], older_than, folder_stats):
+            folder_stats['orphans'] += 1
+            folder_stats['orphan_bytes'] += size
+            if verbose and folder_stats['orphans'] <= LIST_LIMIT:
+                print(f"  {'would remove' if mode == 'report' else mode}: {key}/{name} ({size // 1024} KB)")
+            try:
+                if mode == 'delete':
+                    os.remove(entry.path)
+                elif mode == 'quarantine':
+                    destination = os.path.join(quarantine_dir, key, *name.split('/'))
+                    os.makedirs(os.path.dirname(destination), exist_ok=True)
+                    shutil.move(entry.path, destination)
+            except OSError as e:
+                print(f"  ❌ {key}/{name}: {e}")
+
+    if mode != 'report':
+        stats['staging'] = {'expired_removed': upload_staging.purge_expired()}
+
+    elapsed = time.perf_counter() - started
+    scanned = sum(stats[key]['scanned'] for key in upload_folders())
+    stats['timing'] = {
+        'references': sum(len(names) for names in references.values()),
+        'load_seconds': round(loaded - started, 3),
+        'total_seconds': round(elapsed, 3),
+        'files_per_second': round(scanned / (elapsed - (loaded - started))) if elapsed > loaded - started else None,
+    }
+    return stats
+
+
+def print_report(stats, mode):
+    print()
+    for key, folder in stats.items():
+        if key in ('staging', 'timing'):
+            continue
+        print(f"{key:14} scanned {folder['scanned']:>9}  referenced {folder['referenced']:>9}  "
+              f"within grace {folder['recent']:>7}  orphaned {folder['orphans']:>7} "
+              f"({folder['orphan_bytes'] / (1024 * 1024):.1f} MB)")
+    if 'staging' in stats:
+        print(f"{'staging':14} expired uploads removed {stats['staging']['expired_removed']}")
+    timing = stats['timing']
+    print(f"\n{timing['references']} references loaded in {timing['load_seconds']}s, "
+          f"total {timing['total_seconds']}s ({timing['files_per_second']} files/s scanned)")
+    if mode == 'report':
+        print("Dry run - nothing was changed (run with quarantine or delete)")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    grace_hours = DEFAULT_GRACE_HOURS
+    if '--grace-hours' in args:
+        index = args.index('--grace-hours')
+        try:
+            grace_hours = float(args[index + 1])
+        except (IndexError, ValueError):
+            print(__doc__)
+            sys.exit(2)
+        del args[index:index + 2]
+
+    mode = args[0] if args else 'report'
+    if mode not in ('report', 'quarantine', 'delete') or len(args) > 1:
+        print(__doc__)
+        sys.exit(2)
+
+    with app.app_context():
+        result = collect(mode, grace_hours)
+    print_report(result, mode)
@@ -0,0 +1,286 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows (dev only): appends are serialized within one process
+    fcntl = None
+
+# upload ids are uuid4 hex - anything else is rejected before touching the disk
+_UPLOAD_ID_LEN = 32
+
+# Request bodies are copied to disk / hashed in blocks of this size, so a
+# chunk of any size is handled with bounded memory
+COPY_BLOCK_BYTES = 64 * 1024
+
+
+class OffsetMismatch(Exception):
+    """A chunk was sent for an offset other than the current end of the upload"""
+
+    def __init__(self, offset):
+        super().__init__(f'Upload is at offset {offset}')
+        self.offset = offset
+
+
+class ChecksumMismatch(Exception):
+    """The completed upload's sha256 differs from the one declared at begin()"""
+
+
+class UploadStaging:
+    """Files uploaded ahead of checkout, referenced later by upload id
+
+    Each staged upload is two files in root: <id> (the data) and
+    <id>.json (kind, owner, extension, size, created_at). Both are
+    written to a temp name first and renamed into place, so a reader
+    never sees a half-written upload. Because state lives on disk, any
+    API worker sharing root can use an upload staged by another.
+
+    Large files can be sent in chunks instead: begin() creates an empty
+    upload with a declared size and sha256, append() adds one chunk at the
+    current offset, and the upload becomes usable (get() returns it) once
+    the last chunk is in and the checksum matches. The offset is the data
+    file's size, so a client that lost its connection asks for it and
+    resumes from there.
+
+    Checkout stores the file at path() in its final place and calls
+    discard() once the orders are committed. Uploads never used expire
+    ttl seconds after their last write; expired ones are swept at most
+    once every sweep_interval seconds by stage() / begin().
+    """
+
+    def __init__(self, root, ttl=24 * 3600, sweep_interval=600):
+        self.root = root
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._swept_at = None
+        self._append_locks = {}  # upload_id -> Lock, only used where fcntl.flock isn't available
+
+    def _paths(self, upload_id):
+        data_path = os.path.join(self.root, upload_id)
+        return data_path, data_path + '.json'
+
+    def stage(self, file, kind, owner, extension):
+        """Save a werkzeug FileStorage; returns the metadata dict (with upload_id)"""
+        self._maybe_sweep()
+        os.makedirs(self.root, exist_ok=True)
+
+        upload_id = uuid.uuid4().hex
+        data_path, meta_path = self._paths(upload_id)
+        file.save(data_path + '.part')
+        os.replace(data_path + '.part', data_path)
+
+        meta = {
+            'upload_id': upload_id,
+            'kind': kind,
+            'owner': owner,
+            'extension': extension,
+            'size': os.path.getsize(data_path),
+            'complete': True,
+            'created_at': time.time()
+        }
+        self._write_meta(meta)
+        meta['offset'] = meta['size']
+        return meta
+
+    def begin(self, kind, owner, extension, size, sha256):
+        """Start a chunked upload of size bytes; returns the metadata dict (offset 0)"""
+        self._maybe_sweep()
+        os.makedirs(self.root, exist_ok=True)
+
+        upload_id = uuid.uuid4().hex
+        data_path, _ = self._paths(upload_id)
+        open(data_path, 'wb').close()
+
+        meta = {
+            'upload_id': upload_id,
+            'kind': kind,
+            'owner': owner,
+            'extension': extension,
+            'size': size,
+            'sha256': sha256.lower(),
+            'complete': False,
+            'created_at': time.time()
+        }
+        self._write_meta(meta)
+        meta['offset'] = 0
+        return meta
+
+    def append(self, upload_id, offset, stream, length):
+        """Append length bytes read from stream at offset; returns the updated metadata
+
+        Raises OffsetMismatch if offset isn't the current end of the upload
+        (or another chunk for it is being written), ValueError if the chunk
+        would go past the declared size, and ChecksumMismatch when the last
+        chunk completes a file whose sha256 is wrong - the upload is then
+        discarded and has to be started again.
+
+        The data file is locked (flock) while a chunk is checked and
+        written, so chunks sent to different worker processes can't
+        interleave; the offset is the locked file's own size.
+        """
+        data_path, _ = self._paths(upload_id)
+        if self.get(upload_id, pending=True) is None:
+            raise KeyError(upload_id)
+        try:
+            f = open(data_path, 'ab')
+        except FileNotFoundError:
+            raise KeyError(upload_id)
+
+        with f:
+            if not self._try_lock(upload_id, f):
+                raise OffsetMismatch(os.fstat(f.fileno()).st_size)
+            try:
+                # Re-read under the lock: a chunk that just finished may have completed or discarded it
+                meta = self.get(upload_id, pending=True)
+                if meta is None or not _same_file(f, data_path):
+                    raise KeyError(upload_id)
+                current = os.fstat(f.fileno()).st_size
+                if meta['complete'] or offset != current:
+                    raise OffsetMismatch(current)
+                if offset + length > meta['size']:
+                    raise ValueError(f"Chunk ends past the declared size ({meta['size']} bytes)")
+
+                try:
+                    written = 0
+                    while written < length:
+                        block = stream.read(min(COPY_BLOCK_BYTES, length - written))
+                        if not block:
+                            break
+                        f.write(block)
+                        written += len(block)
+                finally:
+                    # A dropped connection keeps what arrived; the client resumes from there
+                    f.flush()
+                offset += written
+
+                if offset == meta['size']:
+                    if _file_sha256(data_path) != meta['sha256']:
+                        self.discard(upload_id)
+                        raise ChecksumMismatch(upload_id)
+                    meta['complete'] = True
+                # Rewriting the metadata renews the expiry, so a slow upload doesn't expire half way
+                self._write_meta(meta)
+                meta['offset'] = offset
+                return meta
+            finally:
+                self._unlock(upload_id, f)
+
+    def _try_lock(self, upload_id, f):
+        """Exclusive non-blocking lock on an open data file; False if a chunk is being written"""
+        if fcntl is None:
+            with self._lock:
+                lock = self._append_locks.setdefault(upload_id, threading.Lock())
+            return lock.acquire(blocking=False)
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _unlock(self, upload_id, f):
+        if fcntl is None:
+            with self._lock:
+                self._append_locks.pop(upload_id).release()
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def get(self, upload_id, owner=None, pending=False):
+        """Metadata of a live upload, or None if unknown, expired or owned by someone else
+
+        Chunked uploads that aren't complete yet are only returned with
+        pending=True. The metadata includes the current offset.
+        """
+        if not isinstance(upload_id, str) or len(upload_id) != _UPLOAD_ID_LEN or not upload_id.isalnum():
+            return None
+        data_path, meta_path = self._paths(upload_id)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            meta['offset'] = os.path.getsize(data_path)
+        except (OSError, ValueError):
+            return None
+        if meta['expires_at'] < time.time():
+            return None
+        if owner is not None and meta['owner'] != owner:
+            return None
+        if not meta.get('complete', True) and not pending:
+            return None
+        return meta
+
+    def path(self, upload_id):
+        """Path of the upload's data file (copy or link it; discard() once it's no longer needed)"""
+        return self._paths(upload_id)[0]
+
+    def _write_meta(self, meta):
+        """Save meta (without the offset, which is the data file's size); renews expires_at"""
+        meta['expires_at'] = time.time() + self.ttl
+        _, meta_path = self._paths(meta['upload_id'])
+        with open(meta_path + '.part', 'w', encoding='utf-8') as f:
+            json.dump({key: value for key, value in meta.items() if key != 'offset'}, f)
+        os.replace(meta_path + '.part', meta_path)
+
+    def discard(self, upload_id):
+        """Remove an upload (data and metadata) if it still exists"""
+        for path in self._paths(upload_id):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def purge_expired(self, now=None):
+        """Delete expired uploads and stray temp files; returns how many uploads were removed"""
+        now = time.time() if now is None else now
+        removed = 0
+        try:
+            entries = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return 0
+
+        for entry in entries:
+            name = entry.name
+            if name.endswith('.json'):
+                try:
+                    with open(entry.path, encoding='utf-8') as f:
+                        expired = json.load(f)['expires_at'] < now
+                except (OSError, ValueError, KeyError):
+                    expired = entry.stat().st_mtime + self.ttl < now
+                if expired:
+                    self.discard(name[:-len('.json')])
+                    removed += 1
+            elif name.endswith('.part') or not os.path.exists(entry.path + '.json'):
+                # Interrupted write, or data whose metadata is gone (discarded)
+                try:
+                    if entry.stat().st_mtime + self.ttl < now:
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._swept_at is not None and now - self._swept_at < self.sweep_interval:
+                return
+            self._swept_at = now
+        self.purge_expired()
+
+
+def _same_file(f, path):
+    """True if the open file f is still the file at path (not removed / replaced meanwhile)"""
+    try:
+        return os.path.samestat(os.fstat(f.fileno()), os.stat(path))
+    except FileNotFoundError:
+        return False
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(COPY_BLOCK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()